@@ -5,7 +5,7 @@ from .models import (
     PlasmidCollection, Plasmid,
     Correspondence, CorrespondenceEntry,
     CampaignTemplate, TemplatePart,
-    Simulation
+    Simulation, ContentBlob
 )
 
 # ==============================================================================
@@ -45,7 +45,8 @@ class PlasmidCollectionAdmin(admin.ModelAdmin):
 class PlasmidAdmin(admin.ModelAdmin):
     list_display = ('identifier', 'name', 'collection')
     list_filter = ('collection',)
-    search_fields = ('identifier', 'name', 'sequence')
+    # Pas de 'sequence' : LIKE '%...%' sur toute la table ; voir la recherche par séquence (biolib/search.py)
+    search_fields = ('identifier', 'name')
 
 # ==============================================================================
 # CORRESPONDANCE (Structure MAIN + UX AGASH)
@@ -91,3 +92,14 @@ class SimulationAdmin(admin.ModelAdmin):
     list_display = ('template', 'user', 'status', 'date_run')
     list_filter = ('status', 'date_run')
     search_fields = ('user__email', 'template__name')
+
+# ==============================================================================
+# STOCKAGE DES FICHIERS
+# ==============================================================================
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    """ Fichiers dédupliqués : utile pour voir ce qui est partagé entre plusieurs lignes """
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name', 'digest')
+    readonly_fields = ('digest', 'name', 'size', 'ref_count', 'created_at')
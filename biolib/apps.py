@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BiolibConfig(AppConfig):
     name = 'biolib'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,206 @@
+"""
+Téléchargement des résultats de simulation en flux.
+
+Les fichiers sont servis par FileResponse (lecture par blocs) avec prise en
+charge des requêtes partielles (en-tête Range) : reprise d'un téléchargement
+interrompu, lecteurs qui ne demandent qu'une partie du fichier.
+
+L'archive ZIP d'un dossier de résultats est produite à la volée, fichier par
+fichier et bloc par bloc : la mémoire utilisée ne dépend pas de la taille des
+résultats. Pendant l'envoi, l'archive est aussi écrite sur disque
+(fichier `.part` renommé `<dossier>.zip` une fois complet) : les
+téléchargements suivants servent ce fichier tant que le dossier n'a pas changé.
+"""
+import os
+import re
+import uuid
+import zipfile
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+BLOCK_SIZE = 64 * 1024
+# Formats déjà compressés : stockés tels quels dans l'archive
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.gz', '.zip', '.xlsx'}
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+# =============================================================================
+# FICHIERS (AVEC REQUÊTES PARTIELLES)
+# =============================================================================
+
+class _FileRange:
+    """ Fichier ouvert limité à `length` octets à partir de la position courante. """
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header, size):
+    """
+    (début, fin incluse) demandés par l'en-tête Range, None s'il est absent ou
+    ignoré (plusieurs plages, syntaxe invalide), ValueError s'il est hors du fichier.
+    """
+    match = _RANGE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N : les N derniers octets
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def ranged_file_response(request, path, filename, content_type=None):
+    """ FileResponse du fichier `path`, partielle (206) si la requête porte un en-tête Range. """
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    fh = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(fh, as_attachment=True, filename=filename, content_type=content_type)
+    else:
+        start, end = byte_range
+        fh.seek(start)
+        response = FileResponse(_FileRange(fh, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    response.block_size = BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+# =============================================================================
+# ARCHIVE ZIP EN FLUX
+# =============================================================================
+
+class _ZipSink:
+    """
+    Destination non positionnable de zipfile : les octets écrits sont gardés
+    jusqu'au prochain `drain()` et recopiés dans le fichier de cache.
+    """
+
+    def __init__(self, cache_file=None):
+        self.chunks = []
+        self.cache_file = cache_file
+
+    def write(self, data):
+        if data:
+            self.chunks.append(bytes(data))
+            if self.cache_file is not None:
+                self.cache_file.write(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _drained(sink):
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def _folder_files(folder):
+    """ (chemin, nom dans l'archive) des fichiers du dossier, dans un ordre stable. """
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, folder)
+
+
+def archive_path(folder):
+    return os.path.normpath(folder) + '.zip'
+
+
+def cached_archive(folder):
+    """ Chemin de l'archive déjà construite si elle est plus récente que le dossier, sinon None. """
+    path = archive_path(folder)
+    try:
+        built = os.path.getmtime(path)
+    except OSError:
+        return None
+    newest = max(
+        [os.path.getmtime(folder)] + [os.path.getmtime(p) for p, _ in _folder_files(folder)]
+    )
+    return path if built >= newest else None
+
+
+def iter_zip(folder, cache=True):
+    """
+    Octets de l'archive ZIP du dossier, produits au fil de la lecture.
+    Si `cache`, l'archive est aussi écrite sur disque et publiée à la fin.
+    """
+    part_path = f"{archive_path(folder)}.{uuid.uuid4().hex}.part"
+    cache_file = open(part_path, 'wb') if cache else None
+    sink = _ZipSink(cache_file)
+    completed = False
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for path, arcname in _folder_files(folder):
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, 'rb') as src, archive.open(info, 'w', force_zip64=True) as dest:
+                    for block in iter(lambda: src.read(BLOCK_SIZE), b''):
+                        dest.write(block)
+                        yield from _drained(sink)
+                yield from _drained(sink)
+        yield from _drained(sink)
+        completed = True
+    finally:
+        if cache_file is not None:
+            cache_file.close()
+            if completed:
+                # Renommage atomique : un lecteur ne voit jamais d'archive incomplète
+                os.replace(part_path, archive_path(folder))
+            else:
+                # Téléchargement interrompu : archive partielle abandonnée
+                os.remove(part_path)
+
+
+def folder_zip_response(request, folder, filename):
+    """ Archive du dossier : fichier en cache (avec Range) s'il est à jour, sinon ZIP en flux. """
+    cached = cached_archive(folder)
+    if cached:
+        return ranged_file_response(request, cached, filename, 'application/zip')
+    response = StreamingHttpResponse(iter_zip(folder), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
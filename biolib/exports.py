@@ -0,0 +1,59 @@
+"""
+Export Excel des templates de campagne.
+
+openpyxl n'est importé qu'ici : ce module est chargé par la vue d'export au
+premier téléchargement, pas au démarrage du serveur.
+"""
+import openpyxl
+from openpyxl.styles import PatternFill, Font, Alignment
+
+
+def template_workbook(template):
+    """ Classeur au format attendu par insillyclo pour le template `template`. """
+    parts = template.parts.all().order_by('order')
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Assembly Template"
+
+    blue_fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
+    green_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+    bold_font = Font(bold=True)
+    center_align = Alignment(horizontal="center", vertical="center")
+
+    # Assembly Settings
+    ws['A1'] = "Assembly settings"; ws['A1'].font = bold_font; ws['A1'].fill = blue_fill
+    ws['A2'] = "Restriction enzyme"; ws['A2'].font = bold_font; ws['A2'].fill = blue_fill
+    ws['B2'] = template.enzyme; ws['B2'].fill = green_fill
+    ws['A3'] = "Name"; ws['A3'].font = bold_font; ws['A3'].fill = blue_fill
+    ws['B3'] = template.name; ws['B3'].fill = green_fill
+    ws['A4'] = "Output separator"; ws['A4'].font = bold_font; ws['A4'].fill = blue_fill
+    ws['B4'] = template.output_separator; ws['B4'].fill = green_fill
+
+    # Assembly Composition
+    base_row = 8
+    headers = [
+        "Assembly composition", "Part types ->", "Is optional part ->",
+        "Part name should be in output name ->", "Output plasmid id ↓"
+    ]
+    for i, text in enumerate(headers):
+        cell = ws.cell(row=base_row + i, column=1, value=text)
+        cell.font = bold_font; cell.fill = blue_fill
+
+    for index, part in enumerate(parts):
+        col_num = 2 + index
+        c1 = ws.cell(row=base_row, column=col_num, value=part.name); c1.fill = green_fill; c1.alignment = center_align
+        c2 = ws.cell(row=base_row + 1, column=col_num, value=part.type_id); c2.fill = green_fill; c2.alignment = center_align
+        
+        is_optional_str = "False" if part.is_mandatory else "True"
+        c3 = ws.cell(row=base_row + 2, column=col_num, value=is_optional_str); c3.fill = green_fill; c3.alignment = center_align
+        
+        in_output_str = "True" if part.include_in_output else "False"
+        c4 = ws.cell(row=base_row + 3, column=col_num, value=in_output_str); c4.fill = green_fill; c4.alignment = center_align
+        
+        c5 = ws.cell(row=base_row + 4, column=col_num, value="↓"); c5.fill = blue_fill; c5.alignment = center_align
+
+    ws.column_dimensions['A'].width = 35
+    for col in range(2, 2 + len(parts)):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
+
+    return wb
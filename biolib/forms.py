@@ -113,3 +113,43 @@ class SimulationForm(forms.ModelForm):
             'class': 'form-control',
             'accept': '.csv, .xls, .xlsx'
         })
+
+
+class SimulationBatchForm(forms.Form):
+    """
+    Lot de simulations : plusieurs templates, appariés dans l'ordre avec
+    autant de fichiers de mapping, ou tous avec un seul fichier de mapping.
+    Les fichiers sont lus dans request.FILES (champs multiples).
+    """
+    ALLOWED_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+    enzyme = forms.ChoiceField(
+        choices=Simulation.ENZYME_CHOICES,
+        initial='BsaI',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        files = kwargs.get('files') or (args[1] if len(args) > 1 else None)
+        self.template_files = files.getlist('template_files') if files else []
+        self.campaign_files = files.getlist('campaign_files') if files else []
+        super(SimulationBatchForm, self).__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.template_files:
+            raise forms.ValidationError("Ajoutez au moins un fichier template.")
+        if len(self.campaign_files) not in (1, len(self.template_files)):
+            raise forms.ValidationError(
+                "Donnez un fichier campagne par template, ou un seul pour tous les templates."
+            )
+        for f in self.template_files + self.campaign_files:
+            if not f.name.lower().endswith(self.ALLOWED_EXTENSIONS):
+                raise forms.ValidationError(f"Format non accepté : {f.name}")
+        return cleaned_data
+
+    def pairs(self):
+        """ (template, fichier campagne) de chaque simulation du lot. """
+        if len(self.campaign_files) == 1:
+            return [(template, self.campaign_files[0]) for template in self.template_files]
+        return list(zip(self.template_files, self.campaign_files))
@@ -0,0 +1,594 @@
+"""
+File d'attente des simulations.
+
+La requête HTTP ne fait qu'enregistrer la simulation (statut PENDING) puis la
+confie à un pool local de workers. La base de données sert de registre : un
+worker ne prend une simulation en charge que s'il parvient à faire passer
+atomiquement son statut de PENDING à RUNNING, ce qui évite qu'elle soit
+exécutée deux fois (plusieurs processus web, commande `process_simulations`).
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Plasmid, Simulation
+from . import search
+from .progress import ProgressRecorder, publish_stage
+from .restriction import ensure_scans, internal_sites
+from .storage import content_addressed_storage
+
+from my_insillyclo.cache import simulation_fingerprint
+
+# insillyclo, pandas et Biopython ne sont importés qu'au premier calcul
+# (imports dans les fonctions) : les processus qui ne servent que des pages
+# ne les chargent jamais.
+
+
+# ==============================================================================
+# POOL DE WORKERS
+# ==============================================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool partagé par le processus, créé au premier besoin. Sa première tâche
+    remet en file les simulations abandonnées par un processus précédent.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SIMULATION_WORKERS', 2),
+                thread_name_prefix='simulation',
+            )
+            _executor.submit(requeue_stale_simulations)
+        return _executor
+
+
+def enqueue_simulation(simulation_id):
+    """ Confie la simulation au pool une fois la transaction courante validée. """
+    publish_stage(simulation_id, 'queued')
+    transaction.on_commit(lambda: get_executor().submit(run_simulation, simulation_id))
+
+
+def enqueue_plasmid_parsing(plasmid_ids):
+    """ Parsing et indexation des plasmides importés, après validation de la transaction. """
+    plasmid_ids = list(plasmid_ids)
+    if plasmid_ids:
+        transaction.on_commit(lambda: get_executor().submit(parse_plasmids, plasmid_ids))
+
+
+_pending_scans = set()
+_pending_scans_lock = threading.Lock()
+
+
+def enqueue_restriction_scans(plasmid_ids):
+    """
+    Analyse des sites de restriction confiée au pool (pages de collection :
+    la requête affiche « analyse en cours » au lieu de calculer). Un plasmide
+    déjà en file dans ce processus n'est pas soumis une deuxième fois.
+    """
+    with _pending_scans_lock:
+        plasmid_ids = set(plasmid_ids) - _pending_scans
+        _pending_scans.update(plasmid_ids)
+    if plasmid_ids:
+        transaction.on_commit(lambda: get_executor().submit(scan_plasmids, plasmid_ids))
+
+
+def enqueue_batch(simulation_ids):
+    """ Confie un lot de simulations au pool : elles seront exécutées ensemble (voir run_simulation_batch). """
+    simulation_ids = list(simulation_ids)
+    for simulation_id in simulation_ids:
+        publish_stage(simulation_id, 'queued')
+    transaction.on_commit(lambda: get_executor().submit(run_simulation_batch, simulation_ids))
+
+
+# ==============================================================================
+# EXÉCUTION D'UNE SIMULATION
+# ==============================================================================
+
+# Paramètres passés au simulateur (ils font partie de l'empreinte des résultats),
+# dont les volumes de dilution réglés dans settings (voir pipeline.DILUTION_OPTIONS)
+SIMULATION_OPTIONS = {
+    'default_mass_concentration': 200,
+    **getattr(settings, 'SIMULATION_DILUTION_OPTIONS', {}),
+}
+
+
+def _claim(simulation_id):
+    """ Passe PENDING -> RUNNING ; renvoie False si un autre worker l'a déjà prise. """
+    return Simulation.objects.filter(
+        pk=simulation_id, status=Simulation.STATUS_PENDING
+    ).update(status=Simulation.STATUS_RUNNING, claimed_at=timezone.now()) == 1
+
+
+class Heartbeat:
+    """
+    Signe de vie des simulations RUNNING d'un worker : `claimed_at` est
+    rafraîchi, au plus toutes les SIMULATION_HEARTBEAT_INTERVAL secondes, à
+    chaque avancement publié (voir observers.ProgressObserver). Une simulation
+    sans signe de vie depuis SIMULATION_RUNNING_TIMEOUT est abandonnée.
+    """
+
+    def __init__(self, simulation_ids):
+        self.simulation_ids = list(simulation_ids)
+        self.interval = getattr(settings, 'SIMULATION_HEARTBEAT_INTERVAL', 30)
+        self._last = time.monotonic()
+
+    def beat(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        Simulation.objects.filter(
+            id__in=self.simulation_ids, status=Simulation.STATUS_RUNNING
+        ).update(claimed_at=timezone.now())
+
+
+def reset_stale_simulations(timeout=None):
+    """
+    Remet en attente (PENDING) les simulations RUNNING sans signe de vie
+    (Heartbeat) depuis plus de `timeout` secondes (SIMULATION_RUNNING_TIMEOUT) :
+    leur worker a disparu sans enregistrer de statut final. Renvoie leurs
+    identifiants.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'SIMULATION_RUNNING_TIMEOUT', 15 * 60)
+    limit = timezone.now() - timedelta(seconds=timeout)
+    stale = Simulation.objects.filter(status=Simulation.STATUS_RUNNING).filter(
+        Q(claimed_at__lt=limit) | Q(claimed_at__isnull=True)
+    )
+    stale_ids = list(stale.values_list('id', flat=True))
+    # Même condition à la mise à jour : une simulation terminée entre-temps n'est pas touchée
+    Simulation.objects.filter(id__in=stale_ids, status=Simulation.STATUS_RUNNING).filter(
+        Q(claimed_at__lt=limit) | Q(claimed_at__isnull=True)
+    ).update(status=Simulation.STATUS_PENDING, claimed_at=None)
+    for simulation_id in stale_ids:
+        publish_stage(simulation_id, 'queued')
+    return stale_ids
+
+
+def requeue_stale_simulations():
+    """
+    Au démarrage du pool : simulations abandonnées remises en file et
+    relancées dans ce processus (sans attendre `process_simulations`).
+    """
+    close_old_connections()
+    try:
+        stale_ids = reset_stale_simulations()
+        if stale_ids:
+            print(f"DEBUG: Simulations abandonnées remises en file : {stale_ids}")
+        for simulation_id in stale_ids:
+            get_executor().submit(run_simulation, simulation_id)
+        return stale_ids
+    except Exception:
+        print("\n!!! ERREUR REPRISE DES SIMULATIONS ABANDONNÉES !!!")
+        traceback.print_exc()
+        return []
+    finally:
+        close_old_connections()
+
+
+def run_simulation(simulation_id):
+    """ Point d'entrée d'un worker : exécute la simulation et enregistre son statut final. """
+    close_old_connections()
+    try:
+        if not _claim(simulation_id):
+            return
+        simulation = Simulation.objects.get(pk=simulation_id)
+        try:
+            _execute(simulation)
+        except Exception as e:
+            print(f"\n!!! ERREUR INSILLYCLO (simulation #{simulation_id}) !!!")
+            traceback.print_exc()
+            _fail(simulation, e)
+    finally:
+        close_old_connections()
+
+
+def _fail(simulation, error):
+    simulation.status = Simulation.STATUS_FAILED
+    simulation.error_message = str(error)
+    simulation.save(update_fields=['status', 'error_message'])
+    ProgressRecorder(simulation.id).finish('failed', simulation.error_message)
+
+
+def campaign_plasmids(template_path, mapping_paths, observer):
+    """
+    Plasmides réellement cités par la campagne, récupérés en une seule
+    requête sur l'identifiant (indexé) plutôt que toute la base.
+    """
+    from my_insillyclo.simulator import referenced_plasmid_ids
+
+    pids = referenced_plasmid_ids(template_path, mapping_paths, observer)
+    identifiers = pids | {f"{pid}.gb" for pid in pids}
+    return Plasmid.objects.filter(identifier__in=identifiers)
+
+
+def genbank_paths(plasmids):
+    """ Chemins des fichiers GenBank existants des plasmides de `plasmids`. """
+    plasmids = (
+        plasmids.exclude(genbank_file='')
+        .exclude(genbank_file__isnull=True)
+        .only('id', 'genbank_file')
+    )
+    paths = []
+    for p in plasmids:
+        file_path = p.genbank_file.path
+        if os.path.exists(file_path):
+            paths.append(file_path)
+    return paths
+
+
+def resolve_campaign_plasmids(template_path, mapping_paths, observer):
+    return genbank_paths(campaign_plasmids(template_path, mapping_paths, observer))
+
+
+def check_internal_sites(simulation, plasmids, observer):
+    """
+    Validation avant simulation : simple lecture des sites déjà calculés
+    (RestrictionSiteScan), sans redigérer les séquences.
+    """
+    try:
+        sites = internal_sites(plasmids, simulation.enzyme)
+    except ValueError as e:
+        # Enzyme absente du catalogue : insillyclo le signalera lui-même
+        print(f"DEBUG: Vérification des sites impossible : {e}")
+        return
+    for identifier, count in sorted(sites.items()):
+        observer.notify_message(
+            f"{identifier} : {count} sites {simulation.enzyme} (site interne à la pièce)"
+        )
+
+
+def _execute(simulation):
+    from my_insillyclo.simulator import compute_all
+    from .observers import ProgressObserver
+
+    output_folder = simulation.get_output_folder()
+    path_xlsx, path_csv_list = _campaign_paths(simulation)
+
+    observer = ProgressObserver(ProgressRecorder(simulation.id), Heartbeat([simulation.id]))
+    observer.notify_stage('resolve')
+    plasmids = campaign_plasmids(path_xlsx, path_csv_list, observer)
+    gb_plasmids_paths = genbank_paths(plasmids)
+
+    # Entrées déjà simulées : on reprend le résultat existant. L'empreinte est
+    # calculée ici, dans le worker, avec les plasmides qui viennent d'être résolus.
+    if serve_cached_result(simulation, gb_plasmids_paths):
+        return
+    check_internal_sites(simulation, plasmids, observer)
+
+    compute_all(
+        observer=observer,
+        settings=None,
+        input_template_filled=path_xlsx,
+        input_parts_files=path_csv_list,
+        gb_plasmids=gb_plasmids_paths,
+        output_dir=output_folder,
+        data_source="Django",
+        enzyme_names=simulation.enzyme,
+        patch_workers=getattr(settings, 'SIMULATION_PATCH_WORKERS', None),
+        **SIMULATION_OPTIONS
+    )
+
+    _record_result(simulation)
+
+
+def _record_result(simulation):
+    """ Simulation terminée : statut et fichier de résultat principal. """
+    output_folder = simulation.get_output_folder()
+    output_dir = simulation.get_output_dir()
+    simulation.status = Simulation.STATUS_COMPLETED
+    if os.path.exists(os.path.join(output_folder, 'digestion.svg')):
+        simulation.result_file = f"{output_dir}/digestion.svg"
+    elif os.path.exists(os.path.join(output_folder, 'dilutions_calculated.csv')):
+        simulation.result_file = f"{output_dir}/dilutions_calculated.csv"
+    simulation.save(update_fields=['status', 'result_file'])
+    ProgressRecorder(simulation.id).finish('completed')
+
+
+# ==============================================================================
+# CACHE DES RÉSULTATS
+# ==============================================================================
+
+def _campaign_paths(simulation):
+    template_path = simulation.template_file.path
+    mapping_paths = [simulation.campaign_file.path] if simulation.campaign_file else []
+    return template_path, mapping_paths
+
+
+def compute_fingerprint(simulation, plasmid_paths=None):
+    """ Empreinte des entrées de la simulation ('' si elles ne sont pas lisibles). """
+    template_path, mapping_paths = _campaign_paths(simulation)
+    try:
+        if plasmid_paths is None:
+            from .observers import DjangoConsoleObserver
+            plasmid_paths = resolve_campaign_plasmids(template_path, mapping_paths, DjangoConsoleObserver())
+        return simulation_fingerprint(
+            template_path, mapping_paths, plasmid_paths, simulation.enzyme, **SIMULATION_OPTIONS
+        )
+    except Exception as e:
+        # Entrées invalides : la simulation échouera dans le worker avec un message clair
+        print(f"DEBUG: Empreinte impossible pour la simulation #{simulation.id}: {e}")
+        return ''
+
+
+def serve_cached_result(simulation, plasmid_paths=None):
+    """
+    Si une simulation terminée a la même empreinte et que ses fichiers existent
+    toujours, la nouvelle simulation pointe vers le même dossier de sortie :
+    résultat immédiat, sans recalcul ni copie. Renvoie True dans ce cas.
+    """
+    simulation.fingerprint = compute_fingerprint(simulation, plasmid_paths)
+    simulation.save(update_fields=['fingerprint'])
+    if not simulation.fingerprint:
+        return False
+
+    previous_runs = (
+        Simulation.objects.filter(fingerprint=simulation.fingerprint, status=Simulation.STATUS_COMPLETED)
+        .exclude(pk=simulation.pk)
+        .order_by('-date_run')
+    )
+    for previous in previous_runs:
+        if os.path.isdir(previous.get_output_folder()):
+            _share_result(simulation, previous)
+            return True
+    return False
+
+
+def _share_result(simulation, previous):
+    """ `simulation` reprend le dossier de sortie et le résultat de `previous`. """
+    simulation.output_dir = previous.get_output_dir()
+    simulation.result_file = previous.result_file
+    simulation.status = Simulation.STATUS_COMPLETED
+    simulation.save(update_fields=['output_dir', 'result_file', 'status'])
+    ProgressRecorder(simulation.id).finish('completed')
+
+
+# ==============================================================================
+# LOTS DE SIMULATIONS
+# ==============================================================================
+
+def create_simulation_from_files(user, template_path, mapping_path=None, enzyme='BsaI'):
+    """ Simulation PENDING créée à partir de fichiers locaux (commandes de gestion). """
+    simulation = Simulation(user=user, enzyme=enzyme, status=Simulation.STATUS_PENDING)
+    with open(template_path, 'rb') as f:
+        simulation.template_file.save(os.path.basename(template_path), File(f), save=False)
+    if mapping_path:
+        with open(mapping_path, 'rb') as f:
+            simulation.campaign_file.save(os.path.basename(mapping_path), File(f), save=False)
+    simulation.save()
+    return simulation
+
+
+def _batch_plasmid_paths(referenced):
+    """
+    Chemins des GenBank de chaque simulation du lot, pour toutes les
+    simulations en une seule requête. `referenced` : id -> pID cités.
+    """
+    identifiers = set()
+    for pids in referenced.values():
+        identifiers |= pids | {f"{pid}.gb" for pid in pids}
+    by_identifier = {}
+    plasmids = (
+        Plasmid.objects.filter(identifier__in=identifiers)
+        .exclude(genbank_file='')
+        .exclude(genbank_file__isnull=True)
+        .only('id', 'identifier', 'genbank_file')
+    )
+    for p in plasmids:
+        file_path = p.genbank_file.path
+        if os.path.exists(file_path):
+            by_identifier.setdefault(p.identifier, []).append(file_path)
+
+    paths = {}
+    for simulation_id, pids in referenced.items():
+        wanted = pids | {f"{pid}.gb" for pid in pids}
+        paths[simulation_id] = [path for identifier in sorted(wanted) for path in by_identifier.get(identifier, [])]
+    return paths
+
+
+def run_simulation_batch(simulation_ids, jobs=None):
+    """
+    Exécute un lot de simulations : plasmides résolus en une requête,
+    simulations identiques calculées une seule fois, puis campagnes réparties
+    sur un pool de processus (my_insillyclo/batch.py). Renvoie les résultats
+    (CampaignResult) des campagnes réellement calculées.
+    """
+    from my_insillyclo.batch import Campaign, run_batch
+    from my_insillyclo.simulator import referenced_plasmid_ids
+    from .observers import DjangoConsoleObserver
+
+    close_old_connections()
+    try:
+        claimed = [simulation_id for simulation_id in simulation_ids if _claim(simulation_id)]
+        simulations = Simulation.objects.in_bulk(claimed)
+        heartbeat = Heartbeat(claimed)
+        for simulation_id in claimed:
+            publish_stage(simulation_id, 'resolve')
+        observer = DjangoConsoleObserver()
+
+        results = []
+        try:
+            referenced = {}
+            for simulation in simulations.values():
+                try:
+                    referenced[simulation.id] = referenced_plasmid_ids(*_campaign_paths(simulation), observer)
+                except Exception as e:
+                    _fail(simulation, e)
+            plasmid_paths = _batch_plasmid_paths(referenced)
+
+            # Une seule exécution par empreinte ; les doublons reprendront son résultat
+            campaigns, leaders, followers = [], {}, {}
+            for simulation_id in referenced:
+                simulation = simulations[simulation_id]
+                if serve_cached_result(simulation, plasmid_paths[simulation_id]):
+                    continue
+                leader = leaders.get(simulation.fingerprint) if simulation.fingerprint else None
+                if leader is not None:
+                    followers.setdefault(leader, []).append(simulation)
+                    continue
+                leaders[simulation.fingerprint] = simulation_id
+
+                pids = referenced[simulation_id]
+                check_internal_sites(
+                    simulation, Plasmid.objects.filter(identifier__in=pids | {f"{pid}.gb" for pid in pids}), observer
+                )
+                template_path, mapping_paths = _campaign_paths(simulation)
+                campaigns.append(Campaign(
+                    key=simulation_id,
+                    template_path=template_path,
+                    mapping_paths=mapping_paths,
+                    gb_plasmids=plasmid_paths[simulation_id],
+                    output_dir=simulation.get_output_folder(),
+                    enzyme=simulation.enzyme,
+                ))
+
+            # Les campagnes tournent dans d'autres processus : avancement par campagne seulement
+            for campaign in campaigns:
+                publish_stage(campaign.key, 'assembly')
+            for result in run_batch(campaigns, jobs or getattr(settings, 'SIMULATION_BATCH_JOBS', None), **SIMULATION_OPTIONS):
+                heartbeat.beat()
+                results.append(result)
+                simulation = simulations[result.key]
+                for message in result.messages:
+                    print(f"[INSILLYCLO #{simulation.id}] {message}")
+                if result.ok:
+                    _record_result(simulation)
+                    for follower in followers.get(simulation.id, []):
+                        _share_result(follower, simulation)
+                else:
+                    _fail(simulation, result.error)
+                    for follower in followers.get(simulation.id, []):
+                        _fail(follower, result.error)
+        except Exception as e:
+            # Erreur hors d'une campagne (base, pool de processus...) : aucune
+            # simulation prise en charge ne doit rester RUNNING
+            print("\n!!! ERREUR DU LOT DE SIMULATIONS !!!")
+            traceback.print_exc()
+            for simulation in simulations.values():
+                if simulation.status == Simulation.STATUS_RUNNING:
+                    _fail(simulation, e)
+        return results
+    finally:
+        close_old_connections()
+
+
+# ==============================================================================
+# SITES DE RESTRICTION EN ARRIÈRE-PLAN
+# ==============================================================================
+
+def scan_plasmids(plasmid_ids):
+    """ Point d'entrée d'un worker : analyse les plasmides de `plasmid_ids` (voir restriction.py). """
+    close_old_connections()
+    try:
+        ensure_scans(Plasmid.objects.filter(id__in=plasmid_ids))
+    except Exception:
+        print("\n!!! ERREUR ANALYSE DES SITES DE RESTRICTION !!!")
+        traceback.print_exc()
+    finally:
+        with _pending_scans_lock:
+            _pending_scans.difference_update(plasmid_ids)
+        close_old_connections()
+
+
+# ==============================================================================
+# PLASMIDS IMPORTÉS : PARSING EN ARRIÈRE-PLAN
+# ==============================================================================
+
+PARSE_BATCH_SIZE = 500
+
+
+def parse_plasmids(plasmid_ids):
+    """
+    Renseigne la séquence des plasmides importés sans séquence (voir
+    biolib/uploads.py), par lots, puis les indexe et analyse leurs sites de
+    restriction. Les fichiers FASTA / SnapGene sont d'abord convertis en
+    GenBank ; un plasmide dont la séquence est déjà dans sa collection est
+    supprimé (doublon). Renvoie le nombre de plasmides parsés.
+    """
+    from my_insillyclo.sequence import SEQUENCE_FIELDS, parse_sequence_file, sequence_format
+    from .uploads import UploadError, convert_stored_file
+
+    close_old_connections()
+    parsed = 0
+    try:
+        plasmid_ids = list(plasmid_ids)
+        for start in range(0, len(plasmid_ids), PARSE_BATCH_SIZE):
+            plasmids = Plasmid.objects.filter(
+                id__in=plasmid_ids[start:start + PARSE_BATCH_SIZE], sequence=''
+            ).only('id', 'collection_id', 'identifier', 'genbank_file').order_by('id')
+            updated, replaced = [], {}
+            for plasmid in plasmids:
+                if not plasmid.genbank_file:
+                    continue
+                if sequence_format(plasmid.genbank_file.name) != 'genbank':
+                    try:
+                        converted = convert_stored_file(plasmid)
+                    except UploadError as e:
+                        print(f"DEBUG: {e}")
+                        continue
+                    replaced[plasmid.id] = plasmid.genbank_file.name
+                    plasmid.genbank_file = converted
+                _, _, fields, error = parse_sequence_file(plasmid.genbank_file.path)
+                if error:
+                    print(f"DEBUG: Séquence illisible dans {plasmid.identifier}: {error}")
+                    continue
+                for field, value in fields.items():
+                    setattr(plasmid, field, value)
+                updated.append(plasmid)
+
+            # Doublons : même séquence qu'un plasmide déjà dans la collection,
+            # ou qu'un plasmide précédent du lot
+            seen = set(
+                Plasmid.objects.filter(
+                    collection_id__in={p.collection_id for p in updated},
+                    checksum__in={p.checksum for p in updated},
+                ).exclude(id__in=[p.id for p in updated]).values_list('collection_id', 'checksum')
+            )
+            duplicates = []
+            for plasmid in updated:
+                key = (plasmid.collection_id, plasmid.checksum)
+                if key in seen:
+                    duplicates.append(plasmid)
+                else:
+                    seen.add(key)
+            updated = [p for p in updated if p not in duplicates]
+
+            Plasmid.objects.bulk_update(updated, SEQUENCE_FIELDS + ['genbank_file'], batch_size=PARSE_BATCH_SIZE)
+            # bulk_update n'envoie pas de signaux : fichiers d'origine libérés ici
+            for plasmid in updated:
+                if plasmid.id in replaced:
+                    content_addressed_storage.release(replaced[plasmid.id])
+            if duplicates:
+                # Le fichier d'origine est libéré par la suppression, pas sa conversion
+                for plasmid in duplicates:
+                    if plasmid.id in replaced:
+                        content_addressed_storage.release(plasmid.genbank_file.name)
+                print(f"DEBUG: Doublons supprimés (séquence déjà dans la collection) : "
+                      f"{', '.join(p.identifier for p in duplicates)}")
+                Plasmid.objects.filter(id__in=[p.id for p in duplicates]).delete()
+            for plasmid in updated:
+                search.index_plasmid(plasmid)
+            ensure_scans(Plasmid.objects.filter(id__in=[p.id for p in updated]))
+            parsed += len(updated)
+        return parsed
+    except Exception:
+        print("\n!!! ERREUR PARSING DES PLASMIDES IMPORTÉS !!!")
+        traceback.print_exc()
+        return parsed
+    finally:
+        close_old_connections()
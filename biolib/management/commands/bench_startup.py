@@ -0,0 +1,80 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Dépendances lourdes qui ne doivent pas être chargées au démarrage
+HEAVY_MODULES = ('numpy', 'pandas', 'Bio', 'insillyclo', 'openpyxl', 'sbol2', 'matplotlib')
+
+# Démarrage à froid mesuré : chaque scénario tourne dans un processus neuf
+SCENARIOS = {
+    'check': [os.path.join(settings.BASE_DIR, 'manage.py'), 'check'],
+    # Application WSGI + résolution des URLs, comme à la première requête
+    'wsgi': ['-c', (
+        "from my_insillyclo.wsgi import application\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns"
+    )],
+}
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| +(\S+)$')
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de démarrage à froid (manage.py check, application WSGI) et les imports coûteux"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Démarrages mesurés par scénario")
+        parser.add_argument('--top', type=int, default=10, help="Nombre de modules les plus lents à importer affichés")
+
+    def run(self, args, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+        start = time.perf_counter()
+        result = subprocess.run(
+            command, cwd=settings.BASE_DIR, capture_output=True, text=True, env=os.environ.copy()
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            self.stdout.write(self.style.ERROR(result.stderr.strip()))
+        return elapsed, result.stderr
+
+    def import_times(self, stderr):
+        """ (module, temps propre en s) de chaque import, du plus lent au plus rapide, et modules lourds chargés. """
+        imports, heavy = [], set()
+        for line in stderr.splitlines():
+            match = _IMPORT_TIME.match(line)
+            if not match:
+                continue
+            own, _, module = match.groups()
+            if module.split('.')[0] in HEAVY_MODULES:
+                heavy.add(module.split('.')[0])
+            imports.append((module, int(own) / 1e6))
+        return sorted(imports, key=lambda item: -item[1]), sorted(heavy)
+
+    def handle(self, *args, **options):
+        ok = True
+        for name, scenario in SCENARIOS.items():
+            self.stdout.write(f"--- {name} ---")
+            timings = [self.run(scenario)[0] for _ in range(options['repeat'])]
+            self.stdout.write(
+                f"   médiane {statistics.median(timings):.2f} s, min {min(timings):.2f} s "
+                f"({options['repeat']} démarrages)"
+            )
+
+            _, stderr = self.run(scenario, importtime=True)
+            imports, heavy = self.import_times(stderr)
+            for module, seconds in imports[:options['top']]:
+                self.stdout.write(f"   {seconds * 1000:7.0f} ms  {module}")
+            if heavy:
+                ok = False
+                self.stdout.write(self.style.WARNING(f"   ! Dépendances lourdes importées : {', '.join(heavy)}"))
+
+        if ok:
+            self.stdout.write(self.style.SUCCESS("--- Aucune dépendance lourde chargée au démarrage ---"))
+        else:
+            self.stdout.write(self.style.WARNING("--- Des dépendances lourdes sont chargées au démarrage ---"))
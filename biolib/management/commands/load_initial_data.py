@@ -1,16 +1,117 @@
+import hashlib
+import itertools
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from django.core.files import File
-from biolib.models import Plasmid, PlasmidCollection, User
+from django.db import transaction
+from biolib.models import ContentBlob, Plasmid, PlasmidCollection, User
+from biolib.stats import invalidate_team_stats
+from biolib.storage import content_addressed_storage, digest_from_name
+from biolib.uploads import UploadError, convert_to_genbank
+from my_insillyclo.sequence import SEQUENCE_FIELDS, SEQUENCE_FORMATS, parse_sequence_file, sequence_format
+
+# En dessous, le pool de processus coûte plus qu'il ne rapporte
+POOL_MIN_FILES = 64
+BATCH_SIZE = 500
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _parse_entry(path, known_digest, directory):
+    """
+    (chemin à stocker, SHA-256, taille, champs, erreur) du fichier `path`.
+    Comme à l'import par le navigateur, les FASTA / SnapGene sont d'abord
+    convertis en GenBank (dans `directory`) : l'empreinte est celle du
+    fichier converti, celui qui est stocké.
+    """
+    if sequence_format(path) != 'genbank':
+        try:
+            path = convert_to_genbank(path, os.path.basename(path), directory)
+        except UploadError as e:
+            return path, '', 0, None, str(e)
+    return (path,) + parse_sequence_file(path, known_digest)
+
 
 class Command(BaseCommand):
     help = 'Charge les plasmides récursivement depuis le dossier data_web et ses sous-dossiers'
 
-    def handle(self, *args, **kwargs):
-        data_dir = os.path.join(settings.BASE_DIR, 'data_web')
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help="Dossier à importer (défaut : data_web)")
+        parser.add_argument('--jobs', type=int, default=None, help="Processus de parsing (défaut : nombre de CPU)")
+
+    def find_files(self, data_dir):
+        """ (nom de collection, chemin, nom de fichier, identifiant) de chaque fichier de séquence. """
+        entries = []
+        for root, dirs, files in os.walk(data_dir):
+            dirs.sort()
+            # 'root' est le chemin du sous-dossier actuel (ex: .../data_web/pMISC)
+            # On utilise le nom du sous-dossier comme nom de Collection !
+            folder_name = os.path.basename(root)
 
-        self.stdout.write(f"--- Démarrage de l'import Récursif ---")
+            # Si on est à la racine 'data_web', on donne un nom générique
+            if os.path.normpath(root) == os.path.normpath(data_dir):
+                collection_name = "Import Racine"
+            else:
+                collection_name = f"Collection {folder_name}"
+
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower() in SEQUENCE_FORMATS:
+                    entries.append((collection_name, os.path.join(root, filename), filename, os.path.splitext(filename)[0]))
+        return entries
+
+    def known_digests(self, existing):
+        """
+        Identifiant -> SHA-256 du fichier déjà importé (None s'il n'y en a pas).
+        Une ligne sans checksum n'a jamais été parsée (import antérieur au
+        parsing complet) : pas d'empreinte, elle sera reparsée même si le
+        fichier n'a pas changé.
+        """
+        stored = {digest_from_name(name) for _, name, _ in existing.values()} - {None}
+        blob_digests = set(ContentBlob.objects.filter(digest__in=stored).values_list('digest', flat=True))
+        digests = {}
+        for identifier, (_, name, checksum) in existing.items():
+            if not checksum:
+                digests[identifier] = None
+                continue
+            digest = digest_from_name(name)
+            if digest not in blob_digests:
+                digest = None
+            if digest is None and name and content_addressed_storage.exists(name):
+                # Fichier importé avant le stockage adressé par contenu
+                digest = _file_sha256(content_addressed_storage.path(name))
+            digests[identifier] = digest
+        return digests
+
+    def parse_all(self, paths, known, jobs, directory):
+        if jobs == 1 or len(paths) < POOL_MIN_FILES:
+            return [_parse_entry(path, digest, directory) for path, digest in zip(paths, known)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(_parse_entry, paths, known, itertools.repeat(directory), chunksize=32))
+
+    def handle(self, *args, **options):
+        # Fichiers convertis en GenBank, le temps de les ranger dans le stockage
+        directory = tempfile.mkdtemp(prefix='biolib-load-')
+        try:
+            self.load(directory, **options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def load(self, directory, **options):
+        data_dir = options['dir'] or os.path.join(settings.BASE_DIR, 'data_web')
+        start = time.perf_counter()
+
+        self.stdout.write("--- Démarrage de l'import Récursif ---")
         self.stdout.write(f"Racine de recherche : {data_dir}")
 
         if not os.path.exists(data_dir):
@@ -23,63 +124,90 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("Erreur : Aucun administrateur trouvé."))
             return
 
-        # 2. On parcourt tout l'arbre de dossiers (os.walk)
-        count_success = 0
+        # 2. On parcourt tout l'arbre de dossiers ; un identifiant n'est importé qu'une fois
+        entries, seen = [], set()
         count_ignored = 0
-
-        for root, dirs, files in os.walk(data_dir):
-            # 'root' est le chemin du sous-dossier actuel (ex: .../data_web/pMISC)
-            # On utilise le nom du sous-dossier comme nom de Collection !
-            folder_name = os.path.basename(root)
-
-            # Si on est à la racine 'data_web', on donne un nom générique
-            if folder_name == 'data_web':
-                collection_name = "Import Racine"
-            else:
-                collection_name = f"Collection {folder_name}"
-
-            # On cherche les fichiers valides dans ce sous-dossier
-            valid_files = [f for f in files if f.lower().endswith(('.gb', '.dna', '.fasta'))]
-
-            if not valid_files:
+        for entry in self.find_files(data_dir):
+            if entry[3] in seen:
+                count_ignored += 1
                 continue
+            seen.add(entry[3])
+            entries.append(entry)
+        if not entries:
+            self.stdout.write(self.style.SUCCESS("--- Bilan : aucun fichier de séquence trouvé ---"))
+            return
 
-            # 3. Création/Récupération de la collection pour ce sous-dossier
-            collection, created = PlasmidCollection.objects.get_or_create(
-                name=collection_name,
-                defaults={'owner': admin_user}
+        # 3. Plasmides déjà en base : une seule requête pour tous les identifiants
+        existing = {
+            identifier: (pk, name, checksum)
+            for pk, identifier, name, checksum in Plasmid.objects.filter(identifier__in=seen)
+            .order_by('id').values_list('id', 'identifier', 'genbank_file', 'checksum')
+        }
+        known = self.known_digests(existing)
+
+        # 4. Conversion en GenBank, empreinte et parsing en parallèle (les fichiers
+        #    inchangés et déjà parsés ne le sont pas)
+        paths = [path for _, path, _, _ in entries]
+        results = self.parse_all(
+            paths, [known.get(identifier) for _, _, _, identifier in entries], options['jobs'], directory,
+        )
+
+        to_store, created, updated = [], [], []
+        count_errors = 0
+        for (collection_name, _, filename, identifier), (path, digest, size, fields, error) in zip(entries, results):
+            if error:
+                count_errors += 1
+                self.stdout.write(self.style.ERROR(f"Erreur sur {filename}: {error}"))
+                continue
+            if fields is None:
+                count_ignored += 1
+                continue
+            if identifier in existing:
+                plasmid = Plasmid(id=existing[identifier][0], identifier=identifier)
+                updated.append((plasmid, existing[identifier][1]))
+            else:
+                plasmid = Plasmid(identifier=identifier, name=identifier)
+                created.append((plasmid, collection_name))
+            to_store.append(((os.path.basename(path), path, digest, size), plasmid))
+            for field, value in fields.items():
+                setattr(plasmid, field, value)
+
+        # 5. Collections, fichiers et lignes en une transaction
+        with transaction.atomic():
+            collections = {}
+            for collection_name in sorted({name for _, name in created}):
+                collections[collection_name], was_created = PlasmidCollection.objects.get_or_create(
+                    name=collection_name,
+                    defaults={'owner': admin_user}
+                )
+                if was_created:
+                    self.stdout.write(self.style.SUCCESS(f" > Nouvelle collection créée : {collection_name}"))
+
+            stored_names = content_addressed_storage.save_many(
+                Plasmid.genbank_file.field.upload_to, [item for item, _ in to_store]
             )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f" > Nouvelle collection créée : {collection_name}"))
-
-            # 4. Traitement des fichiers
-            for filename in valid_files:
-                file_path = os.path.join(root, filename)
-                identifier = os.path.splitext(filename)[0]
-
-                if Plasmid.objects.filter(identifier=identifier).exists():
-                    count_ignored += 1
-                    continue
-
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f_read:
-                        content = f_read.read()
-
-                        plasmid = Plasmid(
-                            collection=collection,
-                            identifier=identifier,
-                            name=identifier,
-                            sequence=content[:200] + "..."
-                        )
-
-                        # Mode binaire pour le fichier
-                        with open(file_path, 'rb') as f_byte:
-                            plasmid.genbank_file.save(filename, File(f_byte), save=True)
-
-                        count_success += 1
-                        self.stdout.write(f"   + {filename} (dans {collection_name})")
-
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Erreur sur {filename}: {e}"))
-
-        self.stdout.write(self.style.SUCCESS(f"--- Bilan : {count_success} importés, {count_ignored} ignorés (déjà existants) ---"))
+            for (_, plasmid), name in zip(to_store, stored_names):
+                plasmid.genbank_file.name = name
+
+            for plasmid, collection_name in created:
+                plasmid.collection = collections[collection_name]
+            Plasmid.objects.bulk_create([p for p, _ in created], batch_size=BATCH_SIZE)
+            Plasmid.objects.bulk_update(
+                [p for p, _ in updated], SEQUENCE_FIELDS + ['genbank_file'], batch_size=BATCH_SIZE
+            )
+            # Anciens fichiers des plasmides mis à jour : une référence en moins
+            old_names = [name for _, name in updated if name]
+            transaction.on_commit(lambda: [content_addressed_storage.release(n) for n in old_names])
+            # bulk_create n'envoie pas de signaux : compteurs des équipes à recalculer
+            transaction.on_commit(invalidate_team_stats)
+
+        for plasmid, collection_name in created:
+            self.stdout.write(f"   + {plasmid.identifier} (dans {collection_name})")
+        for plasmid, _ in updated:
+            self.stdout.write(f"   ~ {plasmid.identifier} (fichier modifié ou jamais parsé)")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"--- Bilan : {len(created)} importés, {len(updated)} mis à jour, "
+            f"{count_ignored} ignorés (déjà existants), {count_errors} erreurs, en {elapsed:.1f} s ---"
+        ))
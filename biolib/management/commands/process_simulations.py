@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from biolib.jobs import reset_stale_simulations, run_simulation
+from biolib.models import Simulation
+
+
+class Command(BaseCommand):
+    help = "Exécute les simulations en attente (PENDING) hors du serveur web"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Continue à surveiller la file d'attente")
+        parser.add_argument('--interval', type=float, default=5.0, help="Délai entre deux relevés (secondes)")
+        parser.add_argument(
+            '--stale-after', type=float, default=None,
+            help="Durée (s) après laquelle une simulation RUNNING est remise en file (défaut : SIMULATION_RUNNING_TIMEOUT)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Simulations dont le worker a disparu (processus tué, redémarrage)
+            for simulation_id in reset_stale_simulations(options['stale_after']):
+                self.stdout.write(self.style.WARNING(f"Simulation #{simulation_id} abandonnée : remise en file"))
+
+            pending_ids = list(
+                Simulation.objects.filter(status=Simulation.STATUS_PENDING)
+                .order_by('date_run')
+                .values_list('id', flat=True)
+            )
+            for simulation_id in pending_ids:
+                self.stdout.write(f"Simulation #{simulation_id}...")
+                run_simulation(simulation_id)
+                status = Simulation.objects.values_list('status', flat=True).get(pk=simulation_id)
+                self.stdout.write(f"   -> {status}")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("--- File d'attente vide ---"))
@@ -0,0 +1,128 @@
+import fnmatch
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from biolib.jobs import create_simulation_from_files, run_simulation_batch
+from biolib.models import Simulation
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute plusieurs campagnes en un seul lot, sans serveur web : couples "
+        "template + mapping (--pair) et/ou toutes les campagnes d'un dossier (--dir)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pair', nargs=2, action='append', default=[], metavar=('TEMPLATE', 'MAPPING'),
+            help="Template et fichier de mapping d'une campagne (option répétable)",
+        )
+        parser.add_argument('--dir', help="Dossier parcouru récursivement (templates + iP_mapping*.csv)")
+        parser.add_argument(
+            '--templates', nargs='+', default=['*.xlsx', '*.csv'],
+            help="Motifs des fichiers template avec --dir (défaut : *.xlsx *.csv)",
+        )
+        parser.add_argument('--mappings', default='iP_mapping*.csv', help="Motif des fichiers de mapping avec --dir")
+        parser.add_argument('--user', help="Email du propriétaire (défaut : premier administrateur)")
+        parser.add_argument('--enzyme', default='BsaI', choices=[e for e, _ in Simulation.ENZYME_CHOICES])
+        parser.add_argument('--jobs', type=int, default=None, help="Nombre de processus du lot")
+        parser.add_argument('--dry-run', action='store_true', help="Liste les campagnes sans les simuler")
+
+    def find_campaigns(self, directory, template_patterns, mapping_pattern):
+        """
+        (template, mapping) : chaque template avec le fichier de mapping de son
+        dossier. Les CSV annexes (primers, concentrations) ne sont pas des templates.
+        """
+        from my_insillyclo.campaign_files import is_template_csv
+
+        if isinstance(template_patterns, str):
+            template_patterns = [template_patterns]
+        campaigns = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            # Fichiers temporaires d'Excel (~$...) ignorés
+            files = sorted(f for f in files if not f.startswith(('.', '~$')))
+            mappings = [f for f in files if fnmatch.fnmatch(f, mapping_pattern)]
+            templates = [
+                f for f in files
+                if any(fnmatch.fnmatch(f, pattern) for pattern in template_patterns)
+                and f not in mappings
+                and (not f.lower().endswith('.csv') or is_template_csv(os.path.join(root, f)))
+            ]
+            if not templates:
+                continue
+            if not mappings:
+                self.stdout.write(self.style.WARNING(f"   ! {root} : aucun fichier {mapping_pattern}, ignoré"))
+                continue
+            if len(mappings) > 1:
+                self.stdout.write(self.style.WARNING(f"   ! {root} : plusieurs mappings, {mappings[0]} utilisé"))
+            for template in templates:
+                campaigns.append((os.path.join(root, template), os.path.join(root, mappings[0])))
+        return campaigns
+
+    def handle(self, *args, **options):
+        if not options['pair'] and not options['dir']:
+            raise CommandError("Indiquez au moins une campagne (--pair) ou un dossier (--dir).")
+
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError("Utilisateur introuvable (--user) ou aucun administrateur.")
+
+        campaigns = [(os.path.abspath(template), os.path.abspath(mapping)) for template, mapping in options['pair']]
+        if options['dir']:
+            directory = os.path.abspath(options['dir'])
+            if not os.path.isdir(directory):
+                raise CommandError(f"Dossier introuvable : {directory}")
+            self.stdout.write(f"--- Recherche des campagnes dans {directory} ---")
+            campaigns += self.find_campaigns(directory, options['templates'], options['mappings'])
+        for template, mapping in campaigns:
+            self.stdout.write(f"   + {template} ({os.path.basename(mapping)})")
+        if not campaigns:
+            self.stdout.write(self.style.WARNING("Aucune campagne trouvée."))
+            return
+        if options['dry_run']:
+            return
+
+        start = time.perf_counter()
+        try:
+            simulation_ids = [
+                create_simulation_from_files(user, template, mapping, options['enzyme']).id
+                for template, mapping in campaigns
+            ]
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Lot de {len(simulation_ids)} simulations...")
+        results = run_simulation_batch(simulation_ids, jobs=options['jobs'])
+        wall = time.perf_counter() - start
+
+        simulations = Simulation.objects.filter(id__in=simulation_ids).order_by('id')
+        for simulation in simulations:
+            line = f"   #{simulation.id} {simulation.template_filename()} -> {simulation.status}"
+            if simulation.error_message:
+                line += f" ({simulation.error_message})"
+            self.stdout.write(line)
+
+        # Bilan de débit
+        completed = sum(s.status == Simulation.STATUS_COMPLETED for s in simulations)
+        computed = len(results)
+        busy = sum(r.elapsed for r in results)
+        self.stdout.write(
+            f"--- Bilan : {completed}/{len(simulation_ids)} terminées, "
+            f"{computed} calculées, {len(simulation_ids) - computed} reprises ou non lancées ---"
+        )
+        self.stdout.write(
+            f"--- Durée : {wall:.1f} s, {len(simulation_ids) / wall * 60:.1f} campagnes/min, "
+            f"{busy / computed if computed else 0:.1f} s de calcul par campagne, "
+            f"parallélisme effectif {busy / wall:.1f} ---"
+        )
+        if completed == len(simulation_ids):
+            self.stdout.write(self.style.SUCCESS("--- Lot terminé ---"))
+        else:
+            self.stdout.write(self.style.WARNING("--- Lot terminé avec des échecs ---"))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from biolib.models import Plasmid
+from biolib.restriction import ensure_scans
+from my_insillyclo.restriction_scan import GOLDEN_GATE_ENZYMES
+
+
+class Command(BaseCommand):
+    help = "Calcule les sites de restriction de tous les plasmides (résultats manquants ou périmés)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enzymes', nargs='+', default=list(GOLDEN_GATE_ENZYMES),
+            help="Enzymes à rechercher (défaut : enzymes Golden Gate)"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ensure_scans(Plasmid.objects.all(), options['enzymes'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"--- Sites {', '.join(options['enzymes'])} à jour ({elapsed:.2f} s) ---"
+        ))
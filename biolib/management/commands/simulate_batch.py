@@ -0,0 +1,6 @@
+from .run_simulation_batch import Command as RunSimulationBatchCommand
+
+
+class Command(RunSimulationBatchCommand):
+    """ Alias historique de run_simulation_batch (mêmes options). """
+    help = RunSimulationBatchCommand.help + " [alias de run_simulation_batch]"
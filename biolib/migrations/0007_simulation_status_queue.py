@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0006_remove_team_visibility_campaigntemplate_team_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulation',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='simulation',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('COMPLETED', 'Terminée'), ('FAILED', 'Échec')], db_index=True, default='PENDING', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0007_simulation_status_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='plasmid',
+            name='identifier',
+            field=models.CharField(db_index=True, help_text='Code labo (ex: pYTK045)', max_length=100),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0008_plasmid_identifier_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulation',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='simulation',
+            name='output_dir',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+import biolib.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0009_simulation_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='correspondence',
+            name='file',
+            field=models.FileField(max_length=255, storage=biolib.storage.ContentAddressedStorage(), upload_to='correspondences/'),
+        ),
+        migrations.AlterField(
+            model_name='plasmid',
+            name='genbank_file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=biolib.storage.ContentAddressedStorage(), upload_to='plasmids/', verbose_name='Fichier GenBank'),
+        ),
+        migrations.AlterField(
+            model_name='simulation',
+            name='campaign_file',
+            field=models.FileField(max_length=255, null=True, storage=biolib.storage.ContentAddressedStorage(), upload_to='campaigns_inputs/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['xls', 'xlsx', 'csv'])], verbose_name='Fichier Campagne (CSV)'),
+        ),
+        migrations.AlterField(
+            model_name='simulation',
+            name='template_file',
+            field=models.FileField(max_length=255, null=True, storage=biolib.storage.ContentAddressedStorage(), upload_to='simulation_templates/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['csv', 'xls', 'xlsx'])], verbose_name='Fichier Template (Excel)'),
+        ),
+    ]
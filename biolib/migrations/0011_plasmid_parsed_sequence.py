@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0010_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plasmid',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 de la séquence', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='plasmid',
+            name='length',
+            field=models.PositiveIntegerField(default=0, verbose_name='Longueur (pb)'),
+        ),
+        migrations.AddField(
+            model_name='plasmid',
+            name='packed_sequence',
+            field=models.BinaryField(blank=True, help_text='Séquence encodée sur 2 bits', null=True),
+        ),
+        migrations.AddField(
+            model_name='plasmid',
+            name='topology',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Topologie'),
+        ),
+    ]
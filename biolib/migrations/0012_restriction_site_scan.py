@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0011_plasmid_parsed_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestrictionSiteScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enzyme', models.CharField(max_length=50)),
+                ('site_count', models.PositiveIntegerField(default=0)),
+                ('positions', models.JSONField(default=list, help_text='Positions 0-based des sites, brins confondus')),
+                ('checksum', models.CharField(max_length=64)),
+                ('scanned_at', models.DateTimeField(auto_now=True)),
+                ('plasmid', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restriction_scans', to='biolib.plasmid')),
+            ],
+            options={
+                'unique_together': {('plasmid', 'enzyme')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+import my_insillyclo.enzymes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0012_restriction_site_scan'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaigntemplate',
+            name='enzyme',
+            field=models.CharField(choices=my_insillyclo.enzymes.enzyme_choices, default='BsaI', max_length=50),
+        ),
+    ]
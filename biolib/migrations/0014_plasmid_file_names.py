@@ -0,0 +1,38 @@
+import os
+
+from django.db import migrations
+
+
+def restore_plasmid_file_names(apps, schema_editor):
+    """
+    Les plasmides importés avec le contenu d'un fichier déjà stocké pointaient
+    vers le nom du premier import : chacun reprend un nom tiré de son
+    identifiant (lien physique dans le dossier du contenu).
+    """
+    from biolib.storage import content_addressed_storage, digest_from_name
+
+    Plasmid = apps.get_model('biolib', 'Plasmid')
+    for plasmid in Plasmid.objects.exclude(genbank_file='').exclude(genbank_file__isnull=True).iterator():
+        name = plasmid.genbank_file.name
+        if digest_from_name(name) is None or not content_addressed_storage.exists(name):
+            continue
+        extension = os.path.splitext(name)[1]
+        expected = plasmid.identifier
+        if os.path.splitext(expected)[1].lower() != extension.lower():
+            expected += extension
+        expected = content_addressed_storage.get_valid_name(expected)
+        if os.path.basename(name) == expected:
+            continue
+        plasmid.genbank_file.name = content_addressed_storage._link(name, expected)
+        plasmid.save(update_fields=['genbank_file'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0013_campaigntemplate_enzyme_catalogue'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_plasmid_file_names, migrations.RunPython.noop),
+    ]
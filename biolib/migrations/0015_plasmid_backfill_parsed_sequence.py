@@ -0,0 +1,44 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def backfill_parsed_sequence(apps, schema_editor):
+    """
+    Les plasmides créés avant 0011 n'ont ni checksum ni séquence encodée (et
+    leur champ `sequence` contient le début du fichier) : on reparse leur
+    fichier stocké pour remplir les champs de séquence.
+    """
+    from biolib.storage import content_addressed_storage
+    from my_insillyclo.sequence import SEQUENCE_FIELDS, parse_sequence_file
+
+    Plasmid = apps.get_model('biolib', 'Plasmid')
+    pending = []
+    rows = Plasmid.objects.filter(checksum='').exclude(genbank_file='').exclude(genbank_file__isnull=True)
+    for plasmid in rows.iterator():
+        name = plasmid.genbank_file.name
+        if not content_addressed_storage.exists(name):
+            print(f"DEBUG: Fichier introuvable pour {plasmid.identifier} : {name}")
+            continue
+        _, _, fields, error = parse_sequence_file(content_addressed_storage.path(name))
+        if error:
+            print(f"DEBUG: Lecture impossible de {name} : {error}")
+            continue
+        for field, value in fields.items():
+            setattr(plasmid, field, value)
+        pending.append(plasmid)
+        if len(pending) >= BATCH_SIZE:
+            Plasmid.objects.bulk_update(pending, SEQUENCE_FIELDS)
+            pending = []
+    Plasmid.objects.bulk_update(pending, SEQUENCE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0014_plasmid_file_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_parsed_sequence, migrations.RunPython.noop),
+    ]
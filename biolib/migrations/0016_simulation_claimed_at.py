@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biolib', '0015_plasmid_backfill_parsed_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulation',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,12 @@
+import os
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.conf import settings
-from Bio.Restriction import AllEnzymes # Nécessite Biopython installé
 from django.core.validators import FileExtensionValidator
+from .storage import content_addressed_storage
+from my_insillyclo.enzymes import enzyme_choices
+from my_insillyclo.sequence import sequence_fields
 
 # ==============================================================================
 # 1. GESTION UTILISATEURS (Branche AGASH)
@@ -107,25 +110,55 @@ class PlasmidCollection(models.Model):
 class Plasmid(models.Model):
     """ Fusion : On garde la branche d'AGASH pour les fichier + on conserve la simplicité de MAIN """
     collection = models.ForeignKey(PlasmidCollection, on_delete=models.CASCADE, related_name='plasmids')
-    identifier = models.CharField(max_length=100, help_text="Code labo (ex: pYTK045)")
+    identifier = models.CharField(max_length=100, db_index=True, help_text="Code labo (ex: pYTK045)")
     name = models.CharField(max_length=200, blank=True)
 
     # AGASH : Fichier source
-    genbank_file = models.FileField(upload_to='plasmids/', verbose_name="Fichier GenBank", null=True, blank=True)
+    genbank_file = models.FileField(upload_to='plasmids/', storage=content_addressed_storage, max_length=255, verbose_name="Fichier GenBank", null=True, blank=True)
 
     # MAIN/AGASH : Séquence brute (utile pour recherche rapide)
     sequence = models.TextField(help_text="Séquence nucléotidique")
 
+    # Renseignés au parsing du fichier (voir my_insillyclo/sequence.py)
+    length = models.PositiveIntegerField(default=0, verbose_name="Longueur (pb)")
+    topology = models.CharField(max_length=20, blank=True, verbose_name="Topologie")
+    checksum = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 de la séquence")
+    packed_sequence = models.BinaryField(null=True, blank=True, help_text="Séquence encodée sur 2 bits")
+
+    def update_from_record(self, record):
+        """ Copie la séquence d'un enregistrement Biopython déjà parsé. """
+        for field, value in sequence_fields(record).items():
+            setattr(self, field, value)
+
     def __str__(self):
         return f"{self.identifier} - {self.name}"
 
+class RestrictionSiteScan(models.Model):
+    """
+    Sites d'une enzyme trouvés sur un plasmide (voir biolib/restriction.py).
+    `checksum` est celui de la séquence analysée : si la séquence change, le
+    résultat est périmé et sera recalculé.
+    """
+    plasmid = models.ForeignKey(Plasmid, on_delete=models.CASCADE, related_name='restriction_scans')
+    enzyme = models.CharField(max_length=50)
+    site_count = models.PositiveIntegerField(default=0)
+    positions = models.JSONField(default=list, help_text="Positions 0-based des sites, brins confondus")
+    checksum = models.CharField(max_length=64)
+    scanned_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('plasmid', 'enzyme')
+
+    def __str__(self):
+        return f"{self.plasmid.identifier} / {self.enzyme} : {self.site_count} site(s)"
+
 # ==============================================================================
 # 3. MAPPING & CORRESPONDANCE (Version MAIN améliorée)
 # ==============================================================================
 
 class Correspondence(models.Model):
     name = models.CharField(max_length=200, default="Table de correspondance")
-    file = models.FileField(upload_to="correspondences/")
+    file = models.FileField(upload_to="correspondences/", storage=content_addressed_storage, max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True)
     team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True)
@@ -147,8 +180,8 @@ class CorrespondenceEntry(models.Model):
 class CampaignTemplate(models.Model):
     """ Fusion : Fichiers (branche Agash) + Paramètres Bio ( branche Main) """
 
-    ALL_ENZYMES_LIST = sorted([str(e) for e in AllEnzymes])
-    ENZYME_CHOICES = [(e, e) for e in ALL_ENZYMES_LIST]
+    # Catalogue précalculé (my_insillyclo/enzymes.py), lu au premier affichage des choix
+    ENZYME_CHOICES = enzyme_choices
     SEPARATOR_CHOICES = [('-', 'Tiret (-)'), ('_', 'Underscore (_)'), ('', 'Aucun')]
 
     name = models.CharField(max_length=255)
@@ -216,9 +249,29 @@ class TemplatePart(models.Model):
         return f"{self.template.name} - {self.name} ({self.order})"
 
 class Simulation(models.Model):
+    # Cycle de vie d'une simulation dans la file d'attente (voir biolib/jobs.py)
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_COMPLETED, 'Terminée'),
+        (STATUS_FAILED, 'Échec'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True)
-    status = models.CharField(max_length=20, default='PENDING')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    error_message = models.TextField(blank=True)
+    # Prise en charge par un worker, puis dernier signe de vie (voir jobs.Heartbeat)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    # Cache des résultats : empreinte des entrées et dossier de sortie (relatif à MEDIA_ROOT),
+    # éventuellement partagé avec une simulation identique déjà calculée
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    output_dir = models.CharField(max_length=255, blank=True)
     date_run = models.DateTimeField(auto_now_add=True)
     result_file = models.CharField(max_length=255, blank=True, null=True)
 
@@ -231,6 +284,8 @@ class Simulation(models.Model):
     # 2. Le fichier Template (XLSX) uploadé directement
     template_file = models.FileField(
         upload_to='simulation_templates/',
+        storage=content_addressed_storage,
+        max_length=255,
         verbose_name="Fichier Template (Excel)",
         validators=[FileExtensionValidator(allowed_extensions=['csv', 'xls', 'xlsx'])],
         null=True, blank=False # Obligatoire
@@ -249,10 +304,36 @@ class Simulation(models.Model):
     # 4. Le fichier Campagne (CSV) - Déjà fait avant
     campaign_file = models.FileField(
         upload_to='campaigns_inputs/',
+        storage=content_addressed_storage,
+        max_length=255,
         verbose_name="Fichier Campagne (CSV)",
         validators=[FileExtensionValidator(allowed_extensions=['xls', 'xlsx', 'csv'])],
         null=True, blank=False
     )
 
+    def template_filename(self):
+        return os.path.basename(self.template_file.name) if self.template_file else ''
+
+    def get_output_dir(self):
+        return self.output_dir or f"simulations/{self.id}"
+
+    def get_output_folder(self):
+        return os.path.join(settings.MEDIA_ROOT, self.get_output_dir())
+
     def __str__(self):
         return f"Simu #{self.id} ({self.date_run})"
+
+# ==============================================================================
+# 5. STOCKAGE DES FICHIERS (voir biolib/storage.py)
+# ==============================================================================
+
+class ContentBlob(models.Model):
+    """ Un contenu de fichier stocké une seule fois, avec son nombre de références. """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} réf.)"
@@ -0,0 +1,40 @@
+"""
+Observateurs insillyclo utilisés par les simulations.
+
+Ce module importe insillyclo (et, à travers lui, pandas et Biopython) : il
+n'est chargé que par le code qui lance réellement une simulation, jamais à
+l'import des vues.
+"""
+import insillyclo.observer
+
+
+class DjangoConsoleObserver(insillyclo.observer.InSillyCloCliObserver):
+    def __init__(self):
+        super().__init__(debug=False, fail_on_error=True)
+
+    def notify_message(self, message):
+        print(f"[INSILLYCLO] {message}")
+
+
+class ProgressObserver(DjangoConsoleObserver):
+    """
+    Observateur d'une simulation suivie depuis le navigateur : messages et
+    étapes sont aussi publiés dans le cache (voir biolib/progress.py).
+    """
+
+    def __init__(self, recorder, heartbeat=None):
+        super().__init__()
+        self.recorder = recorder
+        # Signe de vie de la simulation (voir jobs.Heartbeat), donné à chaque avancement
+        self.heartbeat = heartbeat
+
+    def notify_message(self, message):
+        super().notify_message(message)
+        self.recorder.message(message)
+        if self.heartbeat is not None:
+            self.heartbeat.beat()
+
+    def notify_stage(self, stage, done=None, total=None):
+        self.recorder.stage(stage, done, total)
+        if self.heartbeat is not None:
+            self.heartbeat.beat()
@@ -0,0 +1,136 @@
+"""
+Avancement des simulations en cours.
+
+Les workers publient l'étape courante, son avancement et les derniers
+messages d'insillyclo dans un cache Django dédié (alias PROGRESS_CACHE,
+partagé par tous les processus) : les nombreux états écrits n'y évincent pas
+les autres entrées du cache par défaut (version des statistiques...). La
+page de résultats les lit par requêtes courtes (vue `simulation_progress`),
+qui répondent aussitôt ; le navigateur attend POLL_INTERVAL secondes avant
+la suivante. Aucun worker WSGI n'est bloqué, et suivre une simulation ne
+coûte qu'une requête en base par relance.
+
+Les écritures sont espacées d'au moins PROGRESS_INTERVAL secondes ; un
+changement d'étape et la fin de la simulation sont toujours écrits.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Étape -> (libellé, pourcentage au début, pourcentage à la fin)
+STAGES = {
+    'queued': ("En attente d'un worker", 0, 0),
+    'resolve': ("Recherche des plasmides", 0, 10),
+    'template': ("Lecture du template", 10, 15),
+    'check': ("Vérification des overhangs", 15, 20),
+    'patch': ("Préparation des pièces", 20, 60),
+    'assembly': ("Assemblage et digestion", 60, 95),
+    'completed': ("Terminée", 100, 100),
+    'failed': ("Échec", 100, 100),
+}
+TERMINAL_STAGES = ('completed', 'failed')
+MAX_MESSAGES = 20
+PROGRESS_INTERVAL = getattr(settings, 'SIMULATION_PROGRESS_INTERVAL', 0.5)
+# Une progression abandonnée (worker tué) finit par disparaître du cache
+PROGRESS_TIMEOUT = 24 * 60 * 60
+# Délai (s) conseillé au navigateur entre deux lectures de l'avancement
+POLL_INTERVAL = getattr(settings, 'SIMULATION_PROGRESS_POLL', 2)
+PROGRESS_CACHE = getattr(settings, 'SIMULATION_PROGRESS_CACHE', 'progress')
+
+
+def progress_cache():
+    """ Cache de l'avancement ; le cache par défaut si l'alias n'est pas configuré. """
+    return caches[PROGRESS_CACHE if PROGRESS_CACHE in settings.CACHES else 'default']
+
+
+def progress_key(simulation_id):
+    return f"biolib:progress:{simulation_id}"
+
+
+def read_progress(simulation_id):
+    """ Dernier état publié pour la simulation, None s'il n'y en a pas. """
+    return progress_cache().get(progress_key(simulation_id))
+
+
+class ProgressRecorder:
+    """
+    État d'avancement d'une simulation, écrit dans le cache. Chaque écriture
+    porte un numéro `seq` croissant (repris du dernier état publié), qui
+    permet au navigateur de repérer un état nouveau.
+    """
+
+    def __init__(self, simulation_id):
+        self.simulation_id = simulation_id
+        previous = read_progress(simulation_id)
+        self.state = {
+            'seq': previous['seq'] if previous else 0,
+            'stage': None,
+            'label': '',
+            'percent': 0,
+            'done': None,
+            'total': None,
+            'messages': [],
+            'error': '',
+        }
+        self._written = 0.0
+        self._dirty = False
+
+    def stage(self, stage, done=None, total=None):
+        label, start, end = STAGES[stage]
+        changed = stage != self.state['stage']
+        percent = start
+        if done is not None and total:
+            percent = start + (end - start) * min(done, total) // total
+        self.state.update(stage=stage, label=label, percent=percent, done=done, total=total)
+        self._dirty = True
+        self.flush(force=changed)
+
+    def message(self, text):
+        messages = self.state['messages']
+        messages.append(text)
+        del messages[:-MAX_MESSAGES]
+        self._dirty = True
+        self.flush()
+
+    def finish(self, status, error=''):
+        """ Dernier état : 'completed' ou 'failed' (avec le message d'erreur). """
+        self.state['error'] = error
+        self.stage(status)
+
+    def flush(self, force=False):
+        if not self._dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._written < PROGRESS_INTERVAL:
+            return
+        self.state['seq'] += 1
+        self.state['updated'] = time.time()
+        progress_cache().set(progress_key(self.simulation_id), self.state, PROGRESS_TIMEOUT)
+        self._written = now
+        self._dirty = False
+
+
+def publish_stage(simulation_id, stage):
+    """ Publie une étape sans suivre la simulation (mise en file, fin d'un lot). """
+    ProgressRecorder(simulation_id).stage(stage)
+
+
+# =============================================================================
+# LECTURE PAR LA PAGE DE RÉSULTATS
+# =============================================================================
+
+def current_progress(simulation_id, status):
+    """
+    Dernier état publié pour la simulation, sans attendre. `status` est le
+    statut en base : il sert de réponse si aucun état n'a été publié
+    (simulation terminée avant la mise en place du suivi, cache vidé).
+    """
+    state = read_progress(simulation_id)
+    if state is None and status in ('COMPLETED', 'FAILED'):
+        stage = status.lower()
+        return {
+            'seq': 0, 'stage': stage, 'label': STAGES[stage][0], 'percent': 100,
+            'done': None, 'total': None, 'messages': [], 'error': '',
+        }
+    return state
@@ -0,0 +1,101 @@
+"""
+Sites de restriction des plasmides, calculés une fois et stockés en base.
+
+Les résultats (RestrictionSiteScan) sont indexés par plasmide et par enzyme
+et rattachés à l'empreinte de la séquence analysée : une séquence modifiée
+rend ses résultats périmés. Seuls les couples (plasmide, enzyme) manquants
+ou périmés sont analysés, en un seul lot vectorisé.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from my_insillyclo.restriction_scan import GOLDEN_GATE_ENZYMES, scan_sequences
+
+from .models import RestrictionSiteScan
+
+# Plus de sites que les deux qui encadrent la pièce : site interne
+FLANKING_SITES = 2
+
+
+def _up_to_date(plasmids, enzymes):
+    """ Ids des plasmides de `plasmids` qui ont un résultat à jour pour chaque enzyme. """
+    fresh = set(
+        RestrictionSiteScan.objects.filter(
+            plasmid__in=plasmids, enzyme__in=enzymes, checksum=F('plasmid__checksum')
+        ).values_list('plasmid_id', 'enzyme')
+    )
+    return {
+        pid for pid, _ in fresh
+        if all((pid, enzyme) in fresh for enzyme in enzymes)
+    }
+
+
+def pending_scans(plasmids, enzymes=GOLDEN_GATE_ENZYMES):
+    """ Ids des plasmides séquencés de `plasmids` dont l'analyse manque ou est périmée. """
+    enzymes = list(enzymes)
+    plasmids = plasmids.exclude(sequence='')
+    return set(plasmids.exclude(id__in=_up_to_date(plasmids, enzymes)).values_list('id', flat=True))
+
+
+def ensure_scans(plasmids, enzymes=GOLDEN_GATE_ENZYMES):
+    """
+    Analyse les plasmides de `plasmids` (queryset) qui n'ont pas de résultat à
+    jour. Coûteux : à appeler depuis un worker (voir jobs.enqueue_restriction_scans).
+    """
+    enzymes = list(enzymes)
+    plasmids = plasmids.exclude(sequence='')
+    up_to_date = _up_to_date(plasmids, enzymes)
+    rows = {
+        pid: (seq, topology == 'circular', checksum)
+        for pid, seq, topology, checksum in plasmids.exclude(id__in=up_to_date)
+        .values_list('id', 'sequence', 'topology', 'checksum').iterator()
+    }
+    if not rows:
+        return
+
+    results = scan_sequences(((pid, seq, circular) for pid, (seq, circular, _) in rows.items()), enzymes)
+
+    with transaction.atomic():
+        RestrictionSiteScan.objects.filter(plasmid_id__in=rows, enzyme__in=enzymes).delete()
+        RestrictionSiteScan.objects.bulk_create([
+            RestrictionSiteScan(
+                plasmid_id=pid,
+                enzyme=enzyme,
+                site_count=len(positions),
+                positions=positions,
+                checksum=rows[pid][2],
+            )
+            for pid, sites in results.items()
+            for enzyme, positions in sites.items()
+        ])
+
+
+def stored_site_counts(plasmids, enzymes=GOLDEN_GATE_ENZYMES):
+    """ {id du plasmide: {enzyme: nombre de sites}} des résultats à jour déjà en base, sans analyse. """
+    counts = {}
+    scans = RestrictionSiteScan.objects.filter(
+        plasmid__in=plasmids, enzyme__in=list(enzymes), checksum=F('plasmid__checksum')
+    ).values_list('plasmid_id', 'enzyme', 'site_count')
+    for pid, enzyme, count in scans:
+        counts.setdefault(pid, {})[enzyme] = count
+    return counts
+
+
+def site_counts(plasmids, enzymes=GOLDEN_GATE_ENZYMES):
+    """ Comme stored_site_counts, après analyse des plasmides qui n'en ont pas (worker). """
+    ensure_scans(plasmids, enzymes)
+    return stored_site_counts(plasmids, enzymes)
+
+
+def internal_sites(plasmids, enzyme):
+    """
+    Validation avant simulation : plasmides portant plus de sites de `enzyme`
+    que les deux sites qui encadrent une pièce. Renvoie {identifiant: nombre}.
+    """
+    counts = site_counts(plasmids, [enzyme])
+    identifiers = dict(plasmids.filter(id__in=counts).values_list('id', 'identifier'))
+    return {
+        identifiers[pid]: sites[enzyme]
+        for pid, sites in counts.items()
+        if sites.get(enzyme, 0) > FLANKING_SITES
+    }
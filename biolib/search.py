@@ -0,0 +1,130 @@
+"""
+Recherche de sous-séquences dans les plasmides (index k-mer en mémoire).
+
+L'index est construit au premier appel, puis tenu à jour par les signaux
+(biolib/signals.py) pour les modifications faites dans ce processus. Les
+modifications faites ailleurs (worker, commande de chargement) sont
+rattrapées avant chaque recherche en comparant, plasmide par plasmide,
+l'empreinte de séquence (Plasmid.checksum) indexée à celle de la base : une
+séquence remplacée est réindexée même si le nombre de plasmides ne change pas.
+"""
+import threading
+
+from django.db.models import Q
+
+from my_insillyclo.kmer_index import KmerIndex, find_occurrences
+
+from .models import Plasmid
+
+_index = None
+# id -> empreinte de la séquence indexée (None : à recomparer entièrement)
+_index_state = None
+_index_lock = threading.Lock()
+
+
+def _is_circular(topology):
+    return topology == 'circular'
+
+
+def _db_state():
+    """ id -> empreinte des plasmides ayant une séquence (sans lire les séquences). """
+    return dict(Plasmid.objects.exclude(sequence='').values_list('id', 'checksum').iterator())
+
+
+def _sync(index):
+    """
+    Ajoute les plasmides absents de l'index, réindexe ceux dont l'empreinte a
+    changé et retire ceux qui ont disparu.
+    """
+    global _index_state
+    state = _db_state()
+    known = _index_state or {}
+    indexed = index.ids()
+    for plasmid_id in indexed - state.keys():
+        index.remove(plasmid_id)
+    stale = {
+        pid for pid, checksum in state.items()
+        if pid not in indexed or known.get(pid) != checksum
+    }
+    if stale:
+        rows = Plasmid.objects.exclude(sequence='')
+        if known:
+            # Au premier remplissage tout est à indexer : pas de liste d'ids dans la requête
+            rows = rows.filter(id__in=stale)
+        rows = rows.values_list('id', 'sequence', 'topology', 'checksum')
+
+        def items():
+            for pid, seq, topo, checksum in rows.iterator():
+                state[pid] = checksum
+                yield pid, seq, _is_circular(topo)
+        index.bulk_add(items())
+    _index_state = state
+
+
+def get_sequence_index():
+    """ Index partagé par le processus, synchronisé avec la base. """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = KmerIndex()
+        _sync(_index)
+        return _index
+
+
+def index_plasmid(plasmid):
+    """ Mise à jour incrémentale après l'enregistrement d'un plasmide. """
+    global _index_state
+    if _index is None:
+        return
+    with _index_lock:
+        if plasmid.sequence:
+            _index.add(plasmid.id, plasmid.sequence, _is_circular(plasmid.topology))
+        else:
+            _index.remove(plasmid.id)
+        if _index_state is not None:
+            if plasmid.sequence:
+                _index_state[plasmid.id] = plasmid.checksum
+            else:
+                _index_state.pop(plasmid.id, None)
+
+
+def unindex_plasmid(plasmid_id):
+    global _index_state
+    if _index is None:
+        return
+    with _index_lock:
+        _index.remove(plasmid_id)
+        if _index_state is not None:
+            _index_state.pop(plasmid_id, None)
+
+
+def visible_plasmids(user):
+    """ Plasmides des collections de l'utilisateur, de ses équipes ou publiques. """
+    return Plasmid.objects.filter(
+        Q(collection__owner=user)
+        | Q(collection__is_public=True)
+        | Q(collection__team__members=user)
+        | Q(collection__team__leader=user)
+    ).distinct()
+
+
+def search_plasmids(query, plasmids):
+    """
+    Plasmides de `plasmids` (queryset) contenant `query` sur l'un ou l'autre
+    brin. Renvoie une liste de (plasmide, [(position, brin), ...]).
+    Lève ValueError si la requête est trop courte ou n'est pas de l'ADN.
+    """
+    query = ''.join(query.split()).upper()
+    if not query or set(query) - set('ACGTN'):
+        raise ValueError("La requête doit être une séquence d'ADN (A, C, G, T).")
+
+    candidates = get_sequence_index().candidates(query)
+    if not candidates:
+        return []
+
+    results = []
+    for plasmid in plasmids.filter(id__in=candidates).select_related('collection').order_by('identifier'):
+        hits = find_occurrences(plasmid.sequence, query, _is_circular(plasmid.topology))
+        if hits:
+            results.append((plasmid, hits))
+    return results
@@ -0,0 +1,111 @@
+"""
+Signaux de l'application biolib (branchés dans BiolibConfig.ready).
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search
+from .models import (
+    CampaignTemplate, Correspondence, Plasmid, PlasmidCollection, RestrictionSiteScan, Simulation, Team,
+)
+from .stats import invalidate_team_stats
+from .storage import content_addressed_storage
+
+# ==============================================================================
+# STOCKAGE ADRESSÉ PAR CONTENU : LIBÉRATION DES RÉFÉRENCES
+# ==============================================================================
+
+CONTENT_ADDRESSED_FIELDS = {
+    Simulation: ('template_file', 'campaign_file'),
+    Plasmid: ('genbank_file',),
+    Correspondence: ('file',),
+}
+
+
+def _release_after_commit(names):
+    names = [n for n in names if n]
+    if names:
+        transaction.on_commit(lambda: [content_addressed_storage.release(n) for n in names])
+
+
+@receiver(pre_save, sender=Simulation)
+@receiver(pre_save, sender=Plasmid)
+@receiver(pre_save, sender=Correspondence)
+def release_replaced_files(sender, instance, update_fields=None, **kwargs):
+    """ Un fichier remplacé par un autre perd une référence. """
+    if instance.pk is None:
+        return
+    fields = [
+        f for f in CONTENT_ADDRESSED_FIELDS[sender]
+        if update_fields is None or f in update_fields
+    ]
+    if not fields:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if previous is None:
+        return
+    _release_after_commit(
+        previous[f] for f in fields if previous[f] and previous[f] != getattr(instance, f).name
+    )
+
+
+@receiver(post_delete, sender=Simulation)
+@receiver(post_delete, sender=Plasmid)
+@receiver(post_delete, sender=Correspondence)
+def release_deleted_files(sender, instance, **kwargs):
+    _release_after_commit(getattr(instance, f).name for f in CONTENT_ADDRESSED_FIELDS[sender])
+
+
+# ==============================================================================
+# INDEX DE RECHERCHE DE SÉQUENCES
+# ==============================================================================
+
+@receiver(post_save, sender=Plasmid)
+def index_saved_plasmid(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.index_plasmid(instance))
+
+
+@receiver(post_delete, sender=Plasmid)
+def unindex_deleted_plasmid(sender, instance, **kwargs):
+    plasmid_id = instance.id
+    transaction.on_commit(lambda: search.unindex_plasmid(plasmid_id))
+
+
+# ==============================================================================
+# SITES DE RESTRICTION : INVALIDATION
+# ==============================================================================
+
+@receiver(post_save, sender=Plasmid)
+def drop_stale_restriction_scans(sender, instance, created, **kwargs):
+    """ Séquence modifiée : les sites déjà calculés ne sont plus valables. """
+    if not created:
+        RestrictionSiteScan.objects.filter(plasmid=instance).exclude(checksum=instance.checksum).delete()
+
+
+# ==============================================================================
+# STATISTIQUES DES ÉQUIPES : INVALIDATION
+# ==============================================================================
+
+@receiver(post_save, sender=CampaignTemplate)
+@receiver(post_save, sender=Correspondence)
+@receiver(post_save, sender=Simulation)
+@receiver(post_save, sender=Plasmid)
+@receiver(post_save, sender=PlasmidCollection)
+@receiver(post_delete, sender=CampaignTemplate)
+@receiver(post_delete, sender=Correspondence)
+@receiver(post_delete, sender=Simulation)
+@receiver(post_delete, sender=Plasmid)
+@receiver(post_delete, sender=PlasmidCollection)
+def invalidate_stats(sender, instance, created=False, update_fields=None, **kwargs):
+    """ Un objet compté par biolib/stats.py a changé. """
+    if update_fields is not None and not created and not {'team', 'collection'} & set(update_fields):
+        # Mise à jour partielle sans effet sur les compteurs (statut d'une simulation...)
+        return
+    transaction.on_commit(invalidate_team_stats)
+
+
+@receiver(m2m_changed, sender=Team.members.through)
+def invalidate_members_stats(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_team_stats)
@@ -0,0 +1,86 @@
+"""
+Statistiques par équipe (membres, templates, tables, campagnes, plasmides,
+collections).
+
+Tous les compteurs sont calculés en une seule requête : une sous-requête
+agrégée par compteur, annotée sur les équipes. Le résultat est mis en cache ;
+la clé contient un numéro de version incrémenté par les signaux dès qu'un
+objet compté est créé, modifié ou supprimé (voir biolib/signals.py).
+"""
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import CampaignTemplate, Correspondence, Plasmid, PlasmidCollection, Simulation, Team
+
+VERSION_KEY = 'biolib:team-stats:version'
+CACHE_TIMEOUT = 60 * 60
+
+# Attribut posé sur l'équipe -> (modèle compté, chemin vers l'équipe)
+COUNTERS = {
+    'members_count': (Team.members.through, 'team'),
+    'templates_count': (CampaignTemplate, 'team'),
+    'tables_count': (Correspondence, 'team'),
+    'campaigns_count': (Simulation, 'team'),
+    'plasmids_count': (Plasmid, 'collection__team'),
+    'collections_count': (PlasmidCollection, 'team'),
+}
+
+
+def _count_subquery(model, team_path):
+    counted = (
+        model.objects.filter(**{team_path: OuterRef('pk')})
+        .order_by()
+        .values(team_path)
+        .annotate(n=Count('pk', distinct=True))
+        .values('n')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def annotate_team_stats(teams):
+    """ Queryset d'équipes annoté des compteurs de COUNTERS. """
+    return teams.annotate(**{
+        name: _count_subquery(model, team_path) for name, (model, team_path) in COUNTERS.items()
+    })
+
+
+def stats_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_team_stats():
+    """ Rend périmées toutes les statistiques en cache. """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def team_stats(team_ids):
+    """ {id d'équipe: {compteur: valeur}}, en une requête ou depuis le cache. """
+    team_ids = sorted(set(team_ids))
+    if not team_ids:
+        return {}
+    key = f"biolib:team-stats:{stats_version()}:{','.join(map(str, team_ids))}"
+    stats = cache.get(key)
+    if stats is None:
+        rows = annotate_team_stats(Team.objects.filter(id__in=team_ids)).values('id', *COUNTERS)
+        stats = {row.pop('id'): row for row in rows}
+        cache.set(key, stats, CACHE_TIMEOUT)
+    return stats
+
+
+def attach_team_stats(teams):
+    """ Pose les compteurs (team.tables_count, ...) sur chaque équipe ; renvoie la liste. """
+    teams = list(teams)
+    stats = team_stats(team.id for team in teams)
+    empty = dict.fromkeys(COUNTERS, 0)
+    for team in teams:
+        for name, value in stats.get(team.id, empty).items():
+            setattr(team, name, value)
+    return teams
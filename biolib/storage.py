@@ -0,0 +1,195 @@
+"""
+Stockage adressé par contenu des fichiers importés.
+
+Chaque contenu est rangé une fois dans `<upload_to>/<sha256[:2]>/<sha256>/` :
+deux imports des mêmes octets partagent le même fichier au lieu d'en créer
+une copie suffixée (`iP_mapping_Simple_XXXXXXX.csv`). Chaque ligne garde
+toutefois son propre nom de fichier (insillyclo retrouve les pièces par le
+nom du GenBank) : un import du même contenu sous un autre nom crée un lien
+physique `<sha256>/<autre nom>` vers le même fichier. Un ContentBlob par
+contenu compte les références ; le dossier du contenu est supprimé quand la
+dernière ligne qui l'utilise disparaît (voir biolib/signals.py).
+"""
+import hashlib
+import os
+import re
+import shutil
+from collections import Counter
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+# `<sha256[:2]>/<sha256>/` ajouté par _save entre le dossier et le nom du fichier
+_DIGEST_DIRS_LENGTH = len('00/') + 64 + len('/')
+
+
+def digest_from_name(name):
+    """ SHA-256 d'un fichier rangé par ce stockage, d'après son chemin (None sinon). """
+    digest = os.path.basename(os.path.dirname(name or ''))
+    return digest if _DIGEST.match(digest) else None
+
+
+def content_digest(content):
+    """ SHA-256 d'un fichier Django (File/UploadedFile), lu par blocs. """
+    h = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        h.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return h.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _blob_model(self):
+        return apps.get_model('biolib', 'ContentBlob')
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Le nom demandé, inchangé : le dossier `<sha256>/` sépare déjà les
+        contenus différents. Sans cela, Django suffixe le nom (`pMYT001_Ab12Cd3.gb`)
+        dès qu'un fichier d'un ancien import porte le même chemin, et les
+        pièces ne sont plus retrouvées par leur nom. Seule la longueur est
+        bornée, dossiers d'empreinte compris.
+        """
+        if max_length is None:
+            return name
+        excess = len(name) + _DIGEST_DIRS_LENGTH - max_length
+        if excess <= 0:
+            return name
+        dirname, basename = os.path.split(name)
+        root, ext = os.path.splitext(basename)
+        if excess >= len(root):
+            raise SuspiciousFileOperation(
+                f"Nom de fichier trop long pour le stockage : {name}"
+            )
+        return os.path.join(dirname, root[:-excess] + ext)
+
+    def _link(self, existing_name, basename):
+        """
+        Nom `basename` dans le dossier du contenu `existing_name` : lien physique
+        vers le même fichier (copie si le système de fichiers ne le permet pas).
+        """
+        name = os.path.join(os.path.dirname(existing_name), basename)
+        if not self.exists(name):
+            try:
+                os.link(self.path(existing_name), self.path(name))
+            except FileExistsError:
+                # Même nom créé au même instant par une autre requête
+                pass
+            except OSError:
+                shutil.copyfile(self.path(existing_name), self.path(name))
+        return name
+
+    def _save(self, name, content):
+        ContentBlob = self._blob_model()
+        digest = content_digest(content)
+        dirname, basename = os.path.split(name)
+
+        with transaction.atomic():
+            blob = ContentBlob.objects.select_for_update().filter(digest=digest).first()
+            if blob is not None and self.exists(blob.name):
+                ContentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                return self._link(blob.name, basename)
+
+        target = os.path.join(dirname, digest[:2], digest, basename)
+        if self.exists(target):
+            stored_name = target
+        else:
+            stored_name = super()._save(target, content)
+
+        try:
+            with transaction.atomic():
+                blob, created = ContentBlob.objects.get_or_create(
+                    digest=digest,
+                    defaults={'name': stored_name, 'size': content.size, 'ref_count': 1},
+                )
+                if not created:
+                    ContentBlob.objects.filter(pk=blob.pk).update(
+                        name=stored_name, ref_count=F('ref_count') + 1
+                    )
+        except IntegrityError:
+            # Même contenu importé au même instant par une autre requête
+            ContentBlob.objects.filter(digest=digest).update(ref_count=F('ref_count') + 1)
+        return stored_name
+
+    def save_many(self, upload_to, items):
+        """
+        Enregistre d'un coup des fichiers déjà sur disque dont l'empreinte est
+        connue. `items` : liste de (nom d'origine, chemin source, sha256, taille).
+        Renvoie les noms stockés, dans l'ordre de `items` (chacun sous son nom
+        d'origine). Les ContentBlob sont lus, créés et incrémentés en quelques
+        requêtes quel que soit le nombre de fichiers (imports en masse).
+        """
+        ContentBlob = self._blob_model()
+        refs = Counter(digest for _, _, digest, _ in items)
+        names = []
+        with transaction.atomic():
+            blobs = {
+                blob.digest: blob
+                for blob in ContentBlob.objects.select_for_update().filter(digest__in=list(refs))
+            }
+            # Fichier de référence de chaque contenu (déjà stocké ou stocké ici)
+            canonical = {
+                digest: blob.name for digest, blob in blobs.items() if self.exists(blob.name)
+            }
+            new_blobs = []
+            for basename, source_path, digest, size in items:
+                if digest in canonical:
+                    names.append(self._link(canonical[digest], basename))
+                    continue
+                target = os.path.join(upload_to, digest[:2], digest, basename)
+                if not self.exists(target):
+                    with open(source_path, 'rb') as f:
+                        target = super()._save(target, File(f))
+                canonical[digest] = target
+                names.append(target)
+                blob = blobs.get(digest)
+                if blob is None:
+                    new_blobs.append(ContentBlob(digest=digest, name=target, size=size, ref_count=refs[digest]))
+                else:
+                    # Fichier disparu : le ContentBlob pointe vers la nouvelle copie
+                    ContentBlob.objects.filter(pk=blob.pk).update(name=target)
+
+            ContentBlob.objects.bulk_create(new_blobs, batch_size=500)
+            # Références supplémentaires vers des contenus déjà connus, groupées par incrément
+            increments = {}
+            for digest, blob in blobs.items():
+                increments.setdefault(refs[digest], []).append(blob.pk)
+            for count, pks in increments.items():
+                ContentBlob.objects.filter(pk__in=pks).update(ref_count=F('ref_count') + count)
+        return names
+
+    def release(self, name):
+        """
+        Retire une référence au contenu du fichier `name` ; quand plus aucune
+        ligne ne l'utilise, supprime le ContentBlob et le dossier du contenu
+        (fichier et liens). Les fichiers importés avant ce stockage n'ont pas
+        de ContentBlob et sont ignorés.
+        """
+        digest = digest_from_name(name)
+        if digest is None:
+            return
+        ContentBlob = self._blob_model()
+        with transaction.atomic():
+            blob = ContentBlob.objects.select_for_update().filter(digest=digest).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                ContentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+        for directory in {os.path.dirname(name), os.path.dirname(blob.name)}:
+            shutil.rmtree(self.path(directory), ignore_errors=True)
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -1,3 +1,1877 @@
-from django.test import TestCase
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from biolib.models import ContentBlob, Simulation, User
+from biolib.storage import content_addressed_storage, digest_from_name
+
+from my_insillyclo.enzymes import get_enzyme
+from my_insillyclo.overhangs import (
+    JUNCTION_OVERHANGS, assign_overhangs, flanking_overhangs, junction_overhangs, overhang_set_problems,
+    type_adjacency, validate_constructs,
+)
+from my_insillyclo.restriction_scan import GOLDEN_GATE_ENZYMES
+
+
+# =============================================================================
+# OVERHANGS ET VALIDATION DES CONSTRUCTIONS
+# =============================================================================
+
+def positional_construct(count):
+    """ Construction de `count` pièces avec les overhangs de la couche de compatibilité. """
+    parts = [f"p{i}" for i in range(count)]
+    return parts, {part: junction_overhangs(i, count) for i, part in enumerate(parts)}
+
+
+def golden_gate_part(left, right, insert='ACGTACGTAAAA'):
+    """ Pièce domestiquée (BsaI) : libère `insert` entre les overhangs `left` et `right`. """
+    return 'GGTCTCA' + left + insert + right + 'TGAGACC' + 'ATATATATAT'
+
+
+class OverhangTests(SimpleTestCase):
+
+    def test_junction_set_passes_fidelity_rules(self):
+        sites = [get_enzyme(name).site for name in GOLDEN_GATE_ENZYMES]
+        self.assertEqual(overhang_set_problems(JUNCTION_OVERHANGS, sites), [])
+
+    def test_fidelity_rules_reject_palindromes_and_reverse_complements(self):
+        problems = overhang_set_problems(['GGAA', 'TTCC', 'ACGT'])
+        self.assertTrue(any('palindromique' in p for p in problems))
+        self.assertTrue(any('complément inverse' in p for p in problems))
+
+    def test_positional_assignment_is_valid_up_to_set_size(self):
+        for count in range(2, len(JUNCTION_OVERHANGS) + 1):
+            parts, overhangs = positional_construct(count)
+            self.assertEqual(validate_constructs([('c', parts)], overhangs), [], count)
+
+    def test_seven_and_eight_part_constructs(self):
+        for count in (7, 8):
+            parts, overhangs = positional_construct(count)
+            self.assertEqual(validate_constructs([('c', parts)], overhangs), [])
+
+    def test_construct_longer_than_set_is_rejected(self):
+        parts, overhangs = positional_construct(len(JUNCTION_OVERHANGS) + 1)
+        problems = validate_constructs([('c', parts)], overhangs)
+        self.assertTrue(any('en double' in message for _, message in problems))
+
+    def test_mismatched_junction(self):
+        overhangs = {'a': ('GGAG', 'AATG'), 'b': ('GCTT', 'GGAG')}
+        problems = validate_constructs([('c', ['a', 'b'])], overhangs)
+        self.assertEqual(problems, [('c', "a (AATG) ne se ligature pas à b (GCTT)")])
+
+    def test_part_reused_at_another_position(self):
+        # Une pièce patchée ne porte qu'une paire : réutilisée ailleurs, la jonction casse
+        _, overhangs = positional_construct(3)
+        problems = validate_constructs([('c1', ['p0', 'p1', 'p2']), ('c2', ['p1', 'p0', 'p2'])], overhangs)
+        self.assertEqual({cid for cid, _ in problems}, {'c2'})
+
+    def test_unknown_overhangs_are_not_judged(self):
+        overhangs = {'a': ('GGAG', 'AATG'), 'b': None}
+        self.assertEqual(validate_constructs([('c', ['a', 'b'])], overhangs), [])
+
+    def test_flanking_overhangs_per_enzyme(self):
+        part = golden_gate_part('GCTG', 'AACG')
+        self.assertEqual(flanking_overhangs(part, 'BsaI'), ('GCTG', 'AACG'))
+        self.assertEqual(flanking_overhangs(part, 'BsaI', circular=False), ('GCTG', 'AACG'))
+        # Pas de site BsmBI, ni de pièce lisible sans ses deux sites
+        self.assertIsNone(flanking_overhangs(part, 'BsmBI'))
+        self.assertIsNone(flanking_overhangs('ACGTACGTAAAA', 'BsaI'))
+        self.assertIsNone(flanking_overhangs(part + part, 'BsaI'))
+        with self.assertRaises(ValueError):
+            flanking_overhangs(part, 'EcoRI')
+
+    def test_raw_parts_take_the_overhangs_of_their_type(self):
+        overhangs = {'pro': ('GCTG', 'AACG'), 'cds': ('AACG', 'TATG'), 'ter': ('TATG', 'GCTG'), 'raw': None}
+        constructs = [
+            ('c1', [('pro', '2'), ('cds', '3'), ('ter', '4')]),
+            ('c2', [('pro', '2'), ('raw', '3'), ('ter', '4')]),
+        ]
+        self.assertEqual(type_adjacency(constructs, overhangs), {
+            ('2', '3'): {'AACG'}, ('3', '4'): {'TATG'}, ('4', '2'): {'GCTG'},
+        })
+        assigned = assign_overhangs(constructs, overhangs, {'raw'})
+        self.assertEqual(assigned, {'raw': ('AACG', 'TATG')})
+        self.assertEqual(validate_constructs(
+            [(cid, [p for p, _ in slots]) for cid, slots in constructs], {**overhangs, **assigned},
+        ), [])
+
+    def test_raw_parts_between_raw_parts_take_positional_overhangs(self):
+        constructs = [('c', [('a', 'A'), ('b', 'B'), ('c', 'C')])]
+        assigned = assign_overhangs(constructs, {'a': None, 'b': None, 'c': None}, {'a', 'b', 'c'})
+        self.assertEqual(assigned, {p: junction_overhangs(i, 3) for i, p in enumerate('abc')})
+
+
+# =============================================================================
+# CATALOGUE DES ENZYMES
+# =============================================================================
+
+class EnzymeCatalogueTests(SimpleTestCase):
+
+    def test_catalogue_matches_biopython(self):
+        from my_insillyclo.enzymes import build_catalogue, catalogue
+        # Échoue après une mise à jour de Biopython : régénérer avec `python -m my_insillyclo.enzymes`
+        self.assertEqual(build_catalogue(), list(catalogue().values()))
+
+    def test_enzyme_data(self):
+        bsai = get_enzyme('BsaI')
+        self.assertEqual((bsai.site, bsai.size, bsai.fst5, bsai.ovhg), ('GGTCTC', 6, 7, -4))
+        self.assertEqual((bsai.overhang_size, bsai.type_iis, bsai.palindromic), (4, True, False))
+        ecori = get_enzyme('EcoRI')
+        self.assertEqual((ecori.site, ecori.type_iis, ecori.palindromic), ('GAATTC', False, True))
+        self.assertTrue(all(get_enzyme(name).type_iis for name in GOLDEN_GATE_ENZYMES))
+        with self.assertRaisesMessage(ValueError, 'Enzyme inconnue : Nope'):
+            get_enzyme('Nope')
+
+    def test_template_choices_come_from_the_catalogue(self):
+        from biolib.models import CampaignTemplate
+        from my_insillyclo.enzymes import enzyme_names
+
+        choices = [name for name, _ in CampaignTemplate._meta.get_field('enzyme').choices]
+        self.assertEqual(choices, enzyme_names())
+        self.assertIn('BsmBI', choices)
+
+    def test_lookup_does_not_import_biopython(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        code = (
+            "import sys\n"
+            "from my_insillyclo.enzymes import get_enzyme\n"
+            "get_enzyme('BsaI')\n"
+            "print('Bio' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+# =============================================================================
+# OUTILS DE TEST
+# =============================================================================
+
+def genbank_bytes(name, sequence, topology='circular'):
+    """ Fichier GenBank minimal pour la séquence. """
+    from Bio.Seq import Seq
+    from Bio.SeqIO import write
+    from Bio.SeqRecord import SeqRecord
+    import io
+
+    record = SeqRecord(Seq(sequence), id=name, name=name, description=name)
+    record.annotations.update(molecule_type='DNA', topology=topology)
+    handle = io.StringIO()
+    write(record, handle, 'genbank')
+    return handle.getvalue().encode()
+
+
+class MediaRootMixin:
+    """ MEDIA_ROOT (et donc le stockage adressé par contenu) dans un dossier temporaire. """
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp(prefix='biolib-test-media-')
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def write_source(self, name, data):
+        path = os.path.join(self.media_root, 'sources', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def demo_simulation(self, user, **fields):
+        """ Simulation PENDING sur la campagne de démonstration data_web/Simple_assembly. """
+        from django.conf import settings
+        from biolib.jobs import create_simulation_from_files
+
+        folder = os.path.join(settings.BASE_DIR, 'data_web', 'Simple_assembly')
+        simulation = create_simulation_from_files(
+            user, os.path.join(folder, 'Campaign_Venus.xlsx'), os.path.join(folder, 'iP_mapping_Simple.csv'),
+        )
+        if fields:
+            Simulation.objects.filter(pk=simulation.pk).update(**fields)
+            simulation.refresh_from_db()
+        return simulation
+
+    def source_item(self, name, data):
+        """ Entrée de ContentAddressedStorage.save_many pour un fichier source écrit ici. """
+        return name, self.write_source(name, data), hashlib.sha256(data).hexdigest(), len(data)
+
+    def write_campaign(self, constructs, mapping):
+        """
+        Template CSV (BsaI) et fichier de mapping d'une campagne : `constructs`
+        liste les (pID produit, [noms de pièces]), `mapping` les (pID, nom).
+        """
+        import csv
+        import io
+
+        count = max(len(parts) for _, parts in constructs)
+        rows = [
+            ['Assembly settings'], ['Restriction enzyme', 'BsaI'], ['Name', 'Test'], ['Output separator', '-'],
+            [], [], [], [],
+            ['Assembly composition', 'Part name ->'] + [f'input Plasmid {i + 1}' for i in range(count)],
+            ['', 'Part types ->'],
+            ['', 'Is optional part ->'] + ['True'] * count,
+            ['', 'Part name should be in output name ->'] + ['True'] * count,
+            ['', 'Part separator ->'],
+            ['Output plasmid id ↓', 'OutputType (optional) ↓'] + ['↓'] * count,
+        ] + [[output_id, ''] + parts for output_id, parts in constructs]
+        template = io.StringIO()
+        csv.writer(template, delimiter=';').writerows(row + [''] * (count + 2 - len(row)) for row in rows)
+        mapping_csv = 'pID;Name\n' + ''.join(f'{pid};{name}\n' for pid, name in mapping)
+        return (
+            pathlib.Path(self.write_source('template.csv', template.getvalue().encode())),
+            pathlib.Path(self.write_source('map.csv', mapping_csv.encode())),
+        )
+
+
+class SimulatorCachesMixin(MediaRootMixin):
+    """ Caches des GenBank parsés, des overhangs et des pièces patchées dans le dossier temporaire. """
+
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+        from my_insillyclo.cache import GenBankCache, OverhangCache, PatchedPartCache
+
+        self.artifacts = PatchedPartCache(directory=os.path.join(self.media_root, 'cache', 'patched'))
+        self.overhang_cache = OverhangCache(directory=os.path.join(self.media_root, 'cache', 'overhangs'))
+        genbank_cache = GenBankCache(directory=os.path.join(self.media_root, 'cache', 'genbank'))
+        for patcher in (
+            mock.patch('my_insillyclo.patching.get_patched_part_cache', return_value=self.artifacts),
+            mock.patch('my_insillyclo.patching.get_genbank_cache', return_value=genbank_cache),
+            mock.patch('my_insillyclo.overhangs.get_overhang_cache', return_value=self.overhang_cache),
+            mock.patch('my_insillyclo.overhangs.get_genbank_cache', return_value=genbank_cache),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+# =============================================================================
+# STOCKAGE ADRESSÉ PAR CONTENU
+# =============================================================================
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+
+    def save(self, name, data):
+        return content_addressed_storage.save(f"plasmids/{name}", ContentFile(data))
+
+    def test_same_content_keeps_each_name(self):
+        first = self.save('pMYT001.gb', b'LOCUS same')
+        second = self.save('pXYZ999.gb', b'LOCUS same')
+        self.assertEqual(os.path.basename(first), 'pMYT001.gb')
+        self.assertEqual(os.path.basename(second), 'pXYZ999.gb')
+        self.assertEqual(digest_from_name(first), digest_from_name(second))
+        # Un seul fichier sur disque
+        self.assertTrue(os.path.samefile(
+            content_addressed_storage.path(first), content_addressed_storage.path(second)
+        ))
+        self.assertEqual(ContentBlob.objects.get().ref_count, 2)
+
+    def test_same_name_same_content_is_shared(self):
+        self.assertEqual(self.save('a.gb', b'x'), self.save('a.gb', b'x'))
+        self.assertEqual(ContentBlob.objects.get().ref_count, 2)
+
+    def test_release_removes_content_with_last_reference(self):
+        first = self.save('a.gb', b'data')
+        second = self.save('b.gb', b'data')
+        content_addressed_storage.release(first)
+        self.assertTrue(content_addressed_storage.exists(second))
+        self.assertEqual(ContentBlob.objects.get().ref_count, 1)
+        content_addressed_storage.release(second)
+        self.assertFalse(ContentBlob.objects.exists())
+        self.assertFalse(os.path.exists(os.path.dirname(content_addressed_storage.path(second))))
+
+    def test_name_colliding_with_a_legacy_file_is_kept(self):
+        from biolib.models import Plasmid, PlasmidCollection
+
+        # Fichier d'un import antérieur au stockage adressé par contenu, au même chemin
+        legacy = os.path.join(self.media_root, 'plasmids', 'pMYT001.gb')
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'wb') as f:
+            f.write(b'LOCUS legacy')
+        self.assertEqual(os.path.basename(self.save('pMYT001.gb', b'LOCUS new')), 'pMYT001.gb')
+
+        plasmid = Plasmid(collection=PlasmidCollection.objects.create(name='c'), identifier='pMYT001')
+        plasmid.genbank_file.save('pMYT001.gb', ContentFile(b'LOCUS admin'), save=False)
+        self.assertEqual(os.path.basename(plasmid.genbank_file.name), 'pMYT001.gb')
+
+    def test_long_names_fit_the_field(self):
+        name = content_addressed_storage.save(f"plasmids/{'p' * 300}.gb", ContentFile(b'x'), max_length=255)
+        self.assertEqual(len(name), 255)
+        self.assertTrue(name.endswith('p.gb'))
+
+    def test_release_ignores_files_outside_the_store(self):
+        content_addressed_storage.release('plasmids/legacy.gb')
+        content_addressed_storage.release('')
+
+    def test_save_many_names_and_counts(self):
+        self.save('old.gb', b'one')
+        items = [self.source_item('a.gb', b'one'), self.source_item('b.gb', b'two'), self.source_item('c.gb', b'two')]
+        names = content_addressed_storage.save_many('plasmids/', items)
+        self.assertEqual([os.path.basename(n) for n in names], ['a.gb', 'b.gb', 'c.gb'])
+        self.assertEqual(
+            dict(ContentBlob.objects.values_list('digest', 'ref_count')),
+            {items[0][2]: 2, items[1][2]: 2},
+        )
+        with content_addressed_storage.open(names[2]) as f:
+            self.assertEqual(f.read(), b'two')
+
+    def test_migration_restores_plasmid_file_names(self):
+        from importlib import import_module
+        from django.apps import apps
+        from biolib.models import Plasmid, PlasmidCollection
+
+        migration = import_module('biolib.migrations.0014_plasmid_file_names')
+        first = self.save('pMYT001.gb', b'LOCUS same')
+        shared = self.save('pXYZ999.gb', b'LOCUS same')
+        collection = PlasmidCollection.objects.create(name='c')
+        plasmid = Plasmid.objects.create(collection=collection, identifier='pXYZ999', sequence='')
+        # Ligne écrite avant la correction : elle pointe vers le nom du premier import
+        Plasmid.objects.filter(pk=plasmid.pk).update(genbank_file=first)
+
+        migration.restore_plasmid_file_names(apps, None)
+        plasmid.refresh_from_db()
+        self.assertEqual(plasmid.genbank_file.name, shared)
+        self.assertEqual(ContentBlob.objects.get().ref_count, 2)
+
+
+# =============================================================================
+# IMPORT INITIAL (load_initial_data)
+# =============================================================================
+
+class LoadInitialDataTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from biolib.models import User
+        User.objects.create_superuser('admin@example.com', 'pass')
+        self.data_dir = os.path.join(self.media_root, 'sources')
+
+    def load(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_initial_data', dir=self.data_dir, jobs=1, stdout=out)
+        return out.getvalue()
+
+    def test_unchanged_parsed_files_are_skipped(self):
+        from biolib.models import Plasmid
+        self.write_source('pA.gb', genbank_bytes('pA', 'ACGTACGTAA'))
+        self.load()
+        plasmid = Plasmid.objects.get(identifier='pA')
+        self.assertEqual((plasmid.sequence, plasmid.length, plasmid.topology), ('ACGTACGTAA', 10, 'circular'))
+        self.assertIn('0 importés, 0 mis à jour, 1 ignorés', self.load())
+
+    def test_rows_imported_before_parsing_are_reparsed(self):
+        from biolib.models import Plasmid, PlasmidCollection
+        data = genbank_bytes('pB', 'GGGGCCCCAAAATTTT')
+        self.write_source('pB.gb', data)
+        # Ligne d'un ancien import : début du fichier en guise de séquence, pas de checksum
+        name = content_addressed_storage.save('plasmids/pB.gb', ContentFile(data))
+        Plasmid.objects.create(
+            collection=PlasmidCollection.objects.create(name='c'), identifier='pB',
+            genbank_file=name, sequence=data.decode()[:200] + '...',
+        )
+        self.assertIn('0 importés, 1 mis à jour', self.load())
+        plasmid = Plasmid.objects.get(identifier='pB')
+        self.assertEqual(plasmid.sequence, 'GGGGCCCCAAAATTTT')
+        self.assertTrue(plasmid.checksum)
+        # Même contenu : une seule référence une fois l'ancien nom libéré
+        self.assertEqual(ContentBlob.objects.get().ref_count, 1)
+
+    def test_fasta_sources_are_stored_as_genbank(self):
+        from biolib.models import Plasmid
+        self.write_source('pF.fasta', b'>pF\nACGTACGTTT\n')
+        self.write_source('bad.fasta', b'pas un fasta')
+        self.assertIn('1 importés, 0 mis à jour, 0 ignorés (déjà existants), 1 erreurs', self.load())
+        plasmid = Plasmid.objects.get()
+        self.assertEqual((plasmid.identifier, plasmid.sequence), ('pF', 'ACGTACGTTT'))
+        self.assertTrue(plasmid.genbank_file.name.endswith('/pF.gb'))
+        with open(plasmid.genbank_file.path) as f:
+            self.assertTrue(f.read().startswith('LOCUS       pF'))
+        # Conversion reproductible : le fichier inchangé n'est pas réimporté
+        self.assertIn('0 importés, 0 mis à jour, 1 ignorés', self.load())
+
+
+# =============================================================================
+# IMPORT DE FICHIERS PAR LE NAVIGATEUR
+# =============================================================================
+
+class PlasmidUploadTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from biolib.models import PlasmidCollection
+        self.user = User.objects.create_user('user@example.com', 'pass', username='user')
+        self.collection = PlasmidCollection.objects.create(name='c', owner=self.user)
+        self.client.force_login(self.user)
+
+    def upload(self, *files):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        url = reverse('plasmid_upload', args=[self.collection.id])
+        with mock.patch('biolib.views.enqueue_plasmid_parsing') as enqueue:
+            response = self.client.post(url, {'files': [SimpleUploadedFile(n, data) for n, data in files]})
+        return response, enqueue
+
+    def test_fasta_is_converted_by_the_parsing_job(self):
+        from biolib.jobs import parse_plasmids
+        from biolib.models import Plasmid
+
+        response, enqueue = self.upload(('pF.fasta', b'>pF\nACGTACGTTT\n'))
+        self.assertRedirects(response, reverse('collection_detail', args=[self.collection.id]))
+        plasmid = Plasmid.objects.get()
+        # La requête ne fait que ranger le fichier reçu
+        self.assertEqual((plasmid.identifier, plasmid.sequence), ('pF.gb', ''))
+        self.assertTrue(plasmid.genbank_file.name.endswith('/pF.fasta'))
+        raw_path = plasmid.genbank_file.path
+        enqueue.assert_called_once_with([plasmid.id])
+
+        self.assertEqual(parse_plasmids([plasmid.id]), 1)
+        plasmid.refresh_from_db()
+        self.assertTrue(plasmid.genbank_file.name.endswith('/pF.gb'))
+        with open(plasmid.genbank_file.path) as f:
+            self.assertTrue(f.read().startswith('LOCUS       pF'))
+        self.assertEqual(plasmid.sequence, 'ACGTACGTTT')
+        self.assertFalse(os.path.exists(raw_path))
+
+    def test_unreadable_file_is_left_unparsed(self):
+        from biolib.jobs import parse_plasmids
+        from biolib.models import Plasmid
+
+        response, enqueue = self.upload(('pA.gb', genbank_bytes('pA', 'ACGT')), ('bad.fasta', b'pas un fasta'))
+        self.assertRedirects(response, reverse('collection_detail', args=[self.collection.id]))
+        self.assertEqual(parse_plasmids(enqueue.call_args.args[0]), 1)
+        self.assertEqual(
+            dict(Plasmid.objects.values_list('identifier', 'sequence')), {'pA.gb': 'ACGT', 'bad.gb': ''},
+        )
+        self.assertTrue(Plasmid.objects.get(identifier='bad.gb').genbank_file.name.endswith('/bad.fasta'))
+
+    def test_duplicate_names_are_reported(self):
+        import io
+        import zipfile
+        from biolib.models import Plasmid
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('kit/pA.gb', genbank_bytes('pA', 'ACGTAA'))
+            zf.writestr('autre/pA.gb', genbank_bytes('pA', 'TTTTTT'))
+        response, _ = self.upload(
+            ('kit.zip', archive.getvalue()), ('pA.fasta', b'>pA\nGGGG\n'), ('pB.gb', genbank_bytes('pB', 'CCCC')),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['duplicates'], ['pA.gb', 'pA.fasta'])
+        self.assertContains(response, '2 fichiers importés')
+        self.assertEqual(
+            sorted(Plasmid.objects.values_list('identifier', flat=True)), ['pA.gb', 'pB.gb'],
+        )
+
+    def test_file_already_in_the_collection_is_skipped(self):
+        from biolib.models import Plasmid
+
+        self.upload(('pA.gb', genbank_bytes('pA', 'ACGTAA')))
+        response, enqueue = self.upload(
+            ('copie.gb', genbank_bytes('pA', 'ACGTAA')), ('pB.gb', genbank_bytes('pB', 'CCCC')),
+        )
+        self.assertEqual(response.context['duplicates'], ['copie.gb'])
+        self.assertContains(response, '1 fichier importé')
+        self.assertEqual(
+            sorted(Plasmid.objects.values_list('identifier', flat=True)), ['pA.gb', 'pB.gb'],
+        )
+        enqueue.assert_called_once_with([Plasmid.objects.get(identifier='pB.gb').id])
+
+    def test_sequence_already_in_the_collection_is_dropped_when_parsed(self):
+        from biolib.jobs import parse_plasmids
+        from biolib.models import Plasmid
+
+        _, enqueue = self.upload(('pA.gb', genbank_bytes('pA', 'ACGTAA')))
+        parse_plasmids(enqueue.call_args.args[0])
+        # Même séquence sous deux autres formes : fichiers différents, donc importés
+        _, enqueue = self.upload(('pA.fasta', b'>pA\nACGTAA\n'), ('pA2.fa', b'>pA2\nACGTAA\n'))
+        new_ids = enqueue.call_args.args[0]
+        self.assertEqual(len(new_ids), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(parse_plasmids(new_ids), 0)
+        self.assertEqual(list(Plasmid.objects.values_list('identifier', flat=True)), ['pA.gb'])
+        stored = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(os.path.join(self.media_root, 'plasmids')) for name in names
+        ]
+        self.assertEqual(stored, [Plasmid.objects.get().genbank_file.path])
+
+    def test_tar_archive_is_expanded(self):
+        import io
+        import tarfile
+        from biolib.models import Plasmid
+
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as tf:
+            for name, data in (
+                ('kit/pA.gb', genbank_bytes('pA', 'ACGTAA')),
+                ('kit/sub/pB.fasta', b'>pB\nGGGG\n'),
+                ('kit/._pA.gb', b'\x00\x05\x16\x07'),
+                ('kit/README.txt', b'notes'),
+            ):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+        response, enqueue = self.upload(('kit.tar.gz', archive.getvalue()))
+        self.assertRedirects(response, reverse('collection_detail', args=[self.collection.id]))
+        self.assertEqual(
+            sorted(Plasmid.objects.values_list('identifier', flat=True)), ['pA.gb', 'pB.gb'],
+        )
+        self.assertEqual(len(enqueue.call_args.args[0]), 2)
+
+
+class SimulationBatchFormTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('user@example.com', 'pass', username='user')
+        self.client.force_login(self.user)
+
+    def post(self, templates, campaigns):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        data = {
+            'enzyme': 'BsaI',
+            'template_files': [SimpleUploadedFile(name, b'Output plasmid id;\n') for name in templates],
+            'campaign_files': [SimpleUploadedFile(name, b'pID;Name\n') for name in campaigns],
+        }
+        with mock.patch('biolib.views.enqueue_batch') as enqueue:
+            response = self.client.post(reverse('create_simulation_batch'), data)
+        return response, enqueue
+
+    def test_one_mapping_for_every_template(self):
+        from biolib.models import Simulation
+
+        response, enqueue = self.post(['t1.csv', 't2.xlsx'], ['map.csv'])
+        self.assertRedirects(response, reverse('simulation_list'), fetch_redirect_response=False)
+        simulations = list(Simulation.objects.order_by('id'))
+        self.assertEqual(len(simulations), 2)
+        self.assertEqual({s.status for s in simulations}, {Simulation.STATUS_PENDING})
+        for simulation in simulations:
+            with simulation.campaign_file.open('rb') as f:
+                self.assertEqual(f.read(), b'pID;Name\n')
+        enqueue.assert_called_once_with([s.id for s in simulations])
+
+    def test_invalid_batches_are_rejected(self):
+        from biolib.models import Simulation
+
+        for templates, campaigns, message in (
+            (['t1.csv', 't2.csv', 't3.csv'], ['m1.csv', 'm2.csv'], 'un seul pour tous'),
+            (['t1.csv'], ['map.txt'], 'Format non accepté : map.txt'),
+            ([], ['map.csv'], 'au moins un fichier template'),
+        ):
+            response, enqueue = self.post(templates, campaigns)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(message, ' '.join(response.context['form'].non_field_errors()))
+            enqueue.assert_not_called()
+        self.assertFalse(Simulation.objects.exists())
+
+
+# =============================================================================
+# MIGRATIONS DE DONNÉES
+# =============================================================================
+
+class ParsedSequenceBackfillTests(MediaRootMixin, TestCase):
+
+    def test_backfill_reparses_stored_files(self):
+        from importlib import import_module
+        from django.apps import apps
+        from biolib.models import Plasmid, PlasmidCollection
+        from my_insillyclo.sequence import unpack_2bit
+
+        migration = import_module('biolib.migrations.0015_plasmid_backfill_parsed_sequence')
+        data = genbank_bytes('pOld', 'ACGTNNACGT', topology='linear')
+        collection = PlasmidCollection.objects.create(name='c')
+        old = Plasmid.objects.create(
+            collection=collection, identifier='pOld', sequence=data.decode()[:200] + '...',
+            genbank_file=content_addressed_storage.save('plasmids/pOld.gb', ContentFile(data)),
+        )
+        missing = Plasmid.objects.create(
+            collection=collection, identifier='pMissing', sequence='', genbank_file='plasmids/absent.gb',
+        )
+
+        migration.backfill_parsed_sequence(apps, None)
+        old.refresh_from_db()
+        self.assertEqual((old.sequence, old.length, old.topology), ('ACGTNNACGT', 10, 'linear'))
+        self.assertEqual(unpack_2bit(old.packed_sequence), 'ACGTNNACGT')
+        self.assertEqual(Plasmid.objects.get(pk=missing.pk).checksum, '')
+
+
+# =============================================================================
+# LECTURE DES FICHIERS DE CAMPAGNE
+# =============================================================================
+
+class CampaignFileReadingTests(MediaRootMixin, SimpleTestCase):
+
+    def test_delimiter_is_sniffed(self):
+        from my_insillyclo.campaign_files import sniff_delimiter
+
+        for name, data, expected in (
+            ('semicolon.csv', b'pID;Name\npA;promoter\n', ';'),
+            ('comma.csv', b'pID,Name\npA,promoter\n', ','),
+            ('tab.csv', b'pID\tName\npA\tpromoter\n', '\t'),
+            ('empty.csv', b'', ';'),
+        ):
+            self.assertEqual(sniff_delimiter(self.write_source(name, data)), expected, name)
+
+    def test_chunks_are_bounded(self):
+        from my_insillyclo.campaign_files import read_chunks
+
+        path = self.write_source('map.csv', b'pID;Name\n' + b''.join(b'p%d;n%d\n' % (i, i) for i in range(5)))
+        chunks = list(read_chunks(path, chunk_rows=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[-1].iloc[0].tolist(), ['p4', 'n4'])
+
+    def test_name_mapping(self):
+        from my_insillyclo.campaign_files import read_name_mapping
+
+        first = self.write_source('a.csv', b' PID ; name ;Mass Concentration\npA ; promoter ;12\npB;;\n')
+        second = self.write_source('b.csv', b'pID,Name\npC,cds\n')
+        no_name = self.write_source('c.csv', b'pID;Other\npD;x\n')
+        self.assertEqual(read_name_mapping([first, second, no_name]), {
+            'promoter': 'pA', 'pA': 'pA', 'pB': 'pB', 'cds': 'pC', 'pC': 'pC',
+        })
+
+    def test_ragged_template_rows(self):
+        import math
+        from my_insillyclo.campaign_files import read_template_frame
+
+        path = self.write_source('template.csv', b'Assembly settings;\nlevel;1\nc1;pA;pB;pC\n')
+        df = read_template_frame(path)
+        self.assertEqual(df.shape, (3, 4))
+        self.assertTrue(math.isnan(df.iloc[0, 1]))
+        self.assertEqual(df.iloc[2].tolist(), ['c1', 'pA', 'pB', 'pC'])
+
+    def test_template_frame_is_built_by_blocks(self):
+        from my_insillyclo.campaign_files import read_template_frame
+
+        path = self.write_source(
+            'template.csv', b'Assembly settings;\nlevel;1\n\nc1;pA;pB;pC\nc2;pA\nc3;pD;pE;pF;pG\n',
+        )
+        expected = read_template_frame(path)
+        for chunk_rows in (1, 2, 4):
+            df = read_template_frame(path, chunk_rows=chunk_rows)
+            self.assertTrue(df.equals(expected), chunk_rows)
+        self.assertEqual(expected.shape, (6, 5))
+        self.assertEqual(expected.iloc[5].tolist(), ['c3', 'pD', 'pE', 'pF', 'pG'])
+
+
+# =============================================================================
+# BRANCHEMENT INSILLYCLO
+# =============================================================================
+
+class TemplateParserMemoTests(MediaRootMixin, SimpleTestCase):
+
+    def test_notifications_are_replayed_on_memo_hits(self):
+        from unittest import mock
+        from my_insillyclo.campaign_files import memoize_template_parser
+
+        calls = []
+
+        def parse(path, input_part_factory, assembly_factory, plasmid_factory, observer, load_only_assembly=False):
+            calls.append(path)
+            observer.notify_missing_input_part(input_part='x')
+            return 'assembly', [['plasmid']]
+
+        parser = memoize_template_parser(parse)
+        path = self.write_source('template.csv', b'a;b\n')
+        first, second = mock.Mock(), mock.Mock()
+        result = parser(path, None, None, None, first)
+        again = parser(path, None, None, None, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result, again)
+        self.assertIsNot(result[1], again[1])
+        second.notify_missing_input_part.assert_called_once_with(input_part='x')
+
+
+class InsillycloUpstreamTests(SimpleTestCase):
+    """ Le wrapper appelle des fonctions internes d'insillyclo 1.1.0 : ces tests échouent si elles changent. """
+
+    def test_pinned_version(self):
+        from importlib.metadata import version
+        self.assertEqual(version('insillyclo'), '1.1.0')
+
+    def test_upstream_signatures(self):
+        import inspect
+        from my_insillyclo.pipeline import UPSTREAM_FUNCTIONS
+        for function, names in UPSTREAM_FUNCTIONS.items():
+            parameters = inspect.signature(function).parameters
+            self.assertFalse(set(names) - set(parameters), function.__qualname__)
+
+    def test_compute_all_is_still_the_mirrored_pipeline(self):
+        # pipeline.run_assembly reprend compute_all : une nouvelle option en amont est à reporter
+        import inspect
+        import insillyclo.simulator
+        self.assertEqual(set(inspect.signature(insillyclo.simulator.compute_all).parameters), {
+            'input_template_filled', 'settings', 'input_parts_files', 'gb_plasmids', 'enzyme_names',
+            'default_mass_concentration', 'concentration_file', 'output_dir', 'primer_id_pairs', 'primers_file',
+            'data_source', 'observer', 'default_output_plasmid_volume', 'enzyme_and_buffer_volume',
+            'minimal_remaining_well_volume', 'puncture_volume_10x', 'minimal_puncture_volume',
+            'expected_concentration_in_output', 'sbol_export', 'target_dilutions',
+        })
+        self.assertEqual(insillyclo.simulator.SimulationOutput._fields, ('plasmid_ids', 'dilutions'))
+        # Toutes les options de compute_all, hors entrées déjà préparées, sont reprises
+        from my_insillyclo.pipeline import DILUTION_OPTIONS, run_assembly
+        prepared = {'input_template_filled', 'input_parts_files', 'gb_plasmids'}
+        self.assertFalse(
+            set(inspect.signature(insillyclo.simulator.compute_all).parameters) - prepared
+            - set(inspect.signature(run_assembly).parameters)
+        )
+        self.assertFalse(set(DILUTION_OPTIONS) - set(inspect.signature(insillyclo.simulator.compute_all).parameters))
+
+    def test_dilution_options_reach_insillyclo(self):
+        from unittest import mock
+        from my_insillyclo import simulator
+
+        output_dir = pathlib.Path(tempfile.mkdtemp(prefix='biolib-test-'))
+        self.addCleanup(shutil.rmtree, output_dir, ignore_errors=True)
+        assembly = mock.Mock(enzyme='BsaI')
+        with mock.patch.object(simulator, 'prepare_template', side_effect=lambda path: path), \
+                mock.patch.object(simulator, '_parse_template', return_value=(assembly, [])), \
+                mock.patch.object(simulator, '_dynamic_compatibility_layer', return_value=[]), \
+                mock.patch.object(simulator, 'fetch_input_part_sequences', return_value={}), \
+                mock.patch('insillyclo.gel.enzyme_digestion_to_gel'), \
+                mock.patch('insillyclo.gel.pcr_amplification_to_gel'), \
+                mock.patch('insillyclo.dilution.compute_all_dilutions', return_value={}) as dilutions:
+            simulator.compute_all(
+                observer=mock.Mock(), settings=None, input_template_filled='t.csv', input_parts_files=[],
+                gb_plasmids=[], output_dir=output_dir, data_source='Django', enzyme_names='BsaI',
+                default_mass_concentration=200, puncture_volume_10x=1.5, target_dilutions=['direct'],
+            )
+        kwargs = dilutions.call_args.kwargs
+        self.assertEqual((kwargs['puncture_volume_10x'], kwargs['target_dilutions']), (1.5, ['direct']))
+        self.assertIsNone(kwargs['output_plasmid_expected_volume'])
+
+    def test_insillyclo_modules_are_not_patched(self):
+        import pandas
+        import insillyclo.parser
+        import insillyclo.simulator
+        import my_insillyclo.simulator  # noqa: F401
+        self.assertIs(insillyclo.parser.pd, pandas)
+        self.assertEqual(insillyclo.simulator.fetch_gb_for_input_parts.__module__, 'insillyclo.simulator')
+        self.assertFalse(hasattr(insillyclo.parser.parse_assembly_and_plasmid_from_template, '__wrapped__'))
+
+    def test_mirrored_template_parser_is_up_to_date(self):
+        # template_parser.parse_template_frame reprend ce parser : à reporter s'il change
+        import inspect
+        import insillyclo.parser
+        from my_insillyclo.template_parser import UPSTREAM_PARSER_DIGEST
+        source = inspect.getsource(insillyclo.parser.parse_assembly_and_plasmid_from_template)
+        self.assertEqual(hashlib.sha256(source.encode()).hexdigest(), UPSTREAM_PARSER_DIGEST)
+
+
+class TemplateParserTests(MediaRootMixin, SimpleTestCase):
+
+    def test_csv_template_parses_like_the_excel_one(self):
+        from unittest import mock
+        import pandas
+        import insillyclo.models
+        import insillyclo.observer
+        import insillyclo.parser
+        from django.conf import settings
+        from my_insillyclo.simulator import parse_template_file
+
+        excel = os.path.join(settings.BASE_DIR, 'data_web', 'Simple_assembly', 'Campaign_Venus.xlsx')
+        csv_path = os.path.join(self.media_root, 'Campaign_Venus.csv')
+        pandas.read_excel(excel, header=None).to_csv(csv_path, sep=';', header=False, index=False)
+        arguments = dict(
+            input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+            assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+            plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+            observer=insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False),
+        )
+        expected = insillyclo.parser.parse_assembly_and_plasmid_from_template(excel, **arguments)
+        # Un CSV ne doit jamais passer par pd.read_excel
+        with mock.patch('pandas.read_excel', side_effect=AssertionError('read_excel appelé')):
+            self.assertEqual(parse_template_file(csv_path, **arguments), expected)
+
+    def test_frame_parser_matches_insillyclo(self):
+        import pandas
+        import insillyclo.models
+        import insillyclo.observer
+        import insillyclo.parser
+        from django.conf import settings
+        from my_insillyclo.template_parser import parse_template_frame
+
+        for folder, name in (('Simple_assembly', 'Campaign_Venus.xlsx'), ('Typed_assembly', 'Campaign_display_L1.xlsx')):
+            excel = os.path.join(settings.BASE_DIR, 'data_web', folder, name)
+            for load_only_assembly in (False, True):
+                arguments = dict(
+                    input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+                    assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+                    plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+                    observer=insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False),
+                    load_only_assembly=load_only_assembly,
+                )
+                self.assertEqual(
+                    parse_template_frame(pandas.read_excel(excel, sheet_name=0, header=None), **arguments),
+                    insillyclo.parser.parse_assembly_and_plasmid_from_template(excel, **arguments),
+                    name,
+                )
+
+
+# =============================================================================
+# CACHES DU SIMULATEUR
+# =============================================================================
+
+class GenBankCacheTests(MediaRootMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from my_insillyclo.cache import GenBankCache
+        self.cache = GenBankCache(directory=os.path.join(self.media_root, 'cache'), memory_entries=1)
+
+    def test_content_is_parsed_once(self):
+        from unittest import mock
+        import Bio.SeqIO
+
+        data = genbank_bytes('pA', 'ACGTACGTAA')
+        first = pathlib.Path(self.write_source('pA.gb', data))
+        renamed = pathlib.Path(self.write_source('copie/pA-bis.gb', data))
+        with mock.patch('Bio.SeqIO.read', wraps=Bio.SeqIO.read) as read:
+            record = self.cache.read(first)
+            again = self.cache.read(renamed)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(str(again.seq), 'ACGTACGTAA')
+        # Chaque lecture est un nouvel objet (insillyclo modifie les annotations)
+        record.annotations['mass_concentration'] = 1
+        self.assertNotIn('mass_concentration', again.annotations)
+
+    def test_disk_entries_survive_the_memory_bound(self):
+        from unittest import mock
+        from my_insillyclo.cache import GenBankCache
+
+        a = pathlib.Path(self.write_source('pA.gb', genbank_bytes('pA', 'AAAA')))
+        b = pathlib.Path(self.write_source('pB.gb', genbank_bytes('pB', 'CCCC')))
+        self.cache.read(a)
+        self.cache.read(b)
+        other_process = GenBankCache(directory=os.path.join(self.media_root, 'cache'))
+        with mock.patch('Bio.SeqIO.read', side_effect=AssertionError):
+            self.assertEqual(str(self.cache.read(a).seq), 'AAAA')
+            self.assertEqual(str(other_process.read(b).seq), 'CCCC')
+
+    def test_modified_file_is_reparsed(self):
+        path = pathlib.Path(self.write_source('pA.gb', genbank_bytes('pA', 'AAAA')))
+        self.cache.read(path)
+        with open(path, 'wb') as f:
+            f.write(genbank_bytes('pA', 'GGGGG'))
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(str(self.cache.read(path).seq), 'GGGGG')
+
+
+class PatchedPartCacheTests(SimulatorCachesMixin, SimpleTestCase):
+
+    def test_same_content_and_overhangs_reuse_the_artifact(self):
+        from unittest import mock
+        from my_insillyclo.patching import _patch_sequence_dynamically, patch_file
+
+        data = genbank_bytes('pA', 'ACGTACGT')
+        source = pathlib.Path(self.write_source('pA.gb', data))
+        first = patch_file((source, pathlib.Path(self.media_root) / 'run1.gb', 'GGAG', 'AATG'))
+        # Même contenu sous un autre nom, dans une autre campagne : pas de nouveau patch
+        renamed = pathlib.Path(self.write_source('copie/pA-bis.gb', data))
+        with mock.patch('my_insillyclo.patching._patch_sequence_dynamically', side_effect=AssertionError):
+            again = patch_file((renamed, pathlib.Path(self.media_root) / 'run2.gb', 'GGAG', 'AATG'))
+        self.assertEqual(again.read_bytes(), first.read_bytes())
+
+        # Autres connecteurs : autre artefact
+        with mock.patch(
+            'my_insillyclo.patching._patch_sequence_dynamically', wraps=_patch_sequence_dynamically,
+        ) as patch:
+            other = patch_file((source, pathlib.Path(self.media_root) / 'run3.gb', 'GCTT', 'AATG'))
+        patch.assert_called_once()
+        self.assertNotEqual(other.read_bytes(), first.read_bytes())
+
+    def test_size_bound_evicts_least_recently_used(self):
+        from my_insillyclo.cache import PatchedPartCache
+
+        cache = PatchedPartCache(directory=os.path.join(self.media_root, 'bounded'), max_bytes=250)
+        keys = [cache.key(str(i), 'GGAG', 'AATG') for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            produced = pathlib.Path(self.write_source(f'out{i}.gb', b'x' * 100))
+            cache.store(key, produced)
+            os.utime(produced, (i, i))
+        # La première entrée vient d'être relue : c'est la seconde qui part
+        self.assertTrue(cache.fetch(keys[0], pathlib.Path(self.media_root) / 'hit.gb'))
+        cache.store(keys[2], pathlib.Path(self.write_source('out2.gb', b'x' * 100)))
+        dst = pathlib.Path(self.media_root) / 'dst.gb'
+        self.assertEqual([cache.fetch(key, dst) for key in keys], [True, False, True])
+
+
+class InputPartSequenceTests(MediaRootMixin, SimpleTestCase):
+
+    def test_mapping_names_and_concentrations(self):
+        from insillyclo.models import get_direct_identifier
+        from my_insillyclo.simulator import fetch_input_part_sequences
+
+        direct = ('pB', get_direct_identifier())
+        gb = [
+            pathlib.Path(self.write_source('pA.gb', genbank_bytes('pA', 'AAAA'))),
+            pathlib.Path(self.write_source('pB.gb', genbank_bytes('pB', 'CCCC'))),
+        ]
+        mapping = self.write_source('map.csv', b'pID;Name;Mass Concentration\npA;promoter;12.5\npB;cds;\n')
+        needed = {('promoter', None), ('cds', None), direct}
+        sequences = fetch_input_part_sequences(needed, [mapping], gb, None)
+        self.assertEqual(set(sequences), needed)
+        self.assertEqual(sequences[('promoter', None)].name, 'pA')
+        self.assertEqual(sequences[('promoter', None)].annotations['mass_concentration'], 12.5)
+        self.assertNotIn('mass_concentration', sequences[('cds', None)].annotations)
+
+
+# =============================================================================
+# PATCH DES PIÈCES
+# =============================================================================
+
+class PatchFilesTests(SimulatorCachesMixin, SimpleTestCase):
+    """ patch_files sur le pool de processus (forcé même pour quelques fichiers). """
+
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+        from my_insillyclo import patching
+
+        # Workers démarrés pour ce test, avec un cache d'artefacts temporaire
+        for patcher in (
+            mock.patch.dict(os.environ, INSILLYCLO_CACHE_DIR=os.path.join(self.media_root, 'cache')),
+            mock.patch.object(patching, '_pool', None),
+            mock.patch.object(patching, 'PATCH_POOL_MIN_TASKS', 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: patching._pool and patching._pool.shutdown(wait=True))
+
+    def task(self, name, sequence):
+        source = pathlib.Path(self.write_source(f'{name}.gb', genbank_bytes(name, sequence)))
+        return source, pathlib.Path(self.media_root) / f'{name}-patched.gb', 'GGAG', 'AATG'
+
+    def test_output_follows_task_order(self):
+        from my_insillyclo.patching import patch_files
+
+        # La première pièce, bien plus longue, finit après les autres
+        tasks = [self.task('pLong', 'ACGT' * 50000)] + [self.task(f'p{i}', 'ACGTAC') for i in range(6)]
+        seen = []
+        patched, errors = patch_files(tasks, workers=2, progress=lambda done, total: seen.append((done, total)))
+        self.assertEqual(errors, [])
+        self.assertEqual(patched, [dst for _, dst, _, _ in tasks])
+        self.assertEqual(seen, [(i, len(tasks)) for i in range(1, len(tasks) + 1)])
+        with open(tasks[1][1]) as f:
+            self.assertIn('1 ggtctcagga gacgtacaat gtgagacc', f.read())
+
+    def test_pool_with_a_killed_worker_is_replaced(self):
+        from concurrent.futures.process import BrokenProcessPool
+        from my_insillyclo import patching
+
+        pool = patching._get_pool(2)
+        with self.assertRaises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+        tasks = [self.task(f'p{i}', 'ACGTAC') for i in range(3)]
+        self.assertEqual(patching.patch_files(tasks, workers=2), ([dst for _, dst, _, _ in tasks], []))
+        self.assertIsNot(patching._pool, pool)
+
+    def test_pool_breaking_mid_run_falls_back_to_serial(self):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        from unittest import mock
+        from my_insillyclo import patching
+
+        class DyingPool:
+            """ Le premier fichier est patché, puis le worker meurt. """
+            def __init__(self):
+                self.submitted = 0
+                self.shutdown = mock.Mock()
+
+            def submit(self, fn, task):
+                future = Future()
+                if self.submitted == 0:
+                    future.set_result(fn(task))
+                else:
+                    future.set_exception(BrokenProcessPool('worker tué'))
+                self.submitted += 1
+                return future
+
+        pool = DyingPool()
+        tasks = [self.task(f'p{i}', 'ACGTAC' * (i + 1)) for i in range(4)]
+        seen = []
+        with mock.patch.object(patching, '_get_pool', return_value=pool):
+            patched, errors = patching.patch_files(tasks, workers=2, progress=lambda done, total: seen.append(done))
+        self.assertEqual((patched, errors), ([dst for _, dst, _, _ in tasks], []))
+        self.assertEqual(seen, [1, 2, 3, 4])
+        pool.shutdown.assert_called_once()
+
+    def test_worker_errors_are_collected(self):
+        from my_insillyclo.patching import patch_files
+
+        missing = (pathlib.Path(self.media_root) / 'pMissing.gb', pathlib.Path(self.media_root) / 'x.gb', 'GGAG', 'AATG')
+        tasks = [self.task('pA', 'AAAA'), missing, self.task('pB', 'CCCC')]
+        patched, errors = patch_files(tasks, workers=2)
+        self.assertEqual(patched, [tasks[0][1], tasks[2][1]])
+        self.assertEqual([stem for stem, _ in errors], ['pMissing'])
+        self.assertIn('pMissing.gb', errors[0][1])
+
+
+class PartIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        from my_insillyclo.part_index import PartIndex
+        self.paths = [pathlib.Path(f'/repo/{name}.gb') for name in ('pYTK_045', 'pYTK046', 'pYTK0451', 'pMYT001')]
+        self.index = PartIndex(self.paths)
+
+    def test_exact_then_normalized_lookup(self):
+        self.assertEqual(self.index.resolve('pYTK_045'), self.paths[0])
+        self.assertEqual(self.index.resolve('pYTK046.gb'), self.paths[1])
+        self.assertEqual(self.index.resolve('PYTK-045'), self.paths[0])
+
+    def test_unique_prefix_only(self):
+        self.assertEqual(self.index.resolve('pMYT'), self.paths[3])
+        # pYTK046 et pYTK0451 commencent tous deux par pytk04 : on ne choisit pas
+        self.assertIsNone(self.index.resolve('pYTK04'))
+        self.assertEqual(self.index.prefix_matches('pytk04'), set(self.paths[:3]))
+        # L'ancien parcours par sous-chaîne aurait trouvé pYTK046 pour 'TK046'
+        self.assertIsNone(self.index.resolve('TK046'))
+        self.assertIsNone(self.index.resolve('---'))
+
+
+class CompatibilityLayerTests(SimulatorCachesMixin, SimpleTestCase):
+    """ Couche de compatibilité, en série. """
+
+    def setUp(self):
+        super().setUp()
+        self.work_dir = pathlib.Path(self.media_root) / 'run'
+        self.work_dir.mkdir()
+
+    def run_layer(self, constructs, mapping, gb_files):
+        import insillyclo.observer
+        from my_insillyclo.simulator import _dynamic_compatibility_layer, _parse_template
+
+        template, mapping_path = self.write_campaign(constructs, mapping)
+        observer = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=True)
+        _, plasmids = _parse_template(template, observer)
+        return _dynamic_compatibility_layer(plasmids, [mapping_path], gb_files, self.work_dir, observer, 1)
+
+    def test_unused_files_are_passed_in_place(self):
+        gb = [
+            pathlib.Path(self.write_source(f'{name}.gb', genbank_bytes(name, sequence)))
+            for name, sequence in (('pa', 'AAAA'), ('pb', 'CCCC'), ('pUnused', 'GGGG'))
+        ]
+        ready = self.run_layer([('pOut', ['a', 'b'])], [('pa', 'a'), ('pb', 'b')], gb)
+        # Seules les pièces patchées sont écrites dans le dossier de la simulation
+        self.assertEqual(sorted(p.name for p in self.work_dir.iterdir()), ['pa.gb', 'pb.gb'])
+        self.assertEqual(sorted(ready), sorted([self.work_dir / 'pa.gb', self.work_dir / 'pb.gb', gb[2]]))
+
+    def write_parts(self, parts):
+        """ GenBank de chaque (nom, séquence) ; renvoie les chemins. """
+        return [pathlib.Path(self.write_source(f'{name}.gb', genbank_bytes(name, sequence))) for name, sequence in parts]
+
+    def test_domesticated_parts_are_passed_unpatched(self):
+        gb = self.write_parts([
+            ('pa', golden_gate_part('GCTG', 'AACG')),
+            ('pb', golden_gate_part('AACG', 'TATG')),
+            ('pc', golden_gate_part('TATG', 'GCTG')),
+        ])
+        ready = self.run_layer([('pOut', ['a', 'b', 'c'])], [('pa', 'a'), ('pb', 'b'), ('pc', 'c')], gb)
+        self.assertEqual(list(self.work_dir.iterdir()), [])
+        self.assertEqual(sorted(ready), sorted(gb))
+
+    def test_raw_part_is_patched_with_the_overhangs_of_its_slot(self):
+        from unittest import mock
+        from Bio import SeqIO
+        from my_insillyclo.overhangs import part_overhangs
+
+        gb = self.write_parts([
+            ('pa', golden_gate_part('GCTG', 'AACG')),
+            ('pb', golden_gate_part('AACG', 'TATG')),
+            ('pc', golden_gate_part('TATG', 'GCTG')),
+            ('pRaw', 'ACGTTGCAACGT'),
+        ])
+        mapping = [('pa', 'a'), ('pb', 'b'), ('pc', 'c'), ('pRaw', 'raw')]
+        ready = self.run_layer([('p1', ['a', 'b', 'c']), ('p2', ['a', 'raw', 'c'])], mapping, gb)
+        self.assertEqual([p.name for p in self.work_dir.iterdir()], ['pRaw.gb'])
+        self.assertIn(self.work_dir / 'pRaw.gb', ready)
+        patched = SeqIO.read(self.work_dir / 'pRaw.gb', 'genbank')
+        self.assertEqual(flanking_overhangs(str(patched.seq), 'BsaI', circular=False), ('AACG', 'TATG'))
+        # Overhangs lus une fois par (contenu, enzyme)
+        with mock.patch('my_insillyclo.overhangs.get_genbank_cache', side_effect=AssertionError):
+            self.assertEqual(part_overhangs(gb[0], 'BsaI'), ('GCTG', 'AACG'))
+
+    def test_incompatible_submitted_parts_are_rejected_before_patching(self):
+        from my_insillyclo.overhangs import OverhangError
+
+        gb = self.write_parts([
+            ('pa', golden_gate_part('GCTG', 'AACG')),
+            ('pb', golden_gate_part('TATG', 'ATCC')),
+            ('pRaw', 'ACGTTGCAACGT'),
+        ])
+        with self.assertRaises(OverhangError) as raised:
+            self.run_layer([('pOut', ['a', 'b', 'raw'])], [('pa', 'a'), ('pb', 'b'), ('pRaw', 'raw')], gb)
+        self.assertIn('pa (AACG) ne se ligature pas à pb (TATG)', str(raised.exception))
+        self.assertEqual(list(self.work_dir.iterdir()), [])
+
+    def test_demo_campaign_parts_keep_their_overhangs(self):
+        import insillyclo.observer
+        from django.conf import settings
+        from my_insillyclo.simulator import _dynamic_compatibility_layer, _parse_template
+
+        folder = pathlib.Path(settings.BASE_DIR) / 'data_web' / 'Simple_assembly'
+        plasmids_dir = pathlib.Path(settings.BASE_DIR) / 'plasmids'
+        gb = [plasmids_dir / f'{pid}.gb' for pid in ('pMYT039', 'pYTK009', 'pYTK014', 'pYTK018', 'pYTK027', 'pYTK033', 'pYTK053')]
+        observer = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=True)
+        _, plasmids = _parse_template(folder / 'Campaign_Venus.xlsx', observer)
+        ready = _dynamic_compatibility_layer(plasmids, [folder / 'iP_mapping_Simple.csv'], gb, self.work_dir, observer, 1)
+        self.assertEqual(list(self.work_dir.iterdir()), [])
+        self.assertEqual(ready, gb)
+
+
+# =============================================================================
+# PLASMIDES D'UNE CAMPAGNE
+# =============================================================================
+
+class CampaignPlasmidTests(MediaRootMixin, TestCase):
+
+    def test_only_referenced_plasmids_are_fetched(self):
+        import insillyclo.observer
+        from biolib.jobs import campaign_plasmids
+        from biolib.models import Plasmid, PlasmidCollection
+
+        collection = PlasmidCollection.objects.create(name='c')
+        for identifier in ('pa.gb', 'pb', 'pc.gb', 'pUnused.gb'):
+            Plasmid.objects.create(collection=collection, identifier=identifier)
+        # 'pc' est cité directement par son pID, sans passer par le mapping
+        template, mapping = self.write_campaign([('pOut', ['a', 'b', 'pc'])], [('pa', 'a'), ('pb', 'b')])
+        observer = insillyclo.observer.InSillyCloCliObserver(debug=False, fail_on_error=False)
+        plasmids = campaign_plasmids(template, [mapping], observer)
+        with self.assertNumQueries(1):
+            identifiers = sorted(p.identifier for p in plasmids)
+        self.assertEqual(identifiers, ['pa.gb', 'pb', 'pc.gb'])
+
+
+# =============================================================================
+# FILE D'ATTENTE DES SIMULATIONS
+# =============================================================================
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class JobQueueTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('user@example.com', 'pass')
+
+    def test_submission_does_not_compute_the_fingerprint(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.force_login(self.user)
+        with mock.patch('biolib.jobs.simulation_fingerprint', side_effect=AssertionError), \
+                mock.patch('biolib.views.enqueue_simulation') as enqueue:
+            response = self.client.post(reverse('create_simulation'), {
+                'template_file': SimpleUploadedFile('t.csv', b'a;b\n'),
+                'campaign_file': SimpleUploadedFile('m.csv', b'pID;Name\n'),
+                'enzyme': 'BsaI',
+            })
+        simulation = Simulation.objects.get()
+        self.assertRedirects(response, reverse('simulation_result', args=[simulation.pk]), fetch_redirect_response=False)
+        enqueue.assert_called_once_with(simulation.pk)
+        self.assertEqual((simulation.status, simulation.fingerprint), (Simulation.STATUS_PENDING, ''))
+
+    def test_worker_reuses_an_identical_result(self):
+        from unittest import mock
+        from biolib.jobs import compute_fingerprint, run_simulation
+
+        previous = self.demo_simulation(self.user, status=Simulation.STATUS_COMPLETED, result_file='x/digestion.svg')
+        Simulation.objects.filter(pk=previous.pk).update(fingerprint=compute_fingerprint(previous, []))
+        os.makedirs(previous.get_output_folder())
+        simulation = self.demo_simulation(self.user)
+
+        with mock.patch('my_insillyclo.simulator.compute_all', side_effect=AssertionError):
+            run_simulation(simulation.pk)
+        simulation.refresh_from_db()
+        self.assertEqual(simulation.status, Simulation.STATUS_COMPLETED)
+        self.assertEqual(simulation.get_output_dir(), previous.get_output_dir())
+        self.assertEqual(simulation.fingerprint, Simulation.objects.get(pk=previous.pk).fingerprint)
+
+    def test_batch_failure_releases_every_claimed_simulation(self):
+        from concurrent.futures.process import BrokenProcessPool
+        from unittest import mock
+        from biolib.jobs import run_simulation_batch
+
+        simulations = [self.demo_simulation(self.user) for _ in range(2)]
+        with mock.patch('my_insillyclo.batch.run_batch', side_effect=BrokenProcessPool('worker mort')):
+            run_simulation_batch([s.pk for s in simulations])
+        for simulation in simulations:
+            simulation.refresh_from_db()
+            self.assertEqual(simulation.status, Simulation.STATUS_FAILED)
+            self.assertIn('worker mort', simulation.error_message)
+
+
+class BatchPoolTests(SimpleTestCase):
+
+    def test_dead_worker_fails_its_campaigns_only(self):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        from unittest import mock
+        from my_insillyclo import batch
+
+        class BrokenPool:
+            def __init__(self, **kwargs):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def submit(self, fn, campaign, options):
+                future = Future()
+                if campaign.key == 'ok':
+                    future.set_result(batch.CampaignResult(campaign.key, True, 0.0))
+                else:
+                    future.set_exception(BrokenProcessPool('worker mort'))
+                return future
+
+        campaigns = [batch.Campaign(key, 't.csv', [], [], '/tmp') for key in ('ok', 'ko')]
+        with mock.patch.object(batch, 'ProcessPoolExecutor', BrokenPool):
+            results = {r.key: r for r in batch.run_batch(campaigns, jobs=2)}
+        self.assertTrue(results['ok'].ok)
+        self.assertFalse(results['ko'].ok)
+        self.assertIn('BrokenProcessPool', results['ko'].error)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SimulationLifecycleTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('user@example.com', 'pass')
+
+    def test_enqueue_submits_after_commit(self):
+        from unittest import mock
+        from biolib.jobs import enqueue_simulation, run_simulation
+        from biolib.progress import read_progress
+
+        with mock.patch('biolib.jobs.get_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_simulation(42)
+                executor.assert_not_called()
+        executor.return_value.submit.assert_called_once_with(run_simulation, 42)
+        self.assertEqual(read_progress(42)['stage'], 'queued')
+
+    def test_failure_is_recorded(self):
+        from unittest import mock
+        from biolib.jobs import run_simulation
+        from biolib.progress import read_progress
+
+        simulation = self.demo_simulation(self.user)
+        with mock.patch('my_insillyclo.simulator.compute_all', side_effect=ValueError('pièce manquante')):
+            run_simulation(simulation.pk)
+        simulation.refresh_from_db()
+        self.assertEqual((simulation.status, simulation.error_message), (Simulation.STATUS_FAILED, 'pièce manquante'))
+        self.assertIsNotNone(simulation.claimed_at)
+        self.assertEqual(read_progress(simulation.pk)['stage'], 'failed')
+
+    def test_claimed_simulation_is_not_run_twice(self):
+        from unittest import mock
+        from biolib.jobs import run_simulation
+
+        simulation = self.demo_simulation(self.user, status=Simulation.STATUS_RUNNING)
+        with mock.patch('biolib.jobs._execute') as execute:
+            run_simulation(simulation.pk)
+        execute.assert_not_called()
+
+    def test_stale_running_simulations_are_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from biolib.jobs import reset_stale_simulations
+
+        now = timezone.now()
+        stale = self.demo_simulation(self.user, status=Simulation.STATUS_RUNNING, claimed_at=now - timedelta(hours=2))
+        legacy = self.demo_simulation(self.user, status=Simulation.STATUS_RUNNING)
+        fresh = self.demo_simulation(self.user, status=Simulation.STATUS_RUNNING, claimed_at=now)
+        done = self.demo_simulation(self.user, status=Simulation.STATUS_COMPLETED, claimed_at=now - timedelta(hours=2))
+
+        self.assertEqual(sorted(reset_stale_simulations(timeout=3600)), sorted([stale.pk, legacy.pk]))
+        statuses = dict(Simulation.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.pk], Simulation.STATUS_PENDING)
+        self.assertEqual(statuses[legacy.pk], Simulation.STATUS_PENDING)
+        self.assertEqual(statuses[fresh.pk], Simulation.STATUS_RUNNING)
+        self.assertEqual(statuses[done.pk], Simulation.STATUS_COMPLETED)
+
+    def test_progress_refreshes_the_heartbeat(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from biolib.jobs import Heartbeat, reset_stale_simulations
+        from biolib.observers import ProgressObserver
+        from biolib.progress import ProgressRecorder
+
+        old = timezone.now() - timedelta(hours=2)
+        simulation = self.demo_simulation(self.user, status=Simulation.STATUS_RUNNING, claimed_at=old)
+        heartbeat = Heartbeat([simulation.pk])
+        observer = ProgressObserver(ProgressRecorder(simulation.pk), heartbeat)
+        # Signes de vie espacés d'au moins SIMULATION_HEARTBEAT_INTERVAL
+        observer.notify_stage('patch', 1, 10)
+        simulation.refresh_from_db()
+        self.assertEqual(simulation.claimed_at, old)
+        with override_settings(SIMULATION_HEARTBEAT_INTERVAL=0):
+            observer = ProgressObserver(ProgressRecorder(simulation.pk), Heartbeat([simulation.pk]))
+            observer.notify_stage('patch', 2, 10)
+        simulation.refresh_from_db()
+        self.assertGreater(simulation.claimed_at, old)
+        self.assertEqual(reset_stale_simulations(timeout=3600), [])
+
+    def test_executor_start_requeues_abandoned_simulations(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from biolib import jobs
+
+        stale = self.demo_simulation(
+            self.user, status=Simulation.STATUS_RUNNING, claimed_at=timezone.now() - timedelta(hours=2),
+        )
+        with mock.patch.object(jobs, '_executor', None), mock.patch.object(jobs, 'ThreadPoolExecutor') as pool:
+            executor = jobs.get_executor()
+            self.assertIs(jobs.get_executor(), executor)
+            executor.submit.assert_called_once_with(jobs.requeue_stale_simulations)
+            self.assertEqual(jobs.requeue_stale_simulations(), [stale.pk])
+        executor.submit.assert_called_with(jobs.run_simulation, stale.pk)
+        self.assertEqual(pool.call_count, 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Simulation.STATUS_PENDING)
+
+    def test_process_simulations_runs_requeued_simulations(self):
+        from datetime import timedelta
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        stale = self.demo_simulation(
+            self.user, status=Simulation.STATUS_RUNNING, claimed_at=timezone.now() - timedelta(hours=2)
+        )
+        out = StringIO()
+        with mock.patch('biolib.management.commands.process_simulations.run_simulation') as run:
+            call_command('process_simulations', stdout=out)
+        run.assert_called_once_with(stale.pk)
+        self.assertIn('remise en file', out.getvalue())
+
+
+class RunSimulationBatchCommandTests(MediaRootMixin, TestCase):
+
+    def call(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('run_simulation_batch', *args, stdout=out)
+        return out.getvalue()
+
+    def test_directory_dry_run_lists_campaigns(self):
+        from django.conf import settings
+        User.objects.create_superuser('admin@example.com', 'pass')
+        out = self.call('--dir', os.path.join(settings.BASE_DIR, 'data_web'), '--dry-run')
+        self.assertIn('Campaign_Venus.xlsx (iP_mapping_Simple.csv)', out)
+        self.assertIn('Campaign_display_L1.xlsx (iP_mapping_typed.csv)', out)
+        self.assertFalse(Simulation.objects.exists())
+
+    def test_pairs_and_directory_run_as_one_batch(self):
+        from unittest import mock
+        from django.conf import settings
+        User.objects.create_user('user@example.com', 'pass')
+        folder = os.path.join(settings.BASE_DIR, 'data_web', 'Simple_assembly')
+        pair = (os.path.join(folder, 'Campaign_Venus.xlsx'), os.path.join(folder, 'iP_mapping_Simple.csv'))
+        with mock.patch('biolib.management.commands.run_simulation_batch.run_simulation_batch', return_value=[]) as run:
+            self.call('--pair', *pair, '--dir', folder, '--user', 'user@example.com')
+        simulation_ids, = run.call_args.args
+        self.assertEqual(sorted(simulation_ids), sorted(Simulation.objects.values_list('id', flat=True)))
+        self.assertEqual(len(simulation_ids), 2)
+
+    def test_campaigns_are_required(self):
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            self.call()
+
+    def test_csv_templates_are_found_by_default(self):
+        import shutil
+        User.objects.create_superuser('admin@example.com', 'pass')
+        template, mapping = self.write_campaign([('pOut', ['A', 'B'])], [('pA', 'A'), ('pB', 'B')])
+        shutil.move(mapping, template.with_name('iP_mapping_test.csv'))
+        self.write_source('DB_primer.csv', b'primerId;sequence\nP1;acgt\n')
+        out = self.call('--dir', str(template.parent), '--dry-run')
+        self.assertIn('template.csv (iP_mapping_test.csv)', out)
+        self.assertNotIn('DB_primer.csv', out)
+
+    def test_simulate_batch_alias(self):
+        from io import StringIO
+        from django.conf import settings
+        from django.core.management import call_command
+        User.objects.create_superuser('admin@example.com', 'pass')
+        out = StringIO()
+        call_command('simulate_batch', '--dir', os.path.join(settings.BASE_DIR, 'data_web'), '--dry-run', stdout=out)
+        self.assertIn('Campaign_Venus.xlsx (iP_mapping_Simple.csv)', out.getvalue())
+
+
+# =============================================================================
+# SITES DE RESTRICTION
+# =============================================================================
+
+class RestrictionScanTests(SimpleTestCase):
+
+    def test_sites_on_both_strands(self):
+        from my_insillyclo.restriction_scan import scan_oriented_sites
+        sequence = 'AAAA' + 'GGTCTC' + 'AAAAAAAA' + 'GAGACC' + 'AAAA'
+        sites = scan_oriented_sites([('p', sequence, False)], ['BsaI'])
+        self.assertEqual(sites['p']['BsaI'], [(4, '+'), (18, '-')])
+
+    def test_circular_sequences_wrap_around(self):
+        from my_insillyclo.restriction_scan import scan_sequences
+        sequence = 'TCTC' + 'A' * 20 + 'GG'
+        self.assertEqual(scan_sequences([('c', sequence, True)], ['BsaI'])['c']['BsaI'], [24])
+        self.assertEqual(scan_sequences([('l', sequence, False)], ['BsaI'])['l']['BsaI'], [])
+
+
+class CollectionRestrictionSitesTests(TestCase):
+
+    def setUp(self):
+        from biolib.models import Plasmid, PlasmidCollection
+        from my_insillyclo.sequence import sequence_checksum
+
+        self.user = User.objects.create_user('user@example.com', 'pass')
+        self.collection = PlasmidCollection.objects.create(name='c', owner=self.user)
+        sequence = 'GGTCTC' + 'A' * 10 + 'GGTCTC' + 'C' * 10 + 'GAGACC'
+        self.plasmid = Plasmid.objects.create(
+            collection=self.collection, identifier='pInt', sequence=sequence,
+            checksum=sequence_checksum(sequence), topology='linear',
+        )
+        self.client.force_login(self.user)
+
+    def test_page_queues_missing_scans_instead_of_scanning(self):
+        from unittest import mock
+        from biolib.jobs import scan_plasmids
+
+        with mock.patch('biolib.restriction.scan_sequences', side_effect=AssertionError), \
+                mock.patch('biolib.jobs.get_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('collection_detail', args=[self.collection.id]))
+        self.assertContains(response, 'Analyse en cours')
+        executor.return_value.submit.assert_called_once_with(scan_plasmids, {self.plasmid.id})
+
+        scan_plasmids({self.plasmid.id})
+        with mock.patch('biolib.jobs.get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('collection_detail', args=[self.collection.id]))
+        executor.assert_not_called()
+        self.assertNotContains(response, 'Analyse en cours')
+        self.assertContains(response, '3 × BsaI')
+
+
+# =============================================================================
+# RECHERCHE DE SÉQUENCES
+# =============================================================================
+
+def random_dna(length, seed):
+    import random
+    rng = random.Random(seed)
+    return ''.join(rng.choice('ACGT') for _ in range(length))
+
+
+class KmerIndexTests(SimpleTestCase):
+
+    def test_both_strands_and_origin(self):
+        from my_insillyclo.kmer_index import KmerIndex, find_occurrences, reverse_complement
+
+        motif = random_dna(20, 1)
+        linear = random_dna(100, 2) + reverse_complement(motif) + random_dna(100, 3)
+        # Motif à cheval sur l'origine d'un plasmide circulaire
+        circular = motif[10:] + random_dna(200, 4) + motif[:10]
+        index = KmerIndex()
+        index.bulk_add([(1, linear, False), (2, circular, True), (3, random_dna(300, 5), False)])
+        self.assertEqual(index.candidates(motif), {1, 2})
+        self.assertEqual(find_occurrences(linear, motif), [(100, '-')])
+        self.assertEqual(find_occurrences(circular, motif, circular=True), [(len(circular) - 10, '+')])
+        self.assertEqual(find_occurrences(circular, motif), [])
+
+    def test_incremental_updates(self):
+        from unittest import mock
+        from my_insillyclo import kmer_index
+
+        motif = random_dna(16, 6)
+        index = kmer_index.KmerIndex()
+        index.bulk_add([(1, motif, False)])
+        index.add(2, random_dna(50, 7) + motif, False)
+        self.assertEqual(index.candidates(motif), {1, 2})
+        # Séquence remplacée, puis plasmide supprimé
+        index.add(1, random_dna(50, 8), False)
+        index.remove(2)
+        self.assertEqual(index.candidates(motif), set())
+        with mock.patch.object(kmer_index, 'MAX_DELTA', 2):
+            for i in range(3, 6):
+                index.add(i, motif, False)
+        self.assertEqual(index.candidates(motif), {3, 4, 5})
+        self.assertEqual(len(index), 4)
+
+    def test_short_query_is_rejected(self):
+        from my_insillyclo.kmer_index import KmerIndex
+        with self.assertRaises(ValueError):
+            KmerIndex().candidates('ACGT')
+
+
+class PlasmidSearchTests(TestCase):
+
+    def setUp(self):
+        from unittest import mock
+        from biolib import search
+        from biolib.models import Plasmid, PlasmidCollection
+
+        for patcher in (mock.patch.object(search, '_index', None), mock.patch.object(search, '_index_state', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('user@example.com', 'pass', username='user')
+        other = User.objects.create_user('other@example.com', 'pass', username='other')
+        self.motif = random_dna(20, 10)
+        self.mine = PlasmidCollection.objects.create(name='mine', owner=self.user)
+        private = PlasmidCollection.objects.create(name='private', owner=other)
+        Plasmid.objects.create(collection=self.mine, identifier='pMine', sequence=random_dna(40, 11) + self.motif)
+        Plasmid.objects.create(collection=self.mine, identifier='pNone', sequence=random_dna(200, 12))
+        Plasmid.objects.create(collection=private, identifier='pPrivate', sequence=self.motif)
+        self.client.force_login(self.user)
+
+    def search(self, query):
+        return self.client.get(reverse('plasmid_search_api'), {'q': query})
+
+    def test_only_visible_plasmids_are_returned(self):
+        data = self.search(self.motif.lower()).json()
+        self.assertEqual(
+            [(r['identifier'], r['hits']) for r in data['results']],
+            [('pMine', [{'position': 40, 'strand': '+'}])],
+        )
+        self.assertEqual(self.search('ACGTX').status_code, 400)
+
+    def test_index_follows_saves_and_deletes(self):
+        from biolib.models import Plasmid
+
+        self.search(self.motif)
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Plasmid.objects.create(collection=self.mine, identifier='pNew', sequence=self.motif)
+        self.assertEqual([r['identifier'] for r in self.search(self.motif).json()['results']], ['pMine', 'pNew'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Plasmid.objects.get(identifier='pMine').delete()
+        self.assertEqual([r['identifier'] for r in self.search(self.motif).json()['results']], [added.identifier])
+
+    def test_sequence_replaced_elsewhere_is_reindexed(self):
+        import hashlib
+        from biolib.models import Plasmid
+
+        self.search(self.motif)
+        # Modification faite par un autre processus : aucun signal, même nombre de plasmides
+        sequence = random_dna(30, 13) + self.motif
+        Plasmid.objects.filter(identifier='pNone').update(
+            sequence=sequence, checksum=hashlib.sha256(sequence.encode()).hexdigest(),
+        )
+        Plasmid.objects.filter(identifier='pMine').update(sequence=random_dna(60, 14), checksum='autre')
+        self.assertEqual(
+            [(r['identifier'], r['hits']) for r in self.search(self.motif).json()['results']],
+            [('pNone', [{'position': 30, 'strand': '+'}])],
+        )
+
+
+# =============================================================================
+# STATISTIQUES DES ÉQUIPES
+# =============================================================================
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TeamStatsTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.leader = User.objects.create_user('leader@example.com', 'pass', username='leader')
+
+    def make_team(self, name, members=0, collections=0, plasmids_per_collection=0, simulations=0):
+        from biolib.models import Plasmid, PlasmidCollection, Team
+
+        team = Team.objects.create(name=name, leader=self.leader)
+        team.members.add(self.leader, *[
+            User.objects.create_user(f'{name}{i}@example.com', 'pass', username=f'{name}{i}') for i in range(members)
+        ])
+        for c in range(collections):
+            collection = PlasmidCollection.objects.create(name=f'{name}-{c}', team=team)
+            for p in range(plasmids_per_collection):
+                Plasmid.objects.create(collection=collection, identifier=f'{name}-{c}-{p}')
+        for _ in range(simulations):
+            Simulation.objects.create(user=self.leader, team=team)
+        return team
+
+    def test_counters_in_one_query_then_cached(self):
+        from biolib.stats import team_stats
+
+        big = self.make_team('big', members=2, collections=2, plasmids_per_collection=3, simulations=2)
+        empty = self.make_team('empty')
+        with self.assertNumQueries(1):
+            stats = team_stats([big.id, empty.id])
+        self.assertEqual(stats[big.id], {
+            'members_count': 3, 'templates_count': 0, 'tables_count': 0,
+            'campaigns_count': 2, 'plasmids_count': 6, 'collections_count': 2,
+        })
+        self.assertEqual(stats[empty.id], {**dict.fromkeys(stats[big.id], 0), 'members_count': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(team_stats([empty.id, big.id]), stats)
+
+    def test_changes_invalidate_the_cache(self):
+        from biolib.models import Plasmid, PlasmidCollection
+        from biolib.stats import team_stats
+
+        team = self.make_team('t', collections=1, simulations=1)
+        team_stats([team.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            Plasmid.objects.create(collection=PlasmidCollection.objects.get(team=team), identifier='pNew')
+        self.assertEqual(team_stats([team.id])[team.id]['plasmids_count'], 1)
+
+        # Changement de statut d'une simulation : pas d'effet sur les compteurs
+        simulation = Simulation.objects.get(team=team)
+        simulation.status = Simulation.STATUS_COMPLETED
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            simulation.save(update_fields=['status'])
+        self.assertEqual(callbacks, [])
+
+    def test_team_list_query_count_does_not_grow(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.leader)
+        self.make_team('a', collections=1, plasmids_per_collection=1)
+        with CaptureQueriesContext(connection) as one_team:
+            self.client.get(reverse('teams'))
+        for name in 'bcde':
+            self.make_team(name, members=1, collections=1, plasmids_per_collection=2, simulations=1)
+        with CaptureQueriesContext(connection) as five_teams:
+            response = self.client.get(reverse('teams'))
+        self.assertEqual(len(five_teams), len(one_team))
+        self.assertEqual(len(response.context['teams']), 5)
+
+
+# =============================================================================
+# TÉLÉCHARGEMENTS
+# =============================================================================
+
+class DownloadTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from django.test import RequestFactory
+        self.factory = RequestFactory()
+        self.folder = os.path.join(self.media_root, 'simulations', 'run')
+        os.makedirs(os.path.join(self.folder, 'gels'))
+        self.files = {
+            'pOut.gb': b'LOCUS pOut\n' * 500,
+            'gels/digestion.png': os.urandom(3000),
+            'dilutions_calculated.csv': b'0123456789',
+        }
+        for name, data in self.files.items():
+            with open(os.path.join(self.folder, name), 'wb') as f:
+                f.write(data)
+
+    def test_parse_range(self):
+        from biolib.downloads import parse_range
+
+        self.assertEqual(parse_range('bytes=2-5', 10), (2, 5))
+        self.assertEqual(parse_range('bytes=7-', 10), (7, 9))
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        self.assertEqual(parse_range('bytes=4-100', 10), (4, 9))
+        self.assertIsNone(parse_range(None, 10))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        for header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            with self.assertRaises(ValueError, msg=header):
+                parse_range(header, 10)
+
+    def test_ranged_file_response(self):
+        from biolib.downloads import ranged_file_response
+
+        path = os.path.join(self.folder, 'dilutions_calculated.csv')
+        full = ranged_file_response(self.factory.get('/'), path, 'd.csv', 'text/csv')
+        self.assertEqual((full.status_code, b''.join(full.streaming_content)), (200, b'0123456789'))
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+
+        partial = ranged_file_response(self.factory.get('/', HTTP_RANGE='bytes=3-5'), path, 'd.csv', 'text/csv')
+        self.assertEqual((partial.status_code, b''.join(partial.streaming_content)), (206, b'345'))
+        self.assertEqual(partial['Content-Range'], 'bytes 3-5/10')
+        self.assertIn('attachment', partial['Content-Disposition'])
+
+        refused = ranged_file_response(self.factory.get('/', HTTP_RANGE='bytes=20-'), path, 'd.csv')
+        self.assertEqual((refused.status_code, refused['Content-Range']), (416, 'bytes */10'))
+
+    def read_zip(self, data):
+        import io
+        import zipfile
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return {info.filename: (archive.read(info), info.compress_type) for info in archive.infolist()}
+
+    def test_zip_is_streamed_then_served_from_cache(self):
+        import zipfile
+        from django.http import FileResponse, StreamingHttpResponse
+        from biolib.downloads import archive_path, folder_zip_response
+
+        first = folder_zip_response(self.factory.get('/'), self.folder, 'run.zip')
+        self.assertIsInstance(first, StreamingHttpResponse)
+        content = self.read_zip(b''.join(first.streaming_content))
+        self.assertEqual({name: data for name, (data, _) in content.items()}, self.files)
+        self.assertEqual(content['gels/digestion.png'][1], zipfile.ZIP_STORED)
+        self.assertEqual(content['pOut.gb'][1], zipfile.ZIP_DEFLATED)
+
+        cached = folder_zip_response(self.factory.get('/'), self.folder, 'run.zip')
+        self.assertIsInstance(cached, FileResponse)
+        self.assertEqual(self.read_zip(b''.join(cached.streaming_content)).keys(), content.keys())
+
+        # Dossier modifié après la construction : l'archive est refaite
+        built = os.path.getmtime(archive_path(self.folder))
+        with open(os.path.join(self.folder, 'pOut.gb'), 'ab') as f:
+            f.write(b'//\n')
+        os.utime(os.path.join(self.folder, 'pOut.gb'), (built + 10, built + 10))
+        self.assertIsInstance(folder_zip_response(self.factory.get('/'), self.folder, 'run.zip'), StreamingHttpResponse)
+
+    def test_interrupted_stream_leaves_no_archive(self):
+        from biolib.downloads import iter_zip
+
+        stream = iter_zip(self.folder)
+        next(stream)
+        stream.close()
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.folder))), ['run'])
+
+    def test_simulation_views(self):
+        user = User.objects.create_user('user@example.com', 'pass', username='user')
+        simulation = self.demo_simulation(user)
+        shutil.rmtree(simulation.get_output_folder(), ignore_errors=True)
+        zip_url = reverse('download_simulation_zip', args=[simulation.pk])
+        csv_url = reverse('download_simulation_csv', args=[simulation.pk])
+        self.assertEqual(self.client.get(zip_url).status_code, 404)
+        self.assertEqual(self.client.get(csv_url).status_code, 404)
+
+        shutil.copytree(self.folder, simulation.get_output_folder())
+        response = self.client.get(csv_url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (206, b'0123'))
+        response = self.client.get(zip_url)
+        self.assertEqual(self.read_zip(b''.join(response.streaming_content))['pOut.gb'][0], self.files['pOut.gb'])
+
+
+# =============================================================================
+# AVANCEMENT DES SIMULATIONS
+# =============================================================================
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProgressTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        from biolib.progress import progress_cache
+        super().setUp()
+        progress_cache().clear()
+
+    def test_recorder_throttles_and_always_writes_stage_changes(self):
+        from biolib.progress import ProgressRecorder, read_progress
+
+        recorder = ProgressRecorder(7)
+        recorder.stage('patch', 0, 10)
+        seq = read_progress(7)['seq']
+        recorder.stage('patch', 5, 10)
+        self.assertEqual(read_progress(7)['seq'], seq)
+        recorder.stage('assembly')
+        state = read_progress(7)
+        self.assertEqual((state['seq'], state['stage'], state['percent']), (seq + 1, 'assembly', 60))
+        # Un nouvel enregistreur reprend la numérotation
+        ProgressRecorder(7).finish('failed', 'boom')
+        self.assertEqual(read_progress(7)['seq'], seq + 2)
+
+    def test_finished_simulation_without_published_state(self):
+        from biolib.progress import current_progress, publish_stage
+
+        self.assertEqual(current_progress(10, 'COMPLETED')['stage'], 'completed')
+        self.assertIsNone(current_progress(10, 'PENDING'))
+        publish_stage(10, 'queued')
+        self.assertEqual(current_progress(10, 'PENDING')['stage'], 'queued')
+
+    def test_progress_has_its_own_cache(self):
+        from django.core.cache import caches
+        from biolib.progress import progress_key, publish_stage, read_progress
+
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+            'progress': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'progress'},
+        }):
+            publish_stage(11, 'queued')
+            self.assertEqual(read_progress(11)['stage'], 'queued')
+            self.assertIsNotNone(caches['progress'].get(progress_key(11)))
+            self.assertIsNone(caches['default'].get(progress_key(11)))
+
+    def test_progress_view_answers_at_once(self):
+        import time
+        from biolib.progress import publish_stage
+
+        user = User.objects.create_user('user@example.com', 'pass', username='user')
+        simulation = self.demo_simulation(user)
+        self.client.force_login(user)
+        url = reverse('simulation_progress', args=[simulation.pk])
+        start = time.monotonic()
+        data = self.client.get(url).json()
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual((data['status'], data['progress'], data['retry']), ('PENDING', None, 2000))
+        publish_stage(simulation.pk, 'resolve')
+        self.assertEqual(self.client.get(url).json()['progress']['stage'], 'resolve')
+
+        other = User.objects.create_user('other@example.com', 'pass', username='other')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+# =============================================================================
+# DÉMARRAGE (IMPORTS PARESSEUX)
+# =============================================================================
+
+class StartupImportTests(SimpleTestCase):
+
+    def test_server_start_loads_no_heavy_dependency(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+        from biolib.management.commands.bench_startup import HEAVY_MODULES
+
+        code = (
+            "import sys\n"
+            "from my_insillyclo.wsgi import application\n"
+            "from django.urls import get_resolver\n"
+            "get_resolver().url_patterns\n"
+            f"print(sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r})))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_import_times_parser(self):
+        from biolib.management.commands.bench_startup import Command
+
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   numpy._core\n"
+            "import time:      1500 |      90000 | numpy\n"
+            "import time:      3000 |       3000 | biolib.models\n"
+        )
+        imports, heavy = Command().import_times(stderr)
+        self.assertEqual(imports, [('biolib.models', 0.003), ('numpy', 0.0015), ('numpy._core', 0.00012)])
+        self.assertEqual(heavy, ['numpy'])
+
+    def test_lazy_numpy_encoding(self):
+        from my_insillyclo.kmer_index import encode_sequence
+        from my_insillyclo.sequence import pack_2bit, unpack_2bit
+
+        self.assertEqual(unpack_2bit(pack_2bit('ACGTNNRACG')), 'ACGTNNRACG')
+        self.assertEqual(encode_sequence('ACGTn').tolist(), [0, 1, 2, 3, 4])
@@ -0,0 +1,210 @@
+"""
+Import en masse de fichiers de plasmides envoyés par le navigateur.
+
+Les fichiers (ou les membres d'une archive ZIP / tar) sont recopiés par blocs
+dans un dossier temporaire en calculant leur empreinte au passage, puis
+rangés dans le stockage adressé par contenu et insérés en une transaction
+(bulk_create, séquence vide). Le parsing et l'indexation des séquences sont
+faits ensuite en arrière-plan (biolib/jobs.py) : la requête ne fait que des
+copies de fichiers.
+
+Le simulateur ne lit que des GenBank : les fichiers FASTA et SnapGene sont
+rangés tels quels, avec l'identifiant `<nom>.gb`, puis convertis par le job
+de parsing (convert_stored_file). Les doublons sont écartés à deux niveaux :
+à l'import (même nom dans l'envoi, ou même fichier déjà dans la collection),
+puis au parsing (même séquence qu'un plasmide de la collection, voir
+Plasmid.checksum).
+"""
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from my_insillyclo.sequence import SEQUENCE_FORMATS, read_record, sequence_format
+
+from .models import Plasmid
+from .stats import invalidate_team_stats
+from .storage import content_addressed_storage, digest_from_name
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+ACCEPTED_EXTENSIONS = tuple(SEQUENCE_FORMATS) + ARCHIVE_EXTENSIONS
+BLOCK_SIZE = 1024 * 1024
+# Garde-fou contre les archives qui se décompressent en fichiers énormes
+MAX_EXTRACTED_BYTES = getattr(settings, 'UPLOAD_MAX_EXTRACTED_BYTES', 2 * 1024 ** 3)
+
+
+class UploadError(ValueError):
+    pass
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_sequence_file(filename):
+    name = os.path.basename(filename)
+    # Métadonnées ajoutées par macOS et fichiers cachés
+    if not name or name.startswith(('.', '._')) or '__MACOSX' in filename:
+        return False
+    return os.path.splitext(name)[1].lower() in SEQUENCE_FORMATS
+
+
+def _archive_members(uploaded):
+    """ (nom, flux binaire) des fichiers de séquence d'une archive, lus un par un. """
+    uploaded.seek(0)
+    if uploaded.name.lower().endswith('.zip'):
+        try:
+            archive = zipfile.ZipFile(uploaded)
+        except zipfile.BadZipFile as e:
+            raise UploadError(f"Archive illisible : {uploaded.name} ({e})")
+        with archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_sequence_file(info.filename):
+                    with archive.open(info) as member:
+                        yield os.path.basename(info.filename), member
+    else:
+        try:
+            archive = tarfile.open(fileobj=uploaded, mode='r:*')
+        except tarfile.TarError as e:
+            raise UploadError(f"Archive illisible : {uploaded.name} ({e})")
+        with archive:
+            for info in archive:
+                if info.isfile() and is_sequence_file(info.name):
+                    member = archive.extractfile(info)
+                    if member is not None:
+                        yield os.path.basename(info.name), member
+
+
+def _upload_members(uploaded):
+    if is_archive(uploaded.name):
+        yield from _archive_members(uploaded)
+    elif is_sequence_file(uploaded.name):
+        uploaded.seek(0)
+        yield os.path.basename(uploaded.name), uploaded
+    else:
+        raise UploadError(f"Format non accepté : {uploaded.name}")
+
+
+def stored_filename(filename):
+    """ Nom du fichier une fois importé : les formats autres que GenBank deviennent `.gb`. """
+    if sequence_format(filename) == 'genbank':
+        return filename
+    return os.path.splitext(filename)[0] + '.gb'
+
+
+def convert_to_genbank(path, filename, directory):
+    """
+    Réécrit en GenBank, dans `directory`, le fichier FASTA / SnapGene `path`
+    (nommé `filename` à l'import) et renvoie le chemin du fichier converti.
+    """
+    from Bio import SeqIO
+
+    try:
+        record = read_record(path, filename)
+    except Exception as e:
+        raise UploadError(f"Conversion en GenBank impossible : {filename} ({str(e) or type(e).__name__})")
+    # Le FASTA ne porte ni type de molécule ni topologie, exigés par l'écriture GenBank
+    record.annotations.setdefault('molecule_type', 'DNA')
+    record.name = os.path.splitext(filename)[0][:16]
+    converted = os.path.join(directory, stored_filename(filename))
+    with open(converted, 'w') as out:
+        SeqIO.write(record, out, 'genbank')
+    return converted
+
+
+def convert_stored_file(plasmid):
+    """
+    Nom, dans le stockage, du GenBank converti à partir du fichier FASTA /
+    SnapGene du plasmide (appelé par le job de parsing). Le champ n'est pas
+    modifié : l'appelant l'enregistre puis libère l'ancien fichier.
+    """
+    filename = os.path.basename(plasmid.genbank_file.name)
+    directory = tempfile.mkdtemp(prefix='biolib-convert-')
+    try:
+        converted = convert_to_genbank(plasmid.genbank_file.path, filename, directory)
+        with open(converted, 'rb') as f:
+            return content_addressed_storage.save(
+                os.path.join(Plasmid.genbank_file.field.upload_to, os.path.basename(converted)), File(f),
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest(), os.path.getsize(path)
+
+
+def spool_uploads(files, directory):
+    """
+    Recopie par blocs les fichiers de séquence envoyés (archives développées)
+    dans `directory`, sans les convertir. Renvoie les (nom, chemin, sha256,
+    taille) et la liste des noms ignorés car déjà présents dans l'envoi (un
+    même nom n'est gardé qu'une fois, pA.fasta et pA.gb compris).
+    """
+    spooled, seen, duplicates, total = [], set(), [], 0
+    for uploaded in files:
+        for filename, stream in _upload_members(uploaded):
+            name = stored_filename(filename)
+            if name in seen:
+                duplicates.append(filename)
+                continue
+            seen.add(name)
+            path = os.path.join(directory, f"{len(spooled)}_{filename}")
+            h, size = hashlib.sha256(), 0
+            with open(path, 'wb') as out:
+                for block in iter(lambda: stream.read(BLOCK_SIZE), b''):
+                    size += len(block)
+                    total += len(block)
+                    if total > MAX_EXTRACTED_BYTES:
+                        raise UploadError("Import trop volumineux une fois décompressé.")
+                    h.update(block)
+                    out.write(block)
+            spooled.append((filename, path, h.hexdigest(), size))
+    return spooled, duplicates
+
+
+def collection_digests(collection):
+    """ Empreintes des fichiers déjà importés dans la collection (une requête). """
+    names = Plasmid.objects.filter(collection=collection).values_list('genbank_file', flat=True)
+    return {digest_from_name(name) for name in names} - {None}
+
+
+def import_uploads(collection, files):
+    """
+    Range les fichiers envoyés dans le stockage et crée leurs plasmides (séquence
+    à parser) en une transaction. Renvoie les ids des plasmides créés et les
+    noms de fichiers ignorés : en double dans l'envoi, ou fichier identique
+    déjà présent dans la collection.
+    """
+    directory = tempfile.mkdtemp(prefix='biolib-upload-')
+    try:
+        spooled, duplicates = spool_uploads(files, directory)
+        known = collection_digests(collection)
+        duplicates += [filename for filename, _, digest, _ in spooled if digest in known]
+        spooled = [item for item in spooled if item[2] not in known]
+        if not spooled:
+            return [], duplicates
+        with transaction.atomic():
+            names = content_addressed_storage.save_many(Plasmid.genbank_file.field.upload_to, spooled)
+            plasmids = Plasmid.objects.bulk_create([
+                Plasmid(
+                    collection=collection, identifier=stored_filename(filename), name="",
+                    genbank_file=name, sequence="",
+                )
+                for (filename, _, _, _), name in zip(spooled, names)
+            ], batch_size=500)
+            # bulk_create n'envoie pas de signaux : compteurs des équipes à recalculer
+            transaction.on_commit(invalidate_team_stats)
+        return [p.id for p in plasmids], duplicates
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
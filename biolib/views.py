@@ -4,29 +4,22 @@ from datetime import datetime
 from .forms import CustomUserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse, HttpResponse, Http404
-from django.conf import settings
-from django.core.files.storage import FileSystemStorage
+from django.http import Http404, JsonResponse
 from django.db.models import Q 
-from .forms import SimulationForm
+from .forms import SimulationBatchForm, SimulationForm
 from .models import Simulation
+from .downloads import folder_zip_response, ranged_file_response
+from .progress import POLL_INTERVAL, current_progress, read_progress
+from .jobs import enqueue_batch, enqueue_plasmid_parsing, enqueue_restriction_scans, enqueue_simulation
+from .restriction import FLANKING_SITES, pending_scans, stored_site_counts
+from .search import search_plasmids, visible_plasmids
+from .stats import attach_team_stats, team_stats
+from .uploads import UploadError, import_uploads
 from types import SimpleNamespace
-import traceback
-import glob
 import os
-import pathlib
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from .forms import CampaignTemplateForm, TemplatePartFormSet
 from .models import CampaignTemplate, Plasmid, Team, User, Correspondence, PlasmidCollection
 
-import insillyclo.data_source
-try:
-    import insillyclo.observer
-    BaseObserver = insillyclo.observer.InSillyCloObserver
-except ImportError:
-    class BaseObserver: pass
-import insillyclo.simulator
 
 
 def home(request):
@@ -226,12 +219,13 @@ def signup(request):
 
 @login_required
 def dashboard(request):
-    teams_count = Team.objects.filter(
+    teams = attach_team_stats(Team.objects.filter(
         Q(leader=request.user) | Q(members=request.user)
-    ).distinct().count()
+    ).distinct())
 
     return render(request, 'biolib/dashboard.html', {
-        'teams_count': teams_count
+        'teams_count': len(teams),
+        'campaigns_count': sum(team.campaigns_count for team in teams),
     })
 
 ########################################################
@@ -270,9 +264,24 @@ def collection_detail(request, collection_id):
     collection = get_object_or_404(PlasmidCollection, id=collection_id)
     is_owner = collection.owner == request.user
 
+    # Sites internes des enzymes Golden Gate : lecture des résultats déjà calculés,
+    # les analyses manquantes partent dans la file d'attente
+    plasmids = list(collection.plasmids.all())
+    counts = stored_site_counts(collection.plasmids.all())
+    pending = pending_scans(collection.plasmids.all())
+    enqueue_restriction_scans(pending)
+    for plasmid in plasmids:
+        plasmid.scan_pending = plasmid.id in pending
+        plasmid.internal_sites = [
+            (enzyme, count) for enzyme, count in sorted(counts.get(plasmid.id, {}).items())
+            if count > FLANKING_SITES
+        ]
+
     return render(request, "biolib/collection_detail.html", {
         "collection": collection,
-        "is_owner": is_owner
+        "plasmids": plasmids,
+        "is_owner": is_owner,
+        "scans_pending": len(pending),
     })
 
 @login_required
@@ -286,15 +295,24 @@ def plasmid_upload(request, collection_id):
     if request.method == "POST":
         files = request.FILES.getlist("files")
 
-        for f in files:
-            Plasmid.objects.create(
-                collection=collection,
-                identifier=f.name,
-                name="",
-                genbank_file=f,
-                sequence=""
-            )
-
+        # Fichiers (ou archives) rangés et insérés en une transaction ; le parsing
+        # des séquences est fait en arrière-plan (voir biolib/uploads.py)
+        try:
+            plasmid_ids, duplicates = import_uploads(collection, files)
+        except UploadError as e:
+            return render(request, "biolib/plasmid_upload.html", {
+                "collection": collection,
+                "error": str(e),
+            })
+        enqueue_plasmid_parsing(plasmid_ids)
+
+        if duplicates:
+            # Import fait, mais on signale les fichiers ignorés plutôt que de rediriger
+            return render(request, "biolib/plasmid_upload.html", {
+                "collection": collection,
+                "imported": len(plasmid_ids),
+                "duplicates": duplicates,
+            })
         return redirect("collection_detail", collection.id)
 
     return render(request, "biolib/plasmid_upload.html", {
@@ -326,57 +344,56 @@ def collection_delete(request, collection_id):
         collection.delete()
         return redirect("collections")
 
+
+@login_required
+def plasmid_search(request):
+    """ Quels plasmides contiennent ce promoteur / cette amorce ? """
+    query = request.GET.get("q", "").strip()
+    results, error = [], None
+    if query:
+        try:
+            results = search_plasmids(query, visible_plasmids(request.user))
+        except ValueError as e:
+            error = str(e)
+
+    return render(request, "biolib/plasmid_search.html", {
+        "query": query,
+        "results": results,
+        "error": error,
+    })
+
+@login_required
+def plasmid_search_api(request):
+    query = request.GET.get("q", "").strip()
+    try:
+        results = search_plasmids(query, visible_plasmids(request.user))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "query": query,
+        "results": [
+            {
+                "id": plasmid.id,
+                "identifier": plasmid.identifier,
+                "collection": plasmid.collection.name,
+                "length": plasmid.length,
+                "topology": plasmid.topology,
+                "hits": [{"position": position, "strand": strand} for position, strand in hits],
+            }
+            for plasmid, hits in results
+        ],
+    })
+
     
 
 ##################
 
 def export_template_excel(request, template_id):
-    template = get_object_or_404(CampaignTemplate, id=template_id)
-    parts = template.parts.all().order_by('order')
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Assembly Template"
-
-    blue_fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-    green_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-    bold_font = Font(bold=True)
-    center_align = Alignment(horizontal="center", vertical="center")
-
-    # Assembly Settings
-    ws['A1'] = "Assembly settings"; ws['A1'].font = bold_font; ws['A1'].fill = blue_fill
-    ws['A2'] = "Restriction enzyme"; ws['A2'].font = bold_font; ws['A2'].fill = blue_fill
-    ws['B2'] = template.enzyme; ws['B2'].fill = green_fill
-    ws['A3'] = "Name"; ws['A3'].font = bold_font; ws['A3'].fill = blue_fill
-    ws['B3'] = template.name; ws['B3'].fill = green_fill
-    ws['A4'] = "Output separator"; ws['A4'].font = bold_font; ws['A4'].fill = blue_fill
-    ws['B4'] = template.output_separator; ws['B4'].fill = green_fill
-
-    # Assembly Composition
-    base_row = 8
-    headers = [
-        "Assembly composition", "Part types ->", "Is optional part ->",
-        "Part name should be in output name ->", "Output plasmid id ↓"
-    ]
-    for i, text in enumerate(headers):
-        cell = ws.cell(row=base_row + i, column=1, value=text)
-        cell.font = bold_font; cell.fill = blue_fill
-
-    for index, part in enumerate(parts):
-        col_num = 2 + index
-        c1 = ws.cell(row=base_row, column=col_num, value=part.name); c1.fill = green_fill; c1.alignment = center_align
-        c2 = ws.cell(row=base_row + 1, column=col_num, value=part.type_id); c2.fill = green_fill; c2.alignment = center_align
-        
-        is_optional_str = "False" if part.is_mandatory else "True"
-        c3 = ws.cell(row=base_row + 2, column=col_num, value=is_optional_str); c3.fill = green_fill; c3.alignment = center_align
-        
-        in_output_str = "True" if part.include_in_output else "False"
-        c4 = ws.cell(row=base_row + 3, column=col_num, value=in_output_str); c4.fill = green_fill; c4.alignment = center_align
-        
-        c5 = ws.cell(row=base_row + 4, column=col_num, value="↓"); c5.fill = blue_fill; c5.alignment = center_align
+    from .exports import template_workbook
 
-    ws.column_dimensions['A'].width = 35
-    for col in range(2, 2 + len(parts)):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
+    template = get_object_or_404(CampaignTemplate, id=template_id)
+    wb = template_workbook(template)
 
     response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     clean_name = template.name.replace(" ", "_")
@@ -384,25 +401,6 @@ def export_template_excel(request, template_id):
     wb.save(response)
     return response
 
-try:
-    from my_insillyclo.simulator import compute_all
-except ImportError:
-    print("ATTENTION : my_insillyclo.simulator non trouvé.")
-    def compute_all(*args, **kwargs): pass
-
-class ConsoleObserver:
-    def notify_message(self, message):
-        print(f"[SIMULATION] {message}")
-    def notify_progress(self, value):
-        pass
-
-class DjangoConsoleObserver(insillyclo.observer.InSillyCloCliObserver):
-    def __init__(self):
-        super().__init__(debug=False, fail_on_error=True)
-
-    def notify_message(self, message):
-        print(f"[INSILLYCLO] {message}")
-
 @login_required
 def simulation_list(request):
     simulations = Simulation.objects.filter(user=request.user).order_by('-date_run')
@@ -415,51 +413,40 @@ def create_simulation(request):
         if form.is_valid():
             simulation = form.save(commit=False)
             simulation.user = request.user
-            simulation.status = 'RUNNING'
+            simulation.status = Simulation.STATUS_PENDING
             simulation.save()
 
-            output_folder = os.path.join(settings.MEDIA_ROOT, 'simulations', str(simulation.id))
-            path_xlsx = simulation.template_file.path
-            path_csv_list = [simulation.campaign_file.path] if simulation.campaign_file else []
-            
-            gb_plasmids_paths = []
-            all_parts = Plasmid.objects.all()
-            for p in all_parts:
-                if p.genbank_file: 
-                    file_path = p.genbank_file.path
-                    if os.path.exists(file_path):
-                        gb_plasmids_paths.append(file_path)
+            # Calcul (ou reprise d'un résultat identique, voir jobs._execute) confié à
+            # la file d'attente : la requête rend la main tout de suite.
+            enqueue_simulation(simulation.id)
+            return redirect('simulation_result', pk=simulation.id)
+    else:
+        form = SimulationForm()
+    return render(request, 'biolib/create_simulation.html', {'form': form})
 
-            try:
-                # observer = DjangoConsoleObserver()
-                compute_all(
-                    # observer=observer,
-                    settings=None,
-                    input_template_filled=path_xlsx,
-                    input_parts_files=path_csv_list,
-                    gb_plasmids=gb_plasmids_paths,
-                    output_dir=output_folder,
-                    data_source="Django",
-                    enzyme_names=simulation.enzyme,
-                    default_mass_concentration=200
+@login_required
+def create_simulation_batch(request):
+    """ Plusieurs campagnes soumises d'un coup, exécutées ensemble par un seul job. """
+    if request.method == 'POST':
+        form = SimulationBatchForm(request.POST, request.FILES)
+        if form.is_valid():
+            simulation_ids = []
+            for template_file, campaign_file in form.pairs():
+                simulation = Simulation(
+                    user=request.user,
+                    enzyme=form.cleaned_data['enzyme'],
+                    status=Simulation.STATUS_PENDING,
                 )
-                simulation.status = 'COMPLETED'
-                if os.path.exists(os.path.join(output_folder, 'digestion.svg')):
-                      simulation.result_file = f"simulations/{simulation.id}/digestion.svg"
-                elif os.path.exists(os.path.join(output_folder, 'dilutions_calculated.csv')):
-                      simulation.result_file = f"simulations/{simulation.id}/dilutions_calculated.csv"
-                simulation.save()
-                return redirect('simulation_result', pk=simulation.id)
-
-            except Exception as e:
-                print("\n!!! ERREUR INSILLYCLO !!!")
-                traceback.print_exc()
-                simulation.status = 'FAILED'
+                simulation.template_file.save(template_file.name, template_file, save=False)
+                campaign_file.seek(0)
+                simulation.campaign_file.save(campaign_file.name, campaign_file, save=False)
                 simulation.save()
-                return redirect('simulation_list')
+                simulation_ids.append(simulation.id)
+            enqueue_batch(simulation_ids)
+            return redirect('simulation_list')
     else:
-        form = SimulationForm()
-    return render(request, 'biolib/create_simulation.html', {'form': form})
+        form = SimulationBatchForm()
+    return render(request, 'biolib/create_simulation_batch.html', {'form': form})
 
 def simulation_result(request, pk=None):
     if pk is not None:
@@ -468,26 +455,46 @@ def simulation_result(request, pk=None):
         simulation = SimpleNamespace(id=0, status='COMPLETED', date_run=datetime.now(), template=SimpleNamespace(name="DÉMO", enzyme="BsaI"), user=request.user)
     return render(request, 'biolib/simulation_result.html', {'simulation': simulation})
 
+@login_required
+def simulation_status(request, pk):
+    """ Statut ponctuel de la simulation ; l'avancement vient du cache. """
+    simulation = get_object_or_404(Simulation, pk=pk, user=request.user)
+    return JsonResponse({
+        'id': simulation.id,
+        'status': simulation.status,
+        'result_file': simulation.result_file,
+        'error_message': simulation.error_message,
+        'progress': read_progress(simulation.id),
+    })
+
+@login_required
+def simulation_progress(request, pk):
+    """
+    Avancement lu dans le cache, renvoyé aussitôt. `retry` est le délai (ms)
+    que le navigateur attend avant la requête suivante.
+    """
+    status = Simulation.objects.filter(pk=pk, user=request.user).values_list('status', flat=True).first()
+    if status is None:
+        raise Http404("Simulation introuvable")
+    return JsonResponse({
+        'status': status,
+        'progress': current_progress(pk, status),
+        'retry': int(POLL_INTERVAL * 1000),
+    })
+
 def download_simulation_csv(request, pk):
     simulation = get_object_or_404(Simulation, pk=pk)
-    output_folder = os.path.join(settings.MEDIA_ROOT, 'simulations', str(pk))
+    output_folder = simulation.get_output_folder()
     file_path = os.path.join(output_folder, 'dilutions_calculated.csv')
     if not os.path.exists(file_path): raise Http404("Fichier CSV introuvable")
-    with open(file_path, 'rb') as fh:
-        response = HttpResponse(fh.read(), content_type="text/csv")
-        response['Content-Disposition'] = 'attachment; filename="dilutions.csv"'
-        return response
+    return ranged_file_response(request, file_path, 'dilutions.csv', 'text/csv')
 
 def download_simulation_zip(request, pk):
-    nom_dossier = f"simulation_{pk}"
-    nom_fichier_zip = f"{nom_dossier}_archive.zip"
-    chemin_complet = os.path.join(settings.BASE_DIR, 'simulation', nom_dossier, nom_fichier_zip)
-    if os.path.exists(chemin_complet):
-        response = FileResponse(open(chemin_complet, 'rb'), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{nom_fichier_zip}"'
-        return response
-    else:
-        raise Http404(f"Fichier ZIP introuvable.")
+    simulation = get_object_or_404(Simulation, pk=pk)
+    output_folder = simulation.get_output_folder()
+    if not os.path.isdir(output_folder):
+        raise Http404("Résultats de la simulation introuvables.")
+    return folder_zip_response(request, output_folder, f"simulation_{pk}.zip")
 
 #équipes
 @login_required
@@ -496,13 +503,8 @@ def team_list(request):
         Q(leader=request.user) | Q(members=request.user)
     ).distinct()
 
-    # Ajout des compteurs par équipe
-    for team in teams:
-        team.tables_count = Correspondence.objects.filter(team=team).count()
-        team.campaigns_count = Simulation.objects.filter(team=team).count()
-        team.plasmids_count = Plasmid.objects.filter(
-            collection__team=team
-        ).count()
+    # Ajout des compteurs par équipe (une requête pour toutes les équipes, voir biolib/stats.py)
+    teams = attach_team_stats(teams)
 
     return render(request, 'biolib/teams.html', {'teams': teams})
 
@@ -530,10 +532,7 @@ def team_create(request):
 def team_detail(request, team_id):
     team = get_object_or_404(Team, id=team_id, members=request.user)
 
-    collections_count = team.plasmidcollection_set.count()
-    tables_count = team.correspondence_set.count()
-    campaigns_count = team.simulation_set.count()
-    plasmids_count = Plasmid.objects.filter(collection__team=team).count()
+    stats = team_stats([team.id]).get(team.id, {})
 
     return render(
         request,
@@ -541,10 +540,7 @@ def team_detail(request, team_id):
         {
             'team': team,
             'is_leader': team.leader == request.user,
-            'collections_count': collections_count,
-            'tables_count': tables_count,
-            'campaigns_count': campaigns_count,
-            'plasmids_count': plasmids_count,
+            **stats,
         }
     )
 
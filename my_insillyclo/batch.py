@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Exécution d'un lot de campagnes sur un même dépôt de plasmides.
+
+La préparation commune est faite une fois dans le processus appelant : les
+GenBank du dépôt sont parsés et déposés dans le cache disque, que les
+workers relisent sans reparser. Chaque worker du pool importe insillyclo
+et les données d'enzymes une seule fois (initialiseur), puis enchaîne les
+campagnes. Ce module ne dépend pas de Django : il ne touche pas à la base.
+"""
+import multiprocessing
+import os
+import pathlib
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from my_insillyclo.cache import get_genbank_cache
+
+BATCH_JOBS = int(os.environ.get('INSILLYCLO_BATCH_JOBS', min(4, os.cpu_count() or 1)))
+
+
+@dataclass
+class Campaign:
+    """ Une campagne du lot ; `key` identifie le résultat (id de la Simulation). """
+    key: object
+    template_path: str
+    mapping_paths: list
+    gb_plasmids: list
+    output_dir: str
+    enzyme: str = 'BsaI'
+
+
+@dataclass
+class CampaignResult:
+    key: object
+    ok: bool
+    elapsed: float
+    error: str = ''
+    messages: list = field(default_factory=list)
+
+
+def warm_up(campaigns):
+    """ Parse une fois chaque GenBank utilisé par le lot (cache disque partagé avec les workers). """
+    cache = get_genbank_cache()
+    seen = set()
+    for campaign in campaigns:
+        for path in campaign.gb_plasmids:
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                cache.read(pathlib.Path(path))
+            except Exception as e:
+                # Fichier illisible : la campagne qui l'utilise le signalera
+                print(f"DEBUG: GenBank illisible {path}: {e}")
+
+
+def _init_worker():
+    """ Imports coûteux (insillyclo, catalogue des enzymes) faits une fois par worker. """
+    import my_insillyclo.simulator  # noqa: F401
+    from my_insillyclo.enzymes import catalogue
+    catalogue()
+
+
+def _observer(messages):
+    import insillyclo.observer
+
+    class BatchObserver(insillyclo.observer.InSillyCloCliObserver):
+        def __init__(self):
+            super().__init__(debug=False, fail_on_error=True)
+
+        def notify_message(self, message):
+            messages.append(message)
+
+    return BatchObserver()
+
+
+def run_campaign(campaign, options):
+    """ Exécute une campagne ; ne lève pas d'exception (l'erreur est dans le résultat). """
+    from my_insillyclo.simulator import compute_all
+
+    start = time.perf_counter()
+    messages = []
+    try:
+        compute_all(
+            observer=_observer(messages),
+            settings=None,
+            input_template_filled=campaign.template_path,
+            input_parts_files=campaign.mapping_paths,
+            gb_plasmids=campaign.gb_plasmids,
+            output_dir=campaign.output_dir,
+            data_source="Django",
+            enzyme_names=campaign.enzyme,
+            **options
+        )
+    except Exception as e:
+        traceback.print_exc()
+        return CampaignResult(campaign.key, False, time.perf_counter() - start, str(e), messages)
+    return CampaignResult(campaign.key, True, time.perf_counter() - start, '', messages)
+
+
+def run_batch(campaigns, jobs=None, **options):
+    """
+    Exécute les campagnes sur un pool de `jobs` processus et renvoie leurs
+    résultats au fil de l'eau (générateur de CampaignResult). Chaque campagne
+    a un résultat, en échec si son worker n'a pas pu le rendre.
+    """
+    campaigns = list(campaigns)
+    if not campaigns:
+        return
+    jobs = min(jobs or BATCH_JOBS, len(campaigns))
+    warm_up(campaigns)
+
+    if jobs <= 1:
+        for campaign in campaigns:
+            yield run_campaign(campaign, options)
+        return
+
+    # Un pool de patch par worker serait de trop : les patchs restent dans le worker
+    options = {**options, 'patch_workers': 1}
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    ) as pool:
+        futures = {pool.submit(run_campaign, campaign, options): campaign for campaign in campaigns}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker mort (BrokenProcessPool) ou résultat non transmissible :
+                # la campagne échoue, les autres résultats sont quand même rendus
+                traceback.print_exc()
+                result = CampaignResult(futures[future].key, False, 0.0, f"{type(e).__name__}: {e}")
+            yield result
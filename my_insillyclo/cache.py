@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Caches persistants du simulateur.
+
+Les entrées sont indexées par l'empreinte SHA-256 du contenu des fichiers :
+un fichier renommé ou recopié retombe sur la même entrée, un fichier modifié
+en obtient une nouvelle. Les caches sont bornés en taille et évincent les
+entrées les moins récemment utilisées (LRU).
+"""
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import shutil
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = pathlib.Path(
+    os.environ.get('INSILLYCLO_CACHE_DIR', pathlib.Path(__file__).resolve().parent.parent / 'cache')
+)
+
+# =============================================================================
+# EMPREINTES DE FICHIERS
+# =============================================================================
+
+_digest_memo = OrderedDict()
+_digest_lock = threading.Lock()
+_DIGEST_MEMO_SIZE = 4096
+
+
+def file_digest(path):
+    """
+    Empreinte SHA-256 du contenu d'un fichier.
+    Mémorisée sur (chemin, mtime, taille) pour ne pas relire un fichier inchangé.
+    """
+    path = pathlib.Path(path)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _digest_lock:
+        digest = _digest_memo.get(key)
+        if digest is not None:
+            _digest_memo.move_to_end(key)
+            return digest
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[key] = digest
+        if len(_digest_memo) > _DIGEST_MEMO_SIZE:
+            _digest_memo.popitem(last=False)
+    return digest
+
+
+def link_or_copy(src, dst):
+    """ Lien physique vers `src` (aucune donnée dupliquée), copie si le système de fichiers le refuse. """
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def normalized_table_digest(path):
+    """
+    Empreinte d'un template ou d'un fichier de mapping indépendante de sa
+    mise en forme : fins de ligne, espaces de fin et lignes vides finales pour
+    un CSV ; contenu des cellules (et non le binaire) pour un classeur Excel.
+    """
+    path = pathlib.Path(path)
+    if path.suffix.lower() in ('.xlsx', '.xls'):
+        import pandas as pd
+        df = pd.read_excel(path, sheet_name=0, header=None, dtype=str)
+        text = df.to_csv(index=False, header=False)
+    else:
+        text = path.read_bytes().decode('utf-8', errors='replace')
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    while lines and not lines[-1]:
+        lines.pop()
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+
+def simulation_fingerprint(template_path, mapping_paths, plasmid_paths, enzyme, **options):
+    """
+    Empreinte de tout ce qui détermine le résultat d'une simulation : deux
+    soumissions de même empreinte produisent les mêmes fichiers.
+    """
+    payload = {
+        'template': normalized_table_digest(template_path),
+        'mappings': [normalized_table_digest(p) for p in mapping_paths],
+        'plasmids': sorted(file_digest(p) for p in plasmid_paths),
+        'enzyme': enzyme,
+        'options': options,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# =============================================================================
+# STOCKAGE DISQUE BORNÉ (LRU)
+# =============================================================================
+
+class _DiskLRU:
+    """
+    Répertoire d'entrées `<empreinte[:2]>/<empreinte><suffixe>`.
+    La date de modification sert d'horodatage d'accès pour l'éviction.
+    """
+
+    def __init__(self, directory, max_bytes, suffix):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key):
+        """ Chemin de l'entrée si elle existe (et la marque comme récemment utilisée). """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put_bytes(self, key, data):
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture atomique : un lecteur concurrent ne voit jamais d'entrée tronquée
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._account(len(data))
+        return path
+
+    def put_file(self, key, src):
+        """ Enregistre une copie (lien physique si possible) du fichier `src`. """
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        link_or_copy(src, tmp)
+        os.replace(tmp, path)
+        self._account(path.stat().st_size)
+        return path
+
+    def _account(self, added):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """ Supprime les entrées les plus anciennes jusqu'à 90 % de la taille maximale. """
+        entries = sorted(self._entries())
+        size = sum(s for _, s, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, entry_path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(entry_path)
+                size -= entry_size
+            except FileNotFoundError:
+                pass
+        self._size = size
+
+
+# =============================================================================
+# CACHE DES GENBANK PARSÉS
+# =============================================================================
+
+class GenBankCache:
+    """
+    Cache des SeqRecord parsés, stockés sous forme binaire compacte
+    (pickle compressé zlib), sur disque et en mémoire.
+    Chaque lecture renvoie un nouvel objet : insillyclo modifie les
+    annotations des enregistrements qu'il reçoit.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR / 'genbank', max_bytes=256 * 1024 * 1024, memory_entries=512):
+        self._disk = _DiskLRU(directory, max_bytes, suffix='.seqrecord')
+        self._memory = OrderedDict()
+        self._memory_entries = memory_entries
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        """ Équivalent de `SeqIO.read(path, "genbank")`, sans reparser un contenu déjà vu. """
+        digest = file_digest(path)
+        blob = self._get_blob(digest)
+        if blob is None:
+            from Bio import SeqIO
+            record = SeqIO.read(path, "genbank")
+            blob = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+            self._disk.put_bytes(digest, blob)
+            self._remember(digest, blob)
+        return pickle.loads(zlib.decompress(blob))
+
+    def _get_blob(self, digest):
+        with self._lock:
+            blob = self._memory.get(digest)
+            if blob is not None:
+                self._memory.move_to_end(digest)
+                return blob
+        cached_path = self._disk.get(digest)
+        if cached_path is None:
+            return None
+        try:
+            blob = cached_path.read_bytes()
+        except FileNotFoundError:
+            # Évincée entre-temps par un autre processus
+            return None
+        self._remember(digest, blob)
+        return blob
+
+    def _remember(self, digest, blob):
+        with self._lock:
+            self._memory[digest] = blob
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self._memory_entries:
+                self._memory.popitem(last=False)
+
+
+# =============================================================================
+# CACHE DES PIÈCES PATCHÉES
+# =============================================================================
+
+class PatchedPartCache:
+    """
+    Fichiers GenBank produits par le patch d'une pièce, indexés par
+    (empreinte de la source, overhang gauche, overhang droit). Une campagne
+    qui repatche la même pièce avec les mêmes connecteurs réutilise le
+    fichier existant au lieu de le régénérer.
+    """
+
+    # À incrémenter si le format produit par le patch change
+    VERSION = 2
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR / 'patched', max_bytes=512 * 1024 * 1024):
+        self._disk = _DiskLRU(directory, max_bytes, suffix='.gb')
+
+    def key(self, source_digest, target_left, target_right):
+        raw = f"{self.VERSION}:{source_digest}:{target_left}:{target_right}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def fetch(self, key, dst_path):
+        """ Place l'artefact en cache à `dst_path` ; renvoie False s'il n'existe pas. """
+        cached_path = self._disk.get(key)
+        if cached_path is None:
+            return False
+        try:
+            link_or_copy(cached_path, dst_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key, produced_path):
+        self._disk.put_file(key, produced_path)
+
+
+# =============================================================================
+# CACHE DES OVERHANGS DES PIÈCES
+# =============================================================================
+
+class OverhangCache:
+    """
+    Overhangs réels d'une pièce (voir my_insillyclo/overhangs.py), indexés par
+    (empreinte du fichier, enzyme). Petites entrées JSON, sur disque et en mémoire.
+    """
+
+    # À incrémenter si l'extraction change
+    VERSION = 1
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR / 'overhangs', max_bytes=16 * 1024 * 1024):
+        self._disk = _DiskLRU(directory, max_bytes, suffix='.json')
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def key(self, source_digest, enzyme):
+        raw = f"{self.VERSION}:{source_digest}:{enzyme}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """ (trouvé, valeur) : la valeur peut être None (pièce sans overhangs lisibles). """
+        with self._lock:
+            if key in self._memory:
+                return True, self._memory[key]
+        cached_path = self._disk.get(key)
+        if cached_path is None:
+            return False, None
+        try:
+            value = json.loads(cached_path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            return False, None
+        value = tuple(value) if value is not None else None
+        with self._lock:
+            self._memory[key] = value
+        return True, value
+
+    def put(self, key, value):
+        self._disk.put_bytes(key, json.dumps(value).encode())
+        with self._lock:
+            self._memory[key] = value
+
+
+_genbank_cache = None
+_patched_part_cache = None
+_overhang_cache = None
+
+
+def get_patched_part_cache():
+    """ Instance partagée par le processus. """
+    global _patched_part_cache
+    if _patched_part_cache is None:
+        _patched_part_cache = PatchedPartCache()
+    return _patched_part_cache
+
+
+def get_genbank_cache():
+    """ Instance partagée par le processus. """
+    global _genbank_cache
+    if _genbank_cache is None:
+        _genbank_cache = GenBankCache()
+    return _genbank_cache
+
+
+def get_overhang_cache():
+    """ Instance partagée par le processus. """
+    global _overhang_cache
+    if _overhang_cache is None:
+        _overhang_cache = OverhangCache()
+    return _overhang_cache
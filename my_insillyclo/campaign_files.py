@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Lecture en flux des fichiers d'une campagne (templates, fichiers iP_mapping).
+
+Le séparateur est détecté une seule fois par fichier (sur un échantillon du
+début), puis le fichier est lu par le module `csv` ou le moteur C de pandas,
+par blocs, en temps linéaire. Les fichiers de mapping sont réduits bloc par
+bloc à leur table de noms : mémoire bornée. Un template est rendu en entier
+(le parser d'insillyclo en a besoin) ; il est construit par blocs, sans
+garder en plus toutes ses lignes sous forme de listes Python.
+"""
+import copy
+import csv
+import functools
+import itertools
+import pathlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from my_insillyclo.cache import file_digest
+
+DELIMITERS = ",;\t"
+# Séparateur par défaut (fichier vide, comme insillyclo)
+DEFAULT_DELIMITER = ';'
+SNIFF_SAMPLE = 4096
+CHUNK_ROWS = 50_000
+
+# En-tête ajouté aux templates CSV qui n'en ont pas
+TEMPLATE_HEADER = [["Assembly settings", ""], ["assembly_type", "Golden Gate"], ["", ""], ["Constructs settings", ""]]
+
+_delimiters = OrderedDict()
+_delimiters_lock = threading.Lock()
+_MAX_DELIMITERS = 1024
+
+
+def sniff_delimiter(path):
+    """
+    Séparateur du fichier CSV `path`, mémorisé sur (chemin, mtime, taille).
+    Même repli qu'insillyclo : échantillon du début, puis ligne d'en-tête seule.
+    """
+    path = pathlib.Path(path)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _delimiters_lock:
+        delimiter = _delimiters.get(key)
+        if delimiter is not None:
+            return delimiter
+
+    with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+        sample = f.read(SNIFF_SAMPLE)
+    if not sample.strip():
+        delimiter = DEFAULT_DELIMITER
+    else:
+        sniffer = csv.Sniffer()
+        try:
+            delimiter = sniffer.sniff(sample, delimiters=DELIMITERS).delimiter
+        except csv.Error:
+            header = sample.splitlines()[0]
+            try:
+                delimiter = sniffer.sniff(header, delimiters=DELIMITERS).delimiter
+            except csv.Error:
+                raise ValueError(f"Séparateur introuvable dans {path.name}")
+
+    with _delimiters_lock:
+        _delimiters[key] = delimiter
+        if len(_delimiters) > _MAX_DELIMITERS:
+            _delimiters.popitem(last=False)
+    return delimiter
+
+
+def iter_rows(path, delimiter=None):
+    """ Lignes du fichier (listes de chaînes), lues en flux par le module csv. """
+    delimiter = delimiter or sniff_delimiter(path)
+    with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def read_chunks(path, usecols=None, chunk_rows=CHUNK_ROWS):
+    """ Blocs de `chunk_rows` lignes (DataFrame de chaînes) lus par le moteur C de pandas. """
+    return pd.read_csv(
+        path,
+        sep=sniff_delimiter(path),
+        engine='c',
+        dtype=str,
+        keep_default_na=False,
+        usecols=usecols,
+        chunksize=chunk_rows,
+    )
+
+
+# =============================================================================
+# FICHIERS DE MAPPING (iP_mapping)
+# =============================================================================
+
+def _mapping_columns(path):
+    """ Noms exacts des colonnes pID et Name du fichier (None si absentes). """
+    header = next(iter_rows(path), [])
+    col_id = next((c for c in header if c.strip().lower() == 'pid'), None)
+    col_name = next((c for c in header if c.strip().lower() == 'name'), None)
+    return col_id, col_name
+
+
+def read_name_mapping(input_parts_files):
+    """
+    Nom de pièce (ou pID) -> pID du fichier GenBank, pour tous les fichiers de
+    mapping. Construit bloc par bloc, par colonnes entières (sans itérer ligne à ligne).
+    """
+    name_to_filename = {}
+    for csv_path in input_parts_files or []:
+        try:
+            col_id, col_name = _mapping_columns(csv_path)
+            if not (col_id and col_name):
+                continue
+            for chunk in read_chunks(csv_path, usecols=[col_id, col_name]):
+                pids = chunk[col_id].str.strip()
+                names = chunk[col_name].str.strip()
+                name_to_filename.update(zip(names[names != ''], pids[names != '']))
+                name_to_filename.update(zip(pids, pids))
+        except Exception as e:
+            print(f"DEBUG: Erreur lecture mapping: {e}")
+    name_to_filename.pop('', None)
+    return name_to_filename
+
+
+# =============================================================================
+# TEMPLATES CSV
+# =============================================================================
+
+def _infer_numeric(df):
+    """ Colonnes entièrement numériques converties, comme l'inférence de pandas. """
+    for col in df.columns:
+        values = df[col].dropna()
+        converted = pd.to_numeric(values, errors='coerce')
+        if len(values) and not converted.isna().any():
+            df[col] = pd.to_numeric(df[col])
+    return df
+
+
+def _template_block(rows):
+    """ Lignes de longueurs différentes -> DataFrame de chaînes nettoyées (vides -> NaN). """
+    width = max(len(row) for row in rows)
+    df = pd.DataFrame([row + [''] * (width - len(row)) for row in rows], dtype=object)
+    return df.apply(lambda col: col.str.strip()).replace('', float('nan'))
+
+
+def read_template_frame(path, chunk_rows=CHUNK_ROWS):
+    """
+    Template CSV sous forme de DataFrame sans en-tête (cellules vides -> NaN).
+    Lu par le module csv, `chunk_rows` lignes à la fois : les lignes peuvent
+    avoir des longueurs différentes (réglages sur deux colonnes, constructions
+    sur beaucoup plus).
+    """
+    rows = iter_rows(path)
+    blocks = []
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            break
+        blocks.append(_template_block(chunk))
+    if not blocks:
+        return pd.DataFrame(dtype=object)
+    df = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+    return _infer_numeric(df)
+
+
+def is_template_csv(path):
+    """
+    Vrai si le CSV `path` est un template (ligne « Output plasmid id » en
+    première colonne), et non un fichier annexe (primers, concentrations...).
+    """
+    try:
+        return any(row and row[0].strip().startswith("Output plasmid id") for row in iter_rows(path))
+    except (OSError, ValueError):
+        return False
+
+
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+_MAX_FRAMES = 16
+
+
+def load_template_frame(path):
+    """
+    Feuille du template telle que la lit `insillyclo.parser` (DataFrame sans
+    en-tête, passé à template_parser.parse_template_frame), mémorisée par empreinte du contenu : un même template n'est lu
+    qu'une fois, quel que soit son nom. Les CSV sont lus directement, sans
+    passer par un fichier Excel intermédiaire. Le DataFrame renvoyé est partagé :
+    il ne doit pas être modifié.
+    """
+    path = pathlib.Path(path)
+    key = (file_digest(path), path.suffix.lower())
+    with _frames_lock:
+        df = _frames.get(key)
+        if df is not None:
+            _frames.move_to_end(key)
+            return df
+
+    if path.suffix.lower() == '.csv':
+        df = read_template_frame(path)
+        if "Assembly settings" not in df.iloc[:, 0].astype(str).values:
+            header = pd.DataFrame(TEMPLATE_HEADER).replace('', float('nan'))
+            df = pd.concat([header, df], ignore_index=True)
+    else:
+        df = pd.read_excel(path, sheet_name=0, header=None)
+
+    with _frames_lock:
+        _frames[key] = df
+        while len(_frames) > _MAX_FRAMES:
+            _frames.popitem(last=False)
+    return df
+
+
+class _RecordingObserver:
+    """
+    Transmet tout à l'observateur et garde les notifications (`notify_*`)
+    émises pendant le parsing, pour les rejouer quand le résultat est resservi.
+    """
+
+    def __init__(self, observer):
+        self._observer = observer
+        self.notifications = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._observer, name)
+        if not (name.startswith('notify_') and callable(attr)):
+            return attr
+
+        def notify(*args, **kwargs):
+            self.notifications.append((name, args, kwargs))
+            return attr(*args, **kwargs)
+        return notify
+
+
+def replay_notifications(observer, notifications):
+    for name, args, kwargs in notifications:
+        getattr(observer, name)(*args, **kwargs)
+
+
+_parses = OrderedDict()
+_parses_lock = threading.Lock()
+_MAX_PARSES = 16
+
+
+def memoize_template_parser(parse):
+    """
+    Enveloppe un parser de template : le résultat est mémorisé sur (chemin,
+    mtime, empreinte du contenu) et chaque appel en reçoit une copie, car
+    insillyclo peut modifier les objets. Les notifications émises au premier
+    parsing (pièces manquantes, types invalides) sont rejouées sur
+    l'observateur de chaque appel servi par la mémoire.
+    """
+
+    @functools.wraps(parse)
+    def wrapper(input_template_filled, input_part_factory, assembly_factory, plasmid_factory,
+                observer, load_only_assembly=False):
+        path = pathlib.Path(input_template_filled)
+        key = (
+            str(path.resolve()), path.stat().st_mtime_ns, file_digest(path),
+            type(input_part_factory), type(assembly_factory), type(plasmid_factory),
+            load_only_assembly,
+        )
+        with _parses_lock:
+            entry = _parses.get(key)
+            if entry is not None:
+                _parses.move_to_end(key)
+        if entry is not None:
+            result, notifications = entry
+            replay_notifications(observer, notifications)
+            return copy.deepcopy(result)
+
+        recorder = _RecordingObserver(observer)
+        result = parse(
+            input_template_filled,
+            input_part_factory=input_part_factory,
+            assembly_factory=assembly_factory,
+            plasmid_factory=plasmid_factory,
+            observer=recorder,
+            load_only_assembly=load_only_assembly,
+        )
+        with _parses_lock:
+            _parses[key] = (copy.deepcopy(result), recorder.notifications)
+            while len(_parses) > _MAX_PARSES:
+                _parses.popitem(last=False)
+        return result
+
+    return wrapper
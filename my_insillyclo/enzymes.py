@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Catalogue des enzymes de restriction, précalculé à partir de Bio.Restriction.
+
+Importer Bio.Restriction et parcourir ses ~1000 enzymes coûte un quart de
+seconde à chaque démarrage de processus (serveur, commande, worker). Les
+données utiles sont extraites une fois dans `data/enzymes.json`, lu au
+premier accès seulement. Pour régénérer le fichier après une mise à jour
+de Biopython :
+
+    python -m my_insillyclo.enzymes
+"""
+import functools
+import json
+import pathlib
+from dataclasses import asdict, dataclass
+
+CATALOGUE_PATH = pathlib.Path(__file__).resolve().parent / 'data' / 'enzymes.json'
+
+
+@dataclass(frozen=True)
+class Enzyme:
+    """
+    Données d'une enzyme, avec les conventions de Bio.Restriction : `fst5` et
+    `fst3` positions de coupure sur le brin direct et complémentaire, `ovhg`
+    longueur de l'overhang (négative pour un overhang 5', None si inconnue).
+    """
+    name: str
+    site: str
+    size: int
+    fst5: int = None
+    fst3: int = None
+    ovhg: int = None
+    palindromic: bool = False
+    cuts_twice: bool = False
+    type_iis: bool = False
+
+    @property
+    def overhang_size(self):
+        return abs(self.ovhg) if self.ovhg is not None else 0
+
+
+def _from_bio(enzyme):
+    cut_outside = enzyme.fst5 is not None and (enzyme.fst5 < 0 or enzyme.fst5 > enzyme.size)
+    return Enzyme(
+        name=str(enzyme),
+        site=str(enzyme.site),
+        size=enzyme.size,
+        fst5=enzyme.fst5,
+        fst3=enzyme.fst3,
+        ovhg=enzyme.ovhg,
+        palindromic=enzyme.is_palindromic(),
+        cuts_twice=enzyme.cut_twice(),
+        # Type IIS : site asymétrique, une coupure de chaque brin hors du site
+        type_iis=not enzyme.is_palindromic() and not enzyme.cut_twice() and cut_outside,
+    )
+
+
+def build_catalogue():
+    """ Catalogue complet lu dans Bio.Restriction (lent : sert à générer le fichier). """
+    from Bio.Restriction import AllEnzymes
+    return sorted((_from_bio(e) for e in AllEnzymes), key=lambda e: e.name)
+
+
+def write_catalogue(path=CATALOGUE_PATH):
+    enzymes = build_catalogue()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Une enzyme par ligne : diffs lisibles après régénération
+    with open(path, 'w') as f:
+        f.write('[\n' + ',\n'.join(json.dumps(asdict(e)) for e in enzymes) + '\n]\n')
+    return len(enzymes)
+
+
+@functools.lru_cache(maxsize=1)
+def catalogue():
+    """ {nom: Enzyme}, lu une fois par processus. """
+    with open(CATALOGUE_PATH) as f:
+        return {data['name']: Enzyme(**data) for data in json.load(f)}
+
+
+def get_enzyme(name):
+    """ Enzyme `name` du catalogue (ValueError si elle est inconnue). """
+    try:
+        return catalogue()[name]
+    except KeyError:
+        raise ValueError(f"Enzyme inconnue : {name}")
+
+
+def enzyme_names():
+    return list(catalogue())
+
+
+def enzyme_choices():
+    """ Choix des champs `enzyme` des modèles, évalués au premier affichage. """
+    return [(name, name) for name in catalogue()]
+
+
+if __name__ == '__main__':
+    print(f"{write_catalogue()} enzymes écrites dans {CATALOGUE_PATH}")
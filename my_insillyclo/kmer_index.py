@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Index inversé de k-mers sur les séquences de plasmides.
+
+Chaque séquence est découpée en k-mers canoniques (le plus petit code entre
+le k-mer et son complément inverse) : une requête trouve donc ses
+occurrences sur les deux brins. Pour une séquence circulaire, les k-mers
+qui chevauchent l'origine sont aussi indexés.
+
+Structure :
+    base      : couples (code, id) triés, dans deux tableaux numpy
+    delta     : séquences ajoutées depuis la dernière fusion (id -> codes)
+    tombstones: ids retirés de la base, filtrés à la lecture
+
+La recherche intersecte les listes de postings des k-mers de la requête
+(les plus rares d'abord) puis vérifie les candidats sur la séquence.
+"""
+import functools
+import threading
+
+DEFAULT_K = 12
+# Au-delà, le delta est fusionné dans la base
+MAX_DELTA = 256
+
+_COMPLEMENT = str.maketrans('ACGTacgt', 'TGCAtgca')
+
+
+def reverse_complement(sequence):
+    return sequence.translate(_COMPLEMENT)[::-1]
+
+
+@functools.cache
+def _lookup():
+    """ Code ASCII -> code 2 bits (4 pour tout caractère hors ACGT). """
+    # numpy (~0,1 s) n'est importé qu'au premier calcul, pas au démarrage du serveur
+    import numpy as np
+
+    lookup = np.full(256, 4, dtype=np.uint8)
+    for code, base in enumerate('ACGT'):
+        lookup[ord(base)] = code
+        lookup[ord(base.lower())] = code
+    return lookup
+
+
+def encode_sequence(sequence):
+    """ Codes 2 bits (A=0, C=1, G=2, T=3) de chaque base ; 4 pour tout autre caractère. """
+    import numpy as np
+
+    return _lookup()[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+
+
+def window_codes(codes, k):
+    """
+    Code (uint64) de chaque fenêtre de `k` bases de `codes` (sortie de
+    `encode_sequence`) et masque des fenêtres sans base hors ACGT.
+    """
+    import numpy as np
+
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=bool)
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = (invalid[k:] - invalid[:-k]) == 0
+
+    values = codes.astype(np.uint64) & np.uint64(3)
+    forward = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        forward = (forward << np.uint64(2)) | values[j:j + n]
+    return forward, valid
+
+
+def canonical_kmers(sequence, k=DEFAULT_K, circular=False):
+    """
+    Codes (uint64) des k-mers canoniques de `sequence`, sans doublons et triés.
+    Les fenêtres contenant une base hors ACGT sont ignorées.
+    """
+    import numpy as np
+
+    if circular and len(sequence) >= k:
+        sequence = sequence + sequence[:k - 1]
+    if len(sequence) < k:
+        return np.empty(0, dtype=np.uint64)
+
+    forward, valid = window_codes(encode_sequence(sequence), k)
+    # La fenêtre i du brin direct est la fenêtre n-1-i du complément inverse
+    reverse, _ = window_codes(encode_sequence(reverse_complement(sequence)), k)
+
+    kmers = np.sort(np.minimum(forward, reverse[::-1])[valid])
+    # Dédoublonnage sur le tableau trié (plus rapide que np.unique sur de petits tableaux)
+    return kmers[np.concatenate(([True], kmers[1:] != kmers[:-1]))]
+
+
+def find_occurrences(sequence, query, circular=False):
+    """
+    Positions (0-based, sur le brin direct) où `query` apparaît, avec le brin
+    ('+' ou '-'). Sur une séquence circulaire, une occurrence peut chevaucher l'origine.
+    """
+    sequence = sequence.upper()
+    query = query.upper()
+    length = len(sequence)
+    haystack = sequence + sequence[:len(query) - 1] if circular else sequence
+
+    needles = [('+', query)]
+    if reverse_complement(query) != query:
+        # Un palindrome donnerait deux fois les mêmes positions
+        needles.append(('-', reverse_complement(query)))
+
+    hits = []
+    for strand, needle in needles:
+        start = haystack.find(needle)
+        while start != -1 and start < length:
+            hits.append((start, strand))
+            start = haystack.find(needle, start + 1)
+    return sorted(hits)
+
+
+class KmerIndex:
+
+    def __init__(self, k=DEFAULT_K):
+        import numpy as np
+
+        self.k = k
+        self._codes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._base_ids = set()
+        self._delta = {}
+        self._tombstones = set()
+        self._lock = threading.RLock()
+
+    def __contains__(self, item_id):
+        with self._lock:
+            return item_id in self._delta or (item_id in self._base_ids and item_id not in self._tombstones)
+
+    def __len__(self):
+        with self._lock:
+            return len((self._base_ids - self._tombstones) | self._delta.keys())
+
+    def ids(self):
+        with self._lock:
+            return (self._base_ids - self._tombstones) | set(self._delta)
+
+    # ------------------------------------------------------------------
+    # Mises à jour
+    # ------------------------------------------------------------------
+
+    def add(self, item_id, sequence, circular=False):
+        """ Ajoute (ou remplace) la séquence `item_id`. """
+        kmers = canonical_kmers(sequence, self.k, circular)
+        with self._lock:
+            if item_id in self._base_ids:
+                self._tombstones.add(item_id)
+            self._delta[item_id] = kmers
+            if len(self._delta) > MAX_DELTA:
+                self._compact()
+
+    def bulk_add(self, items):
+        """ `items` : itérable de (id, séquence, circulaire). Construit directement la base. """
+        with self._lock:
+            for item_id, sequence, circular in items:
+                if item_id in self._base_ids:
+                    self._tombstones.add(item_id)
+                self._delta[item_id] = canonical_kmers(sequence, self.k, circular)
+            self._compact()
+
+    def remove(self, item_id):
+        with self._lock:
+            self._delta.pop(item_id, None)
+            if item_id in self._base_ids:
+                self._tombstones.add(item_id)
+
+    def _compact(self):
+        """ Fusionne le delta dans la base et purge les ids supprimés. """
+        import numpy as np
+
+        codes, ids = self._codes, self._ids
+        dead = self._tombstones | set(self._delta)
+        if dead and len(ids):
+            keep = ~np.isin(ids, np.fromiter(dead, dtype=np.int64, count=len(dead)))
+            codes, ids = codes[keep], ids[keep]
+
+        if self._delta:
+            new_codes = [codes] + list(self._delta.values())
+            new_ids = [ids] + [np.full(len(v), item_id, dtype=np.int64) for item_id, v in self._delta.items()]
+            codes = np.concatenate(new_codes)
+            ids = np.concatenate(new_ids)
+
+        order = np.argsort(codes)
+        self._codes, self._ids = codes[order], ids[order]
+        self._base_ids = (self._base_ids - self._tombstones) | set(self._delta)
+        self._delta = {}
+        self._tombstones = set()
+
+    # ------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------
+
+    def candidates(self, query):
+        """
+        Ids dont la séquence contient tous les k-mers de `query` (sur l'un ou
+        l'autre brin). Sur-ensemble des résultats : à vérifier avec `find_occurrences`.
+        """
+        import numpy as np
+
+        if len(query) < self.k:
+            raise ValueError(f"La requête doit contenir au moins {self.k} bases.")
+        query_kmers = canonical_kmers(query, self.k)
+        if not len(query_kmers):
+            return set()
+
+        with self._lock:
+            left = np.searchsorted(self._codes, query_kmers, side='left')
+            right = np.searchsorted(self._codes, query_kmers, side='right')
+
+            result = None
+            # Les k-mers les plus rares d'abord : l'intersection se vide vite
+            for i in np.argsort(right - left, kind='stable'):
+                postings = self._ids[left[i]:right[i]]
+                result = postings if result is None else np.intersect1d(result, postings, assume_unique=True)
+                if not len(result):
+                    break
+            found = set(result.tolist()) - self._tombstones
+
+            for item_id, kmers in self._delta.items():
+                if np.isin(query_kmers, kmers, assume_unique=True).all():
+                    found.add(item_id)
+        return found
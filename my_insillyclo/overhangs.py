@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Overhangs des pièces et validation des constructions avant simulation.
+
+Une pièce Golden Gate est encadrée par un site de l'enzyme sur le brin
+direct (à gauche) et un site sur le brin complémentaire (à droite) : la
+digestion libère la pièce avec deux overhangs simple brin, lus une fois par
+(contenu du fichier, enzyme). La couche de compatibilité
+(my_insillyclo/simulator.py) ne patche que les pièces sans overhangs
+lisibles : elles reçoivent ceux de leur type de pièce (colonne du template),
+d'après l'adjacence des types observée sur les autres pièces, sinon ceux de
+leur position parmi JUNCTION_OVERHANGS. Une construction (liste ordonnée et
+circulaire de pièces) n'est ligaturable que si :
+
+    - l'overhang droit de chaque pièce est l'overhang gauche de la suivante ;
+    - les overhangs des jonctions sont tous différents (sinon collision) ;
+    - aucun overhang de jonction n'est le complément inverse d'un autre ni
+      de lui-même (palindrome) : sinon mauvaise ligation.
+
+La matrice de compatibilité (overhang droit de p == overhang gauche de q)
+est construite une fois pour toutes les pièces de la campagne, puis toutes
+les constructions sont vérifiées en un seul passage numpy.
+"""
+import pathlib
+
+import numpy as np
+
+from my_insillyclo.cache import file_digest, get_genbank_cache, get_overhang_cache
+from my_insillyclo.enzymes import get_enzyme
+from my_insillyclo.kmer_index import encode_sequence, reverse_complement, window_codes
+from my_insillyclo.restriction_scan import scan_oriented_sites
+
+# Overhangs attribués aux jonctions, dans l'ordre des positions. Les cinq
+# premiers sont ceux du standard MoClo ; aucun n'est palindromique, aucun
+# n'est à moins de deux bases d'un autre ni de son complément inverse, chacun
+# a 1 à 3 G/C et aucun n'est inclus dans le site d'une enzyme Golden Gate
+# (vérifié par overhang_set_problems). Une construction de plus de
+# len(JUNCTION_OVERHANGS) pièces réutilise forcément un overhang : elle est rejetée.
+JUNCTION_OVERHANGS = (
+    'GGAG', 'AATG', 'GCTT', 'CGCT', 'TGCC', 'AACA', 'ACAA', 'ACCC',
+    'ACGG', 'AGAT', 'AGGA', 'AGTC', 'ATAC', 'CAAA', 'CACG', 'CCAC',
+    'CCCA', 'CTGA', 'GAAC', 'GATA', 'GCGA', 'TAGA', 'TGAA',
+)
+
+
+class OverhangError(ValueError):
+    """ Constructions vouées à l'échec ; `problems` liste les (construction, message). """
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("; ".join(f"{construct}: {message}" for construct, message in problems))
+
+
+def _distance(a, b):
+    return sum(x != y for x, y in zip(a, b))
+
+
+def overhang_set_problems(overhangs, sites=(), min_distance=2):
+    """
+    Règles de fidélité d'un jeu d'overhangs : liste des problèmes (vide si le
+    jeu est sûr). `sites` : sites de reconnaissance que les overhangs ne
+    doivent pas recréer.
+    """
+    problems = []
+    sites = [s.upper() for s in sites] + [reverse_complement(s.upper()) for s in sites]
+    for i, overhang in enumerate(overhangs):
+        if overhang == reverse_complement(overhang):
+            problems.append(f"{overhang} est palindromique")
+        if not 1 <= sum(base in 'GC' for base in overhang) <= len(overhang) - 1:
+            problems.append(f"{overhang} : teneur en G/C extrême")
+        if any(overhang in site for site in sites):
+            problems.append(f"{overhang} est inclus dans un site de restriction")
+        for other in overhangs[:i]:
+            if _distance(overhang, other) < min_distance:
+                problems.append(f"{overhang} et {other} sont trop proches")
+            if _distance(overhang, reverse_complement(other)) < min_distance:
+                problems.append(f"{overhang} est trop proche du complément inverse de {other}")
+    return problems
+
+
+def junction_overhangs(position, count):
+    """
+    (gauche, droit) attribués à la pièce `position` d'une construction de
+    `count` pièces : la dernière se referme sur le premier overhang.
+    """
+    left = JUNCTION_OVERHANGS[position % len(JUNCTION_OVERHANGS)]
+    if position == count - 1:
+        return left, JUNCTION_OVERHANGS[0]
+    return left, JUNCTION_OVERHANGS[(position + 1) % len(JUNCTION_OVERHANGS)]
+
+
+# =============================================================================
+# EXTRACTION DES OVERHANGS RÉELS
+# =============================================================================
+
+def enzyme_cut(name):
+    """
+    (site, position de coupure sur le brin direct, longueur de l'overhang)
+    pour une enzyme de type IIS à overhang 5' (BsaI, BsmBI, BbsI...).
+    """
+    enzyme = get_enzyme(name)
+    if not enzyme.type_iis or enzyme.ovhg is None or enzyme.ovhg >= 0:
+        raise ValueError(f"{name} n'est pas une enzyme de type IIS à overhang 5'")
+    return enzyme.site, enzyme.fst5, enzyme.overhang_size
+
+
+def flanking_overhangs(sequence, enzyme, circular=True):
+    """
+    (overhang gauche, overhang droit) de la pièce portée par `sequence`, ou
+    None si elle n'a pas exactement un site de chaque orientation.
+    """
+    site, cut, size = enzyme_cut(enzyme)
+    sites = scan_oriented_sites([(0, sequence, circular)], [enzyme])[0][enzyme]
+    forward = [pos for pos, strand in sites if strand == '+']
+    reverse = [pos for pos, strand in sites if strand == '-']
+    if len(forward) != 1 or len(reverse) != 1:
+        return None
+
+    sequence = sequence.upper()
+    length = len(sequence)
+    # Le brin complémentaire lit le site de droite à gauche : coupure symétrique
+    left_start = forward[0] + cut
+    right_start = reverse[0] + len(site) - cut - size
+    if not circular and (left_start + size > length or right_start < 0):
+        return None
+    ring = sequence * 2 if circular else sequence
+    left = ring[left_start % length:left_start % length + size]
+    right = ring[right_start % length:right_start % length + size]
+    return left, right
+
+
+def part_overhangs(path, enzyme):
+    """ Overhangs réels du fichier GenBank `path`, calculés une fois par (contenu, enzyme). """
+    cache = get_overhang_cache()
+    key = cache.key(file_digest(path), enzyme)
+    found, value = cache.get(key)
+    if found:
+        return value
+
+    record = get_genbank_cache().read(pathlib.Path(path))
+    circular = record.annotations.get('topology', 'circular') == 'circular'
+    value = flanking_overhangs(str(record.seq), enzyme, circular)
+    cache.put(key, value)
+    return value
+
+
+# =============================================================================
+# ADJACENCE DES TYPES DE PIÈCES
+# =============================================================================
+
+def type_adjacency(constructs, overhangs):
+    """
+    `constructs` : liste de (identifiant, [(pièce, type), ...]) ; le type est
+    la colonne du template. Renvoie {(type, type suivant): overhangs observés} :
+    chaque jonction apporte l'overhang droit connu de la pièce de gauche et
+    l'overhang gauche connu de la pièce de droite.
+    """
+    adjacency = {}
+    for _, slots in constructs:
+        for i, (part, part_type) in enumerate(slots):
+            next_part, next_type = slots[(i + 1) % len(slots)]
+            observed = adjacency.setdefault((part_type, next_type), set())
+            right = (overhangs.get(part) or (None, None))[1]
+            left = (overhangs.get(next_part) or (None, None))[0]
+            observed.update(o for o in (right, left) if o)
+    return adjacency
+
+
+def assign_overhangs(constructs, overhangs, parts):
+    """
+    Overhangs à donner aux `parts` (pièces à patcher) : de chaque côté,
+    l'overhang de la jonction entre leur type et le type voisin s'il est
+    unique (voir type_adjacency), sinon celui de leur position
+    (junction_overhangs). Renvoie {pièce: (gauche, droit)} dans l'ordre des
+    constructions ; une pièce réutilisée garde sa dernière paire.
+    """
+    adjacency = type_adjacency(constructs, overhangs)
+    assigned = {}
+    for _, slots in constructs:
+        count = len(slots)
+        for i, (part, part_type) in enumerate(slots):
+            if part not in parts:
+                continue
+            left, right = junction_overhangs(i, count)
+            before = adjacency.get((slots[i - 1][1], part_type), ())
+            after = adjacency.get((part_type, slots[(i + 1) % count][1]), ())
+            if len(before) == 1:
+                left = next(iter(before))
+            if len(after) == 1:
+                right = next(iter(after))
+            assigned[part] = (left, right)
+    return assigned
+
+
+# =============================================================================
+# VALIDATION DES CONSTRUCTIONS
+# =============================================================================
+
+def _overhang_codes(overhangs):
+    """ Code entier de chaque overhang (-1 si inconnu ou non ACGT). """
+    codes = np.full(len(overhangs), -1, dtype=np.int64)
+    for i, overhang in enumerate(overhangs):
+        if overhang:
+            values, valid = window_codes(encode_sequence(overhang), len(overhang))
+            if len(valid) and valid[0]:
+                codes[i] = int(values[0])
+    return codes
+
+
+def compatibility_matrix(parts, overhangs):
+    """
+    Matrice booléenne C[p, q] : la pièce `parts[q]` peut suivre `parts[p]`
+    (overhang droit de p == overhang gauche de q). `overhangs` : pièce ->
+    (gauche, droit) ou None. Renvoie aussi les codes (gauche, droit).
+    """
+    left = _overhang_codes([(overhangs.get(p) or (None, None))[0] for p in parts])
+    right = _overhang_codes([(overhangs.get(p) or (None, None))[1] for p in parts])
+    matrix = (right[:, None] == left[None, :]) & (right[:, None] >= 0)
+    return matrix, left, right
+
+
+def validate_constructs(constructs, overhangs):
+    """
+    `constructs` : liste de (identifiant, [pièces dans l'ordre]).
+    Renvoie la liste des (identifiant, problème). Les jonctions touchant une
+    pièce aux overhangs inconnus ne sont pas jugées.
+    """
+    constructs = [(cid, list(parts)) for cid, parts in constructs if parts]
+    if not constructs:
+        return []
+
+    parts = sorted({p for _, construct_parts in constructs for p in construct_parts}, key=str)
+    part_index = {p: i for i, p in enumerate(parts)}
+    matrix, left, right = compatibility_matrix(parts, overhangs)
+    rc_right = _overhang_codes([
+        reverse_complement(o[1]) if o else None for o in (overhangs.get(p) for p in parts)
+    ])
+
+    # Constructions alignées dans une matrice (m, n) complétée par -1
+    width = max(len(construct_parts) for _, construct_parts in constructs)
+    rows = np.full((len(constructs), width), -1, dtype=np.int64)
+    lengths = np.array([len(construct_parts) for _, construct_parts in constructs])
+    for r, (_, construct_parts) in enumerate(constructs):
+        rows[r, :len(construct_parts)] = [part_index[p] for p in construct_parts]
+
+    present = np.arange(width)[None, :] < lengths[:, None]
+    following = np.where(present, (np.arange(width)[None, :] + 1) % lengths[:, None], 0)
+    nxt = np.take_along_axis(rows, following, axis=1)
+
+    safe_rows = np.where(present, rows, 0)
+    safe_nxt = np.where(present, nxt, 0)
+    known = present & (right[safe_rows] >= 0) & (left[safe_nxt] >= 0)
+
+    # 1. Jonctions : la pièce suivante doit accepter l'overhang droit
+    mismatch = known & ~matrix[safe_rows, safe_nxt]
+
+    # 2. Collisions : même overhang sur deux jonctions d'une construction
+    junction = np.where(present & (right[safe_rows] >= 0), right[safe_rows], -1)
+    junction_rc = np.where(junction >= 0, rc_right[safe_rows], -2)
+    same = (junction[:, :, None] == junction[:, None, :]) & (junction[:, :, None] >= 0)
+    same &= ~np.eye(width, dtype=bool)[None, :, :]
+    # 3. Mauvaise ligation : complément inverse d'une jonction (ou d'elle-même)
+    misligation = (junction[:, :, None] == junction_rc[:, None, :]) & (junction[:, :, None] >= 0)
+
+    problems = []
+    for r in np.flatnonzero(mismatch.any(axis=1) | same.any(axis=(1, 2)) | misligation.any(axis=(1, 2))):
+        cid, construct_parts = constructs[r]
+        for j in np.flatnonzero(mismatch[r]):
+            a, b = construct_parts[j], construct_parts[following[r, j]]
+            problems.append((cid, (
+                f"{a} ({overhangs[a][1]}) ne se ligature pas à {b} ({overhangs[b][0]})"
+            )))
+        for i, j in zip(*np.nonzero(np.triu(same[r]))):
+            problems.append((cid, (
+                f"overhang {overhangs[construct_parts[i]][1]} en double "
+                f"(après {construct_parts[i]} et {construct_parts[j]})"
+            )))
+        for i, j in zip(*np.nonzero(np.triu(misligation[r]))):
+            overhang = overhangs[construct_parts[i]][1]
+            if i == j:
+                problems.append((cid, f"overhang palindromique {overhang} après {construct_parts[i]}"))
+            else:
+                problems.append((cid, (
+                    f"{overhang} (après {construct_parts[i]}) est le complément inverse "
+                    f"de {overhangs[construct_parts[j]][1]} (après {construct_parts[j]})"
+                )))
+    return problems
+
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Index de résolution pièce -> fichier GenBank du dépôt de plasmides.
+
+Remplace le parcours linéaire `filename_id in s` de la couche de
+compatibilité : recherche exacte (stem ou nom de fichier), puis sur
+l'identifiant normalisé, puis par préfixe dans une liste triée (bisect).
+L'index est construit à chaque simulation, pour les fichiers qu'elle reçoit :
+le mémoriser demanderait une clé (liste triée des chemins) aussi coûteuse à
+calculer que l'index lui-même, et qui ne suivrait pas un fichier remplacé
+sous le même nom.
+"""
+import bisect
+import pathlib
+import re
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_identifier(identifier):
+    """ 'pYTK_045.gb' -> 'pytk045' """
+    identifier = str(identifier).strip().lower()
+    if identifier.endswith('.gb'):
+        identifier = identifier[:-3]
+    return _NON_ALNUM.sub('', identifier)
+
+
+class PartIndex:
+
+    def __init__(self, paths):
+        self._exact = {}
+        self._normalized = {}
+        for p in paths:
+            p_path = pathlib.Path(p)
+            self._exact.setdefault(p_path.stem, p_path)
+            self._exact.setdefault(p_path.name, p_path)
+            self._normalized.setdefault(normalize_identifier(p_path.stem), set()).add(p_path)
+        self._sorted_keys = sorted(self._normalized)
+
+    def resolve(self, part_id):
+        """
+        Fichier correspondant à `part_id`, ou None s'il est introuvable ou
+        ambigu (plusieurs fichiers possibles : on ne choisit pas au hasard).
+        """
+        path = self._exact.get(part_id)
+        if path is not None:
+            return path
+
+        key = normalize_identifier(part_id)
+        if not key:
+            return None
+        matches = self._normalized.get(key)
+        if matches is None:
+            matches = self.prefix_matches(key)
+        if len(matches) == 1:
+            return next(iter(matches))
+        return None
+
+    def prefix_matches(self, key):
+        """ Fichiers dont l'identifiant normalisé commence par `key`. """
+        matches = set()
+        i = bisect.bisect_left(self._sorted_keys, key)
+        while i < len(self._sorted_keys) and self._sorted_keys[i].startswith(key):
+            matches |= self._normalized[self._sorted_keys[i]]
+            i += 1
+        return matches
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Fin de `insillyclo.simulator.compute_all` sur des objets déjà préparés.
+
+`compute_all` d'insillyclo relit lui-même le template et les GenBank : le
+wrapper lui passait donc ses propres versions en remplaçant des fonctions
+du module insillyclo. Ici, le template parsé (assembly, plasmides) et les
+séquences des pièces sont passés explicitement ; seules les étapes
+suivantes d'insillyclo sont appelées, dans le même ordre et avec les mêmes
+sorties que `compute_all` (insillyclo 1.1.0, voir requirements.txt).
+Les signatures utilisées sont vérifiées par les tests (biolib/tests.py).
+"""
+import csv
+
+import Bio.SeqIO
+
+import insillyclo.conf
+import insillyclo.dilution
+import insillyclo.gel
+import insillyclo.models
+import insillyclo.parser
+import insillyclo.simulator
+
+# Fonctions d'insillyclo appelées par le wrapper et leurs paramètres (vérifiés par les tests)
+UPSTREAM_FUNCTIONS = {
+    insillyclo.parser.parse_assembly_and_plasmid_from_template: (
+        'input_template_filled', 'input_part_factory', 'assembly_factory', 'plasmid_factory', 'observer',
+        'load_only_assembly',
+    ),
+    insillyclo.simulator.primer_id_pairs_to_primer_with_seq: ('primer_id_pairs', 'primers_file', 'observer'),
+    insillyclo.simulator.extract_needed_input_parts: ('plasmids',),
+    insillyclo.simulator.override_from_concentration_file_and_update: ('sequences', 'concentration_file', 'observer'),
+    insillyclo.simulator.instantiate_plasmid_to_assemble: ('plasmid', 'available_sequence', 'assembly', 'data_source', 'observer'),
+    insillyclo.simulator.assemble_to_seq_record: ('plasmid', 'part_to_assemble', 'plasmid_name'),
+    insillyclo.gel.enzyme_digestion_to_gel: ('filename', 'plasmids', 'enzyme_names', 'observer'),
+    insillyclo.gel.pcr_amplification_to_gel: ('filename', 'wells', 'observer'),
+    insillyclo.dilution.compute_all_dilutions: (
+        'settings', 'puncture_volume_10x', 'output_plasmid_expected_volume', 'enzyme_and_buffer_volume',
+        'minimum_remaining_volume_for_10x_intermediate_dilution', 'minimal_puncture_volume',
+        'default_mass_concentration', 'expected_concentration_in_output', 'target_dilutions', 'observer',
+    ),
+    insillyclo.dilution.round_dilution_spec: ('specs', 'ndigits'),
+    insillyclo.dilution.write_dilution_spec: ('filename', 'specs', 'output_format'),
+}
+
+# Paramètres de dilution de `compute_all` (mêmes noms qu'insillyclo), transmis tels quels
+DILUTION_OPTIONS = (
+    'default_output_plasmid_volume', 'enzyme_and_buffer_volume', 'minimal_remaining_well_volume',
+    'puncture_volume_10x', 'minimal_puncture_volume', 'expected_concentration_in_output', 'target_dilutions',
+)
+
+
+def run_assembly(
+    *,
+    assembly,
+    plasmids,
+    sequences,
+    settings,
+    output_dir,
+    data_source,
+    observer,
+    enzyme_names=None,
+    default_mass_concentration=None,
+    concentration_file=None,
+    primer_id_pairs=None,
+    primers_file=None,
+    sbol_export=False,
+    default_output_plasmid_volume=None,
+    enzyme_and_buffer_volume=None,
+    minimal_remaining_well_volume=None,
+    puncture_volume_10x=None,
+    minimal_puncture_volume=None,
+    expected_concentration_in_output=None,
+    target_dilutions=None,
+):
+    """
+    Assemble les `plasmids` du template avec `sequences` ((nom, type) -> SeqRecord,
+    voir simulator.fetch_input_part_sequences) et écrit les mêmes fichiers que
+    `insillyclo.simulator.compute_all` dans `output_dir`. Les paramètres de
+    dilution (DILUTION_OPTIONS) sont ceux de `compute_all`.
+    """
+    output = insillyclo.simulator.SimulationOutput([], dict())
+    if settings is None:
+        settings = insillyclo.conf.InSillyCloConfig()
+    if primer_id_pairs:
+        primer_pairs = insillyclo.simulator.primer_id_pairs_to_primer_with_seq(
+            primer_id_pairs=primer_id_pairs,
+            primers_file=primers_file,
+            observer=observer,
+        )
+    else:
+        primer_pairs = []
+
+    if sbol_export:
+        import sbol2
+        sbol2.Config.setOption('validate', False)
+        sbol_doc = sbol2.Document()
+    else:
+        sbol_doc = None
+
+    insillyclo.simulator.override_from_concentration_file_and_update(
+        sequences=sequences,
+        concentration_file=concentration_file,
+        observer=observer,
+    )
+    produced_plasmids = []
+    wells = []
+    plasmids_dilution_info = []
+    for plasmid in plasmids:
+        plasmid_name, part_to_assemble = insillyclo.simulator.instantiate_plasmid_to_assemble(
+            plasmid=plasmid,
+            available_sequence=sequences,
+            assembly=assembly,
+            data_source=data_source,
+            observer=observer,
+        )
+        record = insillyclo.simulator.assemble_to_seq_record(plasmid, part_to_assemble, plasmid_name)
+        output_plasmid_path = output_dir / f'{plasmid.plasmid_id}.gb'
+        output.plasmid_ids.append(output_plasmid_path)
+        with open(output_plasmid_path, 'w') as gb_file:
+            Bio.SeqIO.write(record, gb_file, "genbank")
+
+        if sbol_doc:
+            cd = sbol2.ComponentDefinition(record.id)
+            cd.sequence = sbol2.Sequence(record.id, str(record.seq))
+            cd.description = record.description
+            sbol_doc.addComponentDefinition(cd)
+
+        insillyclo.gel.enzyme_digestion_to_gel(
+            filename=output_dir / f'{plasmid.plasmid_id}-digestion.svg',
+            plasmids=[(plasmid.plasmid_id, record)],
+            enzyme_names=enzyme_names,
+            observer=observer,
+        )
+        well_sequences = [(record, True)]
+        for p in part_to_assemble:
+            for f in p.fragments:
+                well_sequences.extend([
+                    (f.out_sens, False),
+                    (f.in_sens, False),
+                    (f.out_antisens, False),
+                    (f.in_antisens, False),
+                ])
+        well = insillyclo.models.PCRWell(
+            name=plasmid.plasmid_id,
+            sequences=well_sequences,
+            primers=primer_pairs,
+        )
+        wells.append(well)
+        insillyclo.gel.pcr_amplification_to_gel(
+            filename=output_dir / f'{plasmid.plasmid_id}-pcr.svg',
+            wells=[well],
+            observer=observer,
+        )
+
+        produced_plasmids.append((plasmid, part_to_assemble, record))
+
+        used_sequences = []
+        for p in part_to_assemble:
+            used_sequences.extend(p.sequences)
+        plasmids_dilution_info.append(
+            insillyclo.dilution.PlasmidDilutionInfo(
+                plasmid_id=plasmid.plasmid_id,
+                used_sequences=used_sequences,
+            )
+        )
+
+    with open(output_dir / 'DB_produced_plasmid.csv', mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=';', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['pID', 'Name', 'Type'])
+        for plasmid, _, sequence in produced_plasmids:
+            writer.writerow([plasmid.plasmid_id, sequence.description, plasmid.output_type])
+
+    with open(output_dir / 'auto-gg-combination-to-make.csv', mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        for plasmid, part_to_assemble, sequence in produced_plasmids:
+            combination_to_make = [f'{sequence.name} {sequence.description}']
+            for part in part_to_assemble:
+                for seq in part.sequences:
+                    combination_to_make.append(seq.name)
+            writer.writerow(combination_to_make)
+
+    insillyclo.gel.enzyme_digestion_to_gel(
+        filename=output_dir / 'digestion.svg',
+        plasmids=[(plasmid.plasmid_id, record) for plasmid, _, record in produced_plasmids],
+        enzyme_names=enzyme_names,
+        observer=observer,
+    )
+    insillyclo.gel.pcr_amplification_to_gel(
+        filename=output_dir / 'pcr.svg',
+        wells=wells,
+        observer=observer,
+    )
+
+    has_mass_concentration = default_mass_concentration is not None or any(
+        ip.annotations.get('mass_concentration', None) for ip in sequences.values()
+    )
+    if has_mass_concentration:
+        dilutions = insillyclo.dilution.compute_all_dilutions(
+            plasmids_dilution_info,
+            settings=settings,
+            puncture_volume_10x=puncture_volume_10x,
+            output_plasmid_expected_volume=default_output_plasmid_volume,
+            enzyme_and_buffer_volume=enzyme_and_buffer_volume,
+            minimum_remaining_volume_for_10x_intermediate_dilution=minimal_remaining_well_volume,
+            minimal_puncture_volume=minimal_puncture_volume,
+            default_mass_concentration=default_mass_concentration,
+            expected_concentration_in_output=expected_concentration_in_output,
+            target_dilutions=target_dilutions,
+            observer=observer,
+        )
+        for dilution_strategy, dilution in dilutions.items():
+            for expected_format in ['json', 'csv']:
+                dilution_file = output_dir / f'dilution-{dilution_strategy}.{expected_format}'
+                dilution = insillyclo.dilution.round_dilution_spec(
+                    specs=dilution,
+                    ndigits=settings.nb_digits_rounding,
+                )
+                insillyclo.dilution.write_dilution_spec(
+                    filename=dilution_file,
+                    specs=dilution,
+                    output_format=expected_format,
+                )
+                output.dilutions.setdefault(dilution_strategy, []).append(dilution_file)
+
+    if sbol_doc:
+        sbol_doc.write(output_dir / 'plasmids.xml')
+    return output
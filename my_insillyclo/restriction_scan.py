@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Recherche vectorisée des sites de restriction sur un lot de séquences.
+
+Les sites de toutes les enzymes demandées (et leurs compléments inverses,
+bases ambiguës développées) forment une table de motifs codés sur 2 bits.
+Les séquences du lot sont concaténées, séparées par un 'N', puis chaque
+longueur de motif donne un unique passage numpy : codes glissants de la
+séquence, puis `np.isin` contre la table. Les séquences circulaires sont
+prolongées de leur début pour détecter les sites à cheval sur l'origine.
+"""
+import itertools
+
+from my_insillyclo.enzymes import get_enzyme
+from my_insillyclo.kmer_index import encode_sequence, reverse_complement, window_codes
+
+# Enzymes de type IIS utilisées en Golden Gate : sites internes à surveiller
+GOLDEN_GATE_ENZYMES = ('BsaI', 'BsmBI', 'BbsI', 'SapI', 'PaqCI')
+
+# Au-delà, le lot est découpé pour borner la mémoire
+CHUNK_BASES = 4_000_000
+# Développement des bases ambiguës (N, R, Y...) borné par motif
+MAX_EXPANSIONS = 4096
+
+_IUPAC = {
+    'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T',
+    'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT', 'M': 'AC',
+    'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT',
+}
+
+
+def enzyme_site(name):
+    """ Site de reconnaissance de l'enzyme `name` (ValueError si elle est inconnue). """
+    return get_enzyme(name).site
+
+
+def expand_site(site):
+    """ Motifs concrets (ACGT) d'un site pouvant contenir des bases ambiguës. """
+    choices = [_IUPAC[base] for base in site.upper()]
+    count = 1
+    for choice in choices:
+        count *= len(choice)
+    if count > MAX_EXPANSIONS:
+        raise ValueError(f"Site trop dégénéré : {site}")
+    return [''.join(p) for p in itertools.product(*choices)]
+
+
+class SitePatterns:
+    """ Table des motifs à chercher, regroupés par longueur. """
+
+    def __init__(self, enzymes):
+        self.enzymes = list(enzymes)
+        # longueur -> {code: {(indice de l'enzyme, brin) reconnaissant ce motif}}
+        self.by_length = {}
+        for e_index, name in enumerate(self.enzymes):
+            site = enzyme_site(name)
+            for strand, oriented_site in (('+', site), ('-', reverse_complement(site))):
+                for motif in expand_site(oriented_site):
+                    code = int(window_codes(encode_sequence(motif), len(motif))[0][0])
+                    self.by_length.setdefault(len(motif), {}).setdefault(code, set()).add((e_index, strand))
+        self.max_length = max(self.by_length, default=0)
+
+
+def _scan_chunk(items, patterns, results):
+    """ Un passage numpy par longueur de motif sur la concaténation du lot. """
+    import numpy as np
+
+    pieces, offsets, lengths, ids = [], [], [], []
+    position = 0
+    for item_id, sequence, circular in items:
+        sequence = sequence.upper()
+        body = sequence + sequence[:patterns.max_length - 1] if circular else sequence
+        pieces.append(body)
+        offsets.append(position)
+        lengths.append(len(sequence))
+        ids.append(item_id)
+        position += len(body) + 1
+    codes = encode_sequence('N'.join(pieces))
+    offsets = np.array(offsets, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+
+    for length, table in patterns.by_length.items():
+        forward, valid = window_codes(codes, length)
+        if not len(forward):
+            continue
+        table_codes = np.fromiter(table, dtype=np.uint64, count=len(table))
+        hits = np.flatnonzero(valid & np.isin(forward, table_codes))
+        if not len(hits):
+            continue
+
+        owners = np.searchsorted(offsets, hits, side='right') - 1
+        local = hits - offsets[owners]
+        # Fenêtres commençant dans le prolongement circulaire : déjà comptées
+        keep = local < lengths[owners]
+        for owner, pos, code in zip(owners[keep], local[keep], forward[hits[keep]]):
+            for e_index, strand in table[int(code)]:
+                results[ids[owner]][patterns.enzymes[e_index]].add((int(pos), strand))
+
+
+def scan_oriented_sites(items, enzymes=GOLDEN_GATE_ENZYMES):
+    """
+    `items` : itérable de (id, séquence, circulaire).
+    Renvoie {id: {enzyme: [(position 0-based, brin), ...]}} ; le brin '-'
+    désigne le complément inverse du site lu sur le brin direct.
+    """
+    patterns = SitePatterns(enzymes)
+    results = {}
+    chunk, chunk_bases = [], 0
+    for item in items:
+        results[item[0]] = {name: set() for name in patterns.enzymes}
+        chunk.append(item)
+        chunk_bases += len(item[1])
+        if chunk_bases >= CHUNK_BASES:
+            _scan_chunk(chunk, patterns, results)
+            chunk, chunk_bases = [], 0
+    if chunk:
+        _scan_chunk(chunk, patterns, results)
+
+    return {
+        item_id: {name: sorted(hits) for name, hits in sites.items()}
+        for item_id, sites in results.items()
+    }
+
+
+def scan_sequences(items, enzymes=GOLDEN_GATE_ENZYMES):
+    """
+    `items` : itérable de (id, séquence, circulaire).
+    Renvoie {id: {enzyme: [positions 0-based des sites, brins confondus]}}.
+    """
+    return {
+        item_id: {name: sorted({pos for pos, _ in hits}) for name, hits in sites.items()}
+        for item_id, sites in scan_oriented_sites(items, enzymes).items()
+    }
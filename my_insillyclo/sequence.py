@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Lecture des fichiers de plasmides et encodage compact des séquences.
+
+Format 2 bits (A=0, C=1, G=2, T=3, quatre bases par octet) :
+
+    en-tête  : longueur (uint32), nombre de blocs non-ACGT (uint32)
+    blocs    : (début uint32, longueur uint32, base uint8) pour chaque suite
+               de caractères hors ACGT (N, bases ambiguës), stockés à part
+    données  : bases empaquetées, les positions des blocs valant A
+"""
+import functools
+import hashlib
+import io
+import pathlib
+import re
+import struct
+
+# Format Biopython selon l'extension du fichier
+SEQUENCE_FORMATS = {
+    '.gb': 'genbank',
+    '.gbk': 'genbank',
+    '.genbank': 'genbank',
+    '.fasta': 'fasta',
+    '.fa': 'fasta',
+    '.fna': 'fasta',
+    '.dna': 'snapgene',
+}
+
+_CODES = {'A': 0, 'C': 1, 'G': 2, 'T': 3}
+_BASES = 'ACGT'
+_HEADER = struct.Struct('<II')
+_BLOCK = struct.Struct('<IIB')
+# Suite d'un même caractère hors ACGT (NNNN, RR...)
+_NON_ACGT = re.compile(r'([^ACGT])\1*')
+
+
+# Octet -> ses quatre bases, pour décoder sans boucle par base
+_BYTE_TO_BASES = [
+    ''.join(_BASES[(byte >> shift) & 3] for shift in (6, 4, 2, 0)) for byte in range(256)
+]
+
+
+@functools.cache
+def _ascii_codes():
+    """ Code ASCII -> code 2 bits (0 pour tout caractère hors ACGT). """
+    import numpy as np  # import coûteux (~0,1 s), seulement quand on encode
+
+    codes = np.zeros(256, dtype=np.uint8)
+    codes[[ord(base) for base in _CODES]] = list(_CODES.values())
+    return codes
+
+
+def sequence_format(filename):
+    return SEQUENCE_FORMATS.get(pathlib.Path(filename).suffix.lower())
+
+
+def read_record(source, filename):
+    """
+    Lit un enregistrement depuis un chemin, des octets ou un fichier ouvert en binaire.
+    Le format est déduit de l'extension de `filename`.
+    """
+    from Bio import SeqIO  # import coûteux, seulement quand on parse
+
+    fmt = sequence_format(filename)
+    if fmt is None:
+        raise ValueError(f"Format de fichier non reconnu : {filename}")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if fmt != 'snapgene' and not isinstance(source, (str, pathlib.Path)):
+        # Les parseurs texte de Biopython attendent un flux texte
+        source = io.TextIOWrapper(source, encoding='utf-8', errors='replace')
+    return SeqIO.read(source, fmt)
+
+
+def pack_2bit(sequence):
+    import numpy as np
+
+    sequence = sequence.upper()
+    blocks = [(m.start(), m.end() - m.start(), ord(m.group()[0])) for m in _NON_ACGT.finditer(sequence)]
+
+    # Codes de toutes les bases en un passage numpy (hors ACGT -> A, comme les blocs)
+    codes = _ascii_codes()[np.frombuffer(sequence.encode('ascii', errors='replace'), dtype=np.uint8)]
+    codes = np.concatenate([codes, np.zeros(-len(codes) % 4, dtype=np.uint8)]).reshape(-1, 4)
+    packed = codes[:, 0] << 6 | codes[:, 1] << 4 | codes[:, 2] << 2 | codes[:, 3]
+
+    header = _HEADER.pack(len(sequence), len(blocks))
+    return header + b''.join(_BLOCK.pack(*block) for block in blocks) + packed.tobytes()
+
+
+def unpack_2bit(data):
+    data = bytes(data)
+    length, block_count = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    blocks = []
+    for _ in range(block_count):
+        blocks.append(_BLOCK.unpack_from(data, offset))
+        offset += _BLOCK.size
+
+    sequence = ''.join(_BYTE_TO_BASES[byte] for byte in data[offset:])[:length]
+    if blocks:
+        chars = list(sequence)
+        for start, size, base in blocks:
+            chars[start:start + size] = chr(base) * size
+        sequence = ''.join(chars)
+    return sequence
+
+
+def sequence_checksum(sequence):
+    """ Empreinte SHA-256 de la séquence (indépendante de la casse et des annotations). """
+    return hashlib.sha256(sequence.upper().encode()).hexdigest()
+
+
+# Champs de Plasmid renseignés par sequence_fields
+SEQUENCE_FIELDS = ['sequence', 'length', 'topology', 'checksum', 'packed_sequence']
+
+
+def sequence_fields(record):
+    """ Champs de Plasmid renseignés à partir d'un enregistrement parsé. """
+    sequence = str(record.seq).upper()
+    return {
+        'sequence': sequence,
+        'length': len(sequence),
+        'topology': record.annotations.get('topology', 'linear'),
+        'checksum': sequence_checksum(sequence),
+        'packed_sequence': pack_2bit(sequence),
+    }
+
+
+def parse_sequence_file(path, known_digest=None):
+    """
+    (SHA-256 du fichier, taille, champs de Plasmid, erreur) pour le fichier
+    `path`. Le fichier n'est pas parsé si son empreinte vaut `known_digest`
+    (champs None). Ne lève pas d'exception : utilisable dans un pool de processus.
+    """
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError as e:
+        return '', 0, None, str(e)
+    digest = hashlib.sha256(content).hexdigest()
+    if digest == known_digest:
+        return digest, len(content), None, ''
+    try:
+        return digest, len(content), sequence_fields(read_record(content, str(path))), ''
+    except Exception as e:
+        return digest, len(content), None, str(e) or type(e).__name__
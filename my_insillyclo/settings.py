@@ -121,5 +121,42 @@ LOGIN_URL = '/login/'  # URL de redirection pour la connexion
 LOGIN_REDIRECT_URL = '/'  # Redirection après connexion
 LOGOUT_REDIRECT_URL = '/'  # Redirection après déconnexion
 
+# Cache partagé par les processus web (statistiques des équipes, voir biolib/stats.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'django',
+    },
+    # Avancement des simulations (biolib/progress.py) : une entrée par simulation,
+    # tenue à part pour que son éviction ne touche pas le cache par défaut
+    'progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'progress',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'biolib.User'
+
+# Nombre de simulations exécutées en parallèle par processus web (biolib/jobs.py)
+SIMULATION_WORKERS = 2
+# Processus utilisés pour patcher les pièces d'une campagne (None : selon le nombre de CPU)
+SIMULATION_PATCH_WORKERS = None
+# Processus utilisés pour un lot de simulations (None : INSILLYCLO_BATCH_JOBS ou selon le nombre de CPU)
+SIMULATION_BATCH_JOBS = None
+# Intervalle minimal (s) entre deux écritures de l'avancement d'une simulation dans le cache (biolib/progress.py)
+SIMULATION_PROGRESS_INTERVAL = 0.5
+# Au-delà de cette durée (s) sans signe de vie, une simulation RUNNING est considérée
+# comme abandonnée (worker tué, serveur redémarré) et remise en file au démarrage du
+# pool de workers ou par `process_simulations`
+SIMULATION_RUNNING_TIMEOUT = 15 * 60
+# Intervalle minimal (s) entre deux signes de vie d'une simulation en cours (biolib/jobs.py)
+SIMULATION_HEARTBEAT_INTERVAL = 30
+# Paramètres de dilution passés à insillyclo (noms de compute_all, voir
+# my_insillyclo/pipeline.py DILUTION_OPTIONS), ex. {'puncture_volume_10x': 1.0}
+SIMULATION_DILUTION_OPTIONS = {}
+# Délai (s) entre deux lectures de l'avancement par la page de résultats (biolib/progress.py)
+SIMULATION_PROGRESS_POLL = 2
+# Alias du cache de l'avancement (le cache par défaut s'il n'est pas dans CACHES)
+SIMULATION_PROGRESS_CACHE = 'progress'
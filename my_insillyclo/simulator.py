@@ -1,18 +1,9 @@
 #!/usr/bin/env python3
+import json
 import pathlib
-import shutil
 import logging
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
 
 # Imports InSillyClo
-try:
-    import pandas as pd
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
-
 try:
     import insillyclo.data_source
     import insillyclo.observer
@@ -21,170 +12,304 @@ try:
     import insillyclo.digestion
     import insillyclo.parser
     import insillyclo.models
+    from insillyclo import additional_exception
 except ImportError as e:
     raise ImportError(f"Le package 'insillyclo' est introuvable. Erreur : {e}")
 
+from my_insillyclo.cache import get_genbank_cache
+from my_insillyclo.campaign_files import (
+    iter_rows, memoize_template_parser, read_name_mapping, sniff_delimiter,
+)
+from my_insillyclo.overhangs import OverhangError, assign_overhangs, part_overhangs, validate_constructs
+from my_insillyclo.part_index import PartIndex
+from my_insillyclo.patching import PatchingError, patch_files
+from my_insillyclo.pipeline import DILUTION_OPTIONS, run_assembly
+from my_insillyclo.template_parser import parse_template
+
+logger = logging.getLogger(__name__)
+
 # =============================================================================
-# LOGIQUE DYNAMIQUE : PATCH DES FICHIERS
+# LECTURE DES GENBANK VIA LE CACHE
 # =============================================================================
 
-def _patch_sequence_dynamically(record, target_left, target_right, is_backbone):
+def read_input_parts(needed_input_parts, input_parts_files, observer):
+    """
+    Lecture des fichiers de mapping de `insillyclo.simulator.fetch_gb_for_input_parts`
+    (en flux, séparateur détecté une fois) : {fichier GenBank: [((nom, type),
+    infos), ...]} pour les pièces de `needed_input_parts`.
     """
-    Force les extrémités de la séquence pour matcher les connecteurs demandés.
+    needed_gb = dict()
+    for input_parts_file in input_parts_files:
+        try:
+            delimiter = sniff_delimiter(input_parts_file)
+        except ValueError as e:
+            raise additional_exception.InvalidDelimiterCSV(input_parts_file) from e
+        csr_reader = iter_rows(input_parts_file, delimiter)
+        concentration_key = None
+        header = next(csr_reader)
+        if header[:3] == ['pID', 'Name', 'Type']:
+            typed = True
+            concentration_col = 3
+        elif header[:2] == ['pID', 'Name']:
+            typed = False
+            concentration_col = 2
+        else:
+            observer.notify_invalide_parts_file(
+                row_id=0,
+                filepath=str(input_parts_file),
+                content=json.dumps(header),
+            )
+            raise additional_exception.InvalidePartFileHeader()
+        if len(header) > concentration_col:
+            if header[concentration_col] == "Mass Concentration":
+                concentration_key = 'mass_concentration'
+            if header[concentration_col] == "Mol Concentration":
+                concentration_key = 'mol_concentration'
+        for row in csr_reader:
+            additional_info = list()
+            concentration_value = None
+            if concentration_key:
+                concentration_value = row[concentration_col].strip()
+                concentration_value = float(concentration_value) if concentration_value else None
+            if concentration_value:
+                additional_info.append((concentration_key, concentration_value))
+            if typed:
+                part_n_type = (row[1].strip(), row[2].strip())
+            else:
+                part_n_type = (row[1].strip(), None)
+            if part_n_type in needed_input_parts:
+                filename = row[0]
+                if not filename.endswith('.gb'):
+                    filename += '.gb'
+                needed_gb.setdefault(filename, list()).append((part_n_type, additional_info))
+    return needed_gb
+
+
+def fetch_input_part_sequences(needed_input_parts, input_parts_files, gb_plasmids, observer):
     """
-    original_seq = str(record.seq).upper()
+    Équivalent de `insillyclo.simulator.fetch_gb_for_input_parts` : même lecture
+    du fichier de mapping (voir read_input_parts), mais les GenBank sont lus
+    via le cache partagé au lieu d'être reparsés à chaque simulation. Le
+    résultat est passé à pipeline.run_assembly.
+    """
+    needed_gb = read_input_parts(needed_input_parts, input_parts_files, observer)
+
+    cache = get_genbank_cache()
+    sequences = dict()
+    for gb_plasmid in gb_plasmids:
+        part_n_type = (gb_plasmid.stem, insillyclo.models.get_direct_identifier())
+        if part_n_type in needed_input_parts:
+            needed_gb.setdefault(gb_plasmid.name, list()).append((part_n_type, list()))
+        part_n_types_needing_it = needed_gb.get(gb_plasmid.name)
+        if not part_n_types_needing_it:
+            continue
+        try:
+            seq = cache.read(gb_plasmid)
+        except ValueError as e:
+            raise ValueError(f'{e.args[0]} on {gb_plasmid.absolute()}', e)
+        for part_n_type, additional_info in part_n_types_needing_it:
+            seq.name = gb_plasmid.stem
+            sequences[part_n_type] = seq
+            for k, v in additional_info:
+                seq.annotations[k] = v
 
-    # 1. Nettoyage : On enlève les anciens sites BsaI
-    clean_seq = original_seq.replace("GGTCTC", "GGTCTG").replace("GAGACC", "GAGACG")
+    return sequences
 
-    # 2. Construction de la nouvelle séquence
-    bsaI = "GGTCTC"
-    bsaI_rev = "GAGACC"
 
-    # Structure : BsaI -> Spacer(A) -> Left -> ADN -> Right -> Spacer(T) -> BsaI_Rev
-    new_seq = bsaI + "A" + target_left + clean_seq + target_right + "T" + bsaI_rev
+# Parser du template : feuille chargée explicitement (CSV lus directement, voir
+# template_parser) et résultat mémorisé par empreinte du contenu.
+parse_template_file = memoize_template_parser(parse_template)
 
-    new_record = SeqRecord(
-        Seq(new_seq),
-        id=record.id,
-        name=record.name,
-        description=f"Auto-Adapted ({target_left}->{target_right})",
-        annotations={"molecule_type": "DNA", "topology": "linear"}
-    )
-    return new_record
+# =============================================================================
+# AVANCEMENT
+# =============================================================================
 
-def _dynamic_compatibility_layer(template_path, input_parts_files, gb_files, work_dir, observer):
+def notify_stage(observer, stage, done=None, total=None):
     """
-    Utilise le parser officiel pour comprendre la recette et patche les fichiers.
+    Signale le début (ou l'avancement) d'une étape de la simulation aux
+    observateurs qui le prennent en charge (méthode `notify_stage`, absente
+    de l'interface insillyclo).
     """
+    notify = getattr(observer, 'notify_stage', None)
+    if notify is not None:
+        notify(stage, done=done, total=total)
 
-    # A. Lire le Mapping (Nom -> ID Fichier)
-    name_to_filename = {}
-    if HAS_PANDAS and input_parts_files:
-        try:
-            csv_path = input_parts_files[0]
-            df_map = pd.read_csv(csv_path, sep=None, engine='python')
-            df_map.columns = df_map.columns.str.strip()
-
-            # Recherche des colonnes pID et Name
-            col_id = next((c for c in df_map.columns if c.lower() == 'pid'), None)
-            col_name = next((c for c in df_map.columns if c.lower() == 'name'), None)
-
-            if col_id and col_name:
-                for _, row in df_map.iterrows():
-                    pid = str(row[col_id]).strip()
-                    name = str(row[col_name]).strip()
-                    name_to_filename[name] = pid
-                    name_to_filename[pid] = pid
-
-        except Exception as e:
-            print(f"DEBUG: Erreur lecture mapping: {e}")
-
-    # B. Lire la recette VIA LE PARSER OFFICIEL
-    recipes = []
-    try:
-        assembly, plasmids = insillyclo.parser.parse_assembly_and_plasmid_from_template(
-            template_path,
-            input_part_factory=insillyclo.models.InputPartDataClassFactory(),
-            assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
-            plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
-            observer=observer,
-        )
-
-        for plasmid in plasmids:
-            current_recipe = []
-            # CORRECTION ICI : On lit 'part_instance' (la valeur) et non 'input_part.name' (la colonne)
-            for part_instance, input_part in plasmid.parts:
-                if part_instance:
-                    val = str(part_instance).strip()
-                    if val:
-                        current_recipe.append(val)
-
-            if current_recipe:
-                print(f"DEBUG: Recette extraite ({plasmid.plasmid_id}) : {current_recipe}")
-                recipes.append(current_recipe)
-
-    except Exception as e:
-        print(f"DEBUG: Erreur Parser Officiel: {e}")
-        return []
-
-    # C. Calculer les connecteurs (Overhangs)
-    file_overhangs = {}
-    LINKS = ["GGAG", "AATG", "GCTT", "CGCT", "TGCC", "GGAA", "TTCC", "ACGT"]
-
-    for recipe in recipes:
-        count = len(recipe)
-        for i, part_name in enumerate(recipe):
-            # Identification du fichier réel via le mapping
-            real_id = name_to_filename.get(part_name, part_name)
-
-            # Calcul des liens (i -> i+1)
-            link_in = LINKS[i % len(LINKS)]
-            link_out = LINKS[(i + 1) % len(LINKS)]
-
-            # Boucle fermée
-            if i == count - 1:
-                link_out = LINKS[0]
-
-            file_overhangs[real_id] = (link_in, link_out)
-
-    # D. Appliquer les modifications aux fichiers
-    ready_files = []
 
-    # Indexation des fichiers sources disponibles
-    available_files = {}
-    for p in gb_files:
-        p_path = pathlib.Path(p)
-        available_files[p_path.stem] = p_path
-        available_files[p_path.name] = p_path
-
-    processed_stems = set()
-
-    for filename_id, (target_left, target_right) in file_overhangs.items():
-        # Recherche flexible du fichier
-        src_path = available_files.get(filename_id)
-        if not src_path:
-            # Tentative de recherche partielle
-            for s, p in available_files.items():
-                if filename_id in s:
-                    src_path = p
-                    break
+# =============================================================================
+# LECTURE DES ENTRÉES DE LA CAMPAGNE
+# =============================================================================
 
-        if not src_path:
-            print(f"DEBUG: Fichier introuvable pour la pièce '{filename_id}'")
-            continue
+def prepare_template(input_template_filled):
+    """
+    Chemin du template à donner au parser insillyclo. Les CSV sont lus tels
+    quels, sans conversion en Excel (voir template_parser.parse_template).
+    """
+    return pathlib.Path(input_template_filled)
 
-        stem = src_path.stem
-        if stem in processed_stems: continue
+def _parse_template(template_path, observer):
+    """ (assembly, plasmides) du template, à passer explicitement aux étapes suivantes. """
+    return parse_template_file(
+        template_path,
+        input_part_factory=insillyclo.models.InputPartDataClassFactory(),
+        assembly_factory=insillyclo.models.AssemblyDataClassFactory(),
+        plasmid_factory=insillyclo.models.PlasmidDataClassFactory(),
+        observer=observer,
+    )
 
-        try:
-            record = SeqIO.read(src_path, "genbank")
+def referenced_plasmid_ids(input_template_filled, input_parts_files, observer):
+    """
+    Ensemble des pID dont la campagne a réellement besoin : chaque pièce citée
+    par le template (toutes ses interprétations possibles), traduite via le
+    mapping, plus le nom brut (insillyclo accepte un pID utilisé directement).
+    """
+    template_path = prepare_template(input_template_filled)
+    _, plasmids = _parse_template(template_path, observer)
+    needed_names = {name for name, _ in insillyclo.simulator.extract_needed_input_parts(plasmids)}
+    for plasmid in plasmids:
+        for part_instance, _ in plasmid.parts:
+            needed_names.add(str(part_instance).strip())
+
+    name_to_filename = read_name_mapping(input_parts_files)
+    pids = set(needed_names)
+    for name in needed_names:
+        pid = name_to_filename.get(name)
+        if pid:
+            pids.add(pid)
+    return {pid[:-3] if pid.endswith('.gb') else pid for pid in pids}
+
+
+# =============================================================================
+# LOGIQUE DYNAMIQUE : PATCH DES FICHIERS
+# =============================================================================
 
-            # Détection Backbone (pour info, mais ici on traite tout le monde pareil)
-            is_backbone = "AmpR" in stem or "pMYT" in stem
+def _dynamic_compatibility_layer(plasmids, input_parts_files, gb_files, work_dir, observer, patch_workers=None, enzyme='BsaI'):
+    """
+    Lit la recette dans le template déjà parsé (`plasmids`) et patche les
+    fichiers qui n'ont pas d'overhangs lisibles pour `enzyme`. Les pièces
+    domestiquées sont données telles quelles à insillyclo.
+    """
 
-            # Application du patch
-            new_record = _patch_sequence_dynamically(record, target_left, target_right, is_backbone)
+    # A. Lire le Mapping ((nom, type) -> fichier), comme insillyclo
+    needed_gb = read_input_parts(
+        insillyclo.simulator.extract_needed_input_parts(plasmids), input_parts_files, observer,
+    )
+    part_files = {
+        part_n_type: filename for filename, entries in needed_gb.items() for part_n_type, _ in entries
+    }
+
+    # Index de résolution des fichiers sources disponibles
+    source_files = list(dict.fromkeys(pathlib.Path(p) for p in gb_files))
+    part_index = PartIndex(source_files)
+    direct = insillyclo.models.get_direct_identifier()
+
+    def resolve(name, part_type):
+        if part_type == direct:
+            return part_index.resolve(name)
+        filename = part_files.get((name, part_type))
+        return part_index.resolve(filename[:-3]) if filename else None
+
+    # B. Lire la recette dans les plasmides du parser officiel. Chaque pièce
+    #    prend la première interprétation dont tous les fichiers existent (le
+    #    choix d'insillyclo) ; son type est celui du mapping, sinon la colonne
+    #    du template.
+    constructs = []
+    sources = {}
+    missing = set()
+    for plasmid in plasmids:
+        current_recipe = []
+        slots = []
+        # CORRECTION ICI : On lit 'part_instance' (la valeur) et non 'input_part.name' (la colonne)
+        for part_instance, input_part in plasmid.parts:
+            val = str(part_instance).strip() if part_instance else ''
+            if not val:
+                continue
+            current_recipe.append(val)
+            for interpretation in input_part.get_possible_interpretation(part_instance):
+                paths = [resolve(name, part_type) for name, part_type in interpretation]
+                if all(paths):
+                    for path, (_, part_type) in zip(paths, interpretation):
+                        sources[path.stem] = path
+                        slots.append((path.stem, part_type if part_type not in (None, direct) else input_part.name))
+                    break
+            else:
+                if val not in missing:
+                    print(f"DEBUG: Fichier introuvable (ou ambigu) pour la pièce '{val}'")
+                    missing.add(val)
+                slots.append((val, input_part.name))
+
+        if slots:
+            print(f"DEBUG: Recette extraite ({plasmid.plasmid_id}) : {current_recipe}")
+            constructs.append((plasmid.plasmid_id, slots))
+
+    # C. Calculer les connecteurs (Overhangs) : ceux des pièces soumises, lus
+    #    par enzyme, et ceux à donner aux pièces qui n'en ont pas
+    notify_stage(observer, 'check')
+    real = _real_overhangs(sources, enzyme)
+    assigned = assign_overhangs(constructs, real, {stem for stem, value in real.items() if value is None})
+
+    # Validation des constructions avec les overhangs qu'elles auront réellement,
+    # avant tout patch : une campagne vouée à l'échec est rejetée tout de suite.
+    _check_constructs(constructs, {**real, **assigned}, observer)
+
+    # D. Appliquer les modifications aux fichiers (un fichier n'est patché qu'une fois)
+    ready_files = []
+    tasks = [
+        (sources[stem], work_dir / f"{stem}.gb", target_left, target_right)
+        for stem, (target_left, target_right) in assigned.items()
+    ]
+
+    notify_stage(observer, 'patch', 0, len(tasks))
+    patched_files, errors = patch_files(
+        tasks, patch_workers,
+        progress=lambda done, total: notify_stage(observer, 'patch', done, total),
+    )
+    if errors:
+        report = "; ".join(f"{stem}: {message}" for stem, message in errors)
+        logger.warning("Patch impossible pour %d fichier(s) : %s", len(errors), report)
+        if observer is not None and observer.is_fail_on_error():
+            raise PatchingError(errors)
+
+    ready_files.extend(patched_files)
+    processed_stems = {path.stem for path in patched_files}
+
+    # Fichiers restants (pièces domestiquées et fichiers non utilisés dans la
+    # recette) : insillyclo les lit directement dans le dépôt de plasmides, en
+    # lecture seule, sans copie dans work_dir.
+    for path in source_files:
+        if path.stem not in processed_stems:
+            ready_files.append(path)
 
-            dst_path = work_dir / f"{stem}.gb"
-            with open(dst_path, "w") as f:
-                SeqIO.write(new_record, f, "genbank")
+    return ready_files
 
-            ready_files.append(dst_path)
-            processed_stems.add(stem)
-            print(f"DEBUG: Patché {stem} ({target_left} -> {target_right})")
 
-        except Exception as e:
-            print(f"Erreur lors du patch de {stem}: {e}")
+def _real_overhangs(sources, enzyme):
+    """ Overhangs réels des pièces (`sources` : stem -> chemin), None si illisibles. """
+    real = {}
+    for stem, path in sources.items():
+        try:
+            real[stem] = part_overhangs(path, enzyme)
+        except ValueError as e:
+            print(f"DEBUG: Overhangs illisibles pour '{stem}' : {e}")
+            real[stem] = None
+    return real
 
-    # Copie des fichiers restants (ceux non utilisés dans la recette)
-    for stem, path in available_files.items():
-        if stem not in processed_stems:
-            dst = work_dir / path.name
-            shutil.copy(path, dst)
-            ready_files.append(dst)
 
-    return ready_files
+def _check_constructs(constructs, overhangs, observer):
+    """
+    Vérifie toutes les constructions en un passage (voir my_insillyclo/overhangs.py).
+    Les pièces sont identifiées par le fichier qui sera réellement utilisé et
+    jugées sur leurs overhangs réels, ou sur ceux du patch pour les pièces
+    patchées. Les pièces non résolues (overhangs inconnus) ne sont pas jugées.
+    """
+    problems = validate_constructs(
+        [(construct_id, [part for part, _ in slots]) for construct_id, slots in constructs],
+        overhangs,
+    )
+    if problems:
+        report = "; ".join(f"{construct}: {message}" for construct, message in problems)
+        logger.warning("Constructions incompatibles : %s", report)
+        if observer is None or observer.is_fail_on_error():
+            raise OverhangError(problems)
 
 
 # =============================================================================
@@ -204,30 +329,25 @@ def compute_all(
 ):
     work_dir = pathlib.Path(output_dir)
     work_dir.mkdir(parents=True, exist_ok=True)
+    input_parts_files = [pathlib.Path(p) for p in input_parts_files] if input_parts_files else []
 
-    # 1. Conversion Template (CSV -> Excel)
-    template_path = pathlib.Path(input_template_filled)
-    if HAS_PANDAS and template_path.suffix.lower() == '.csv':
-        try:
-            df = pd.read_csv(template_path, header=None, sep=None, engine='python')
-            if "Assembly settings" not in df.iloc[:, 0].astype(str).values:
-                header = pd.DataFrame([["Assembly settings",""],["assembly_type","Golden Gate"],["",""],["Constructs settings",""]])
-                df = pd.concat([header, df], ignore_index=True)
-            new_template = template_path.with_suffix('.xlsx')
-            df.to_excel(new_template, index=False, header=False, engine='openpyxl')
-            template_path = new_template
-        except Exception:
-            pass
+    # 1. Template (CSV lu directement, sans conversion Excel), parsé une seule
+    #    fois : les objets sont passés à la couche dynamique puis à l'assemblage
+    template_path = prepare_template(input_template_filled)
+    notify_stage(observer, 'template')
+    assembly, plasmids = _parse_template(template_path, observer)
 
     # 2. APPEL DE LA COUCHE DYNAMIQUE
     print("--- DÉBUT ANALYSE DYNAMIQUE (Corrigée) ---")
 
     ready_files = _dynamic_compatibility_layer(
-        template_path,
+        plasmids,
         input_parts_files,
         gb_plasmids,
         work_dir,
-        observer
+        observer,
+        patch_workers=kwargs.get('patch_workers'),
+        enzyme=assembly.enzyme or 'BsaI',
     )
 
     print(f"--- FIN ANALYSE DYNAMIQUE ({len(ready_files)} fichiers prêts) ---")
@@ -240,18 +360,23 @@ def compute_all(
 
     real_enzyme = ['BsaI']
 
-    return insillyclo.simulator.compute_all(
-        observer=observer,
+    notify_stage(observer, 'assembly')
+    sequences = fetch_input_part_sequences(
+        insillyclo.simulator.extract_needed_input_parts(plasmids), input_parts_files, ready_files, observer,
+    )
+    return run_assembly(
+        assembly=assembly,
+        plasmids=plasmids,
+        sequences=sequences,
         settings=settings,
-        input_template_filled=template_path,
-        input_parts_files=[pathlib.Path(p) for p in input_parts_files] if input_parts_files else [],
-        gb_plasmids=ready_files,
         output_dir=work_dir,
         data_source=real_data_source,
+        observer=observer,
         enzyme_names=real_enzyme,
         primers_file=kwargs.get('primers_file', None),
         primer_id_pairs=kwargs.get('primer_id_pairs', []),
         default_mass_concentration=kwargs.get('default_mass_concentration', 200),
         sbol_export=kwargs.get('sbol_export', False),
-        concentration_file=kwargs.get('concentration_file', None)
+        concentration_file=kwargs.get('concentration_file', None),
+        **{name: kwargs[name] for name in DILUTION_OPTIONS if name in kwargs}
     )
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Parsing d'un template de campagne déjà chargé en DataFrame.
+
+`insillyclo.parser.parse_assembly_and_plasmid_from_template` lit lui-même le
+fichier avec `pd.read_excel`, ce qui impose un fichier Excel. Le wrapper
+prépare la feuille explicitement (campaign_files.load_template_frame : CSV
+lus directement, lecture mémorisée) puis la passe à `parse_template_frame`,
+qui reprend à l'identique le reste du parser d'insillyclo 1.1.0 (voir
+requirements.txt). Le module insillyclo.parser n'est pas modifié ; les tests
+(biolib/tests.py) vérifient que sa source n'a pas changé.
+"""
+import json
+import re
+from json import JSONDecodeError
+
+from insillyclo import additional_exception
+
+from my_insillyclo.campaign_files import load_template_frame
+
+# Empreinte (SHA-256) de la source du parser repris ici, pour insillyclo 1.1.0
+UPSTREAM_PARSER_DIGEST = '6fad0b4e0b914ff3668d477a15dd175e9dff457ef1907a32808a788f751a55bb'
+
+_part_types_re = re.compile(r"([a-zA-Z0-9\-_]+)")
+
+
+def _na_nan_to_none(x):
+    if x == "na":
+        return None
+    if x == "n.a.":
+        return None
+    if str(x) == "nan":
+        return None
+    return x
+
+
+def _to_bool(x):
+    return str(x).lower() in ["true", "t", "yes", "y"]
+
+
+def parse_template_frame(
+    df,
+    input_part_factory,
+    assembly_factory,
+    plasmid_factory,
+    observer,
+    load_only_assembly=False,
+):
+    """
+    (assembly, plasmides) de la feuille `df` (DataFrame sans en-tête, telle
+    que la lit `pd.read_excel(..., header=None)`). Mêmes exceptions et mêmes
+    notifications que le parser d'insillyclo. `df` n'est pas modifié.
+    """
+    row_count, col_count = df.shape
+    row_settings_header_row_id = df.index[df[0] == "Assembly settings"][0]
+    row_composition_header_row_id = df.index[df[0] == "Assembly composition"][0]
+    output_plasmid_header_row_id = df.index[df[0] == "Output plasmid id ↓"][0]
+
+    assembly_name = None
+    assembly_separator = None
+    enzyme = None
+    for i in range(row_settings_header_row_id + 1, min(row_count, row_composition_header_row_id)):
+        if df.iloc[i, 0] == "Restriction enzyme":
+            enzyme = _na_nan_to_none(df.iloc[i, 1])
+        elif df.iloc[i, 0] == "Name":
+            assembly_name = df.iloc[i, 1]
+        elif df.iloc[i, 0] == "Output separator":
+            assembly_separator = df.iloc[i, 1]
+        elif df.iloc[i, 0] == "" or str(df.iloc[i, 0]) == "nan":
+            break
+        else:
+            raise additional_exception.TemplateParsingFailure(f"Unknown settings '{df.iloc[i,0]}'")
+
+    if enzyme is None:
+        raise additional_exception.EnzymeNotFound("No enzyme found in Assembly settings")
+
+    rows = {}
+    for i in range(row_composition_header_row_id, row_count):
+        key = str(df.iloc[i, 1])
+        if not key.endswith(" ->"):
+            break
+        rows[key] = i
+    part_name_row_id = rows.get("Part name ->")
+    part_types_row_id = rows.get("Part types ->")
+    part_optional_row_id = rows.get("Is optional part ->")
+    part_in_output_row_id = rows.get("Part name should be in output name ->")
+    part_separator_row_id = rows.get("Part separator ->")
+    if part_name_row_id is None:
+        raise additional_exception.InvalideTemplate("Part name cannot be found in template")
+    if part_types_row_id is None:
+        raise additional_exception.InvalideTemplate("Part types cannot be found in template")
+    if part_optional_row_id is None:
+        raise additional_exception.InvalideTemplate("Is part optional cannot be found in template")
+    if part_in_output_row_id is None:
+        raise additional_exception.InvalideTemplate("Part in output cannot be found in template")
+    if part_separator_row_id is None:
+        raise additional_exception.InvalideTemplate("Part separator cannot be found in template")
+
+    ips = []
+    for j in range(2, col_count):
+        part_name = df.iloc[part_name_row_id, j]
+        part_types_str = df.iloc[part_types_row_id, j]
+        if _na_nan_to_none(part_types_str) is None:
+            part_types = None
+        else:
+            try:
+                part_types_str = str(part_types_str)
+                part_types_str = _part_types_re.sub(r'"\1"', part_types_str)
+                part_types_str = part_types_str.replace('"nan"', "null")
+                part_types = json.loads('[' + part_types_str + ']')
+            except JSONDecodeError as e:
+                observer.notify_invalide_part_types(
+                    part_name=part_name,
+                    col_id=j,
+                    content=part_types_str,
+                )
+                raise additional_exception.InvalidePartTypesExpression(e)
+        ips.append(
+            input_part_factory.create_input_part(
+                name=part_name,
+                part_types=part_types,
+                is_optional=_to_bool(df.iloc[part_optional_row_id, j]),
+                in_output_name=_to_bool(df.iloc[part_in_output_row_id, j]),
+                separator=_na_nan_to_none(df.iloc[part_separator_row_id, j]),
+            )
+        )
+
+    assembly = assembly_factory.create_assembly(
+        name=assembly_name,
+        separator=assembly_separator,
+        enzyme=enzyme,
+        input_parts=ips,
+    )
+
+    if load_only_assembly:
+        return assembly, []
+
+    plasmids = []
+    for i in range(output_plasmid_header_row_id + 1, row_count):
+        plasmid_id = df.iloc[i, 0]
+        plasmid_type = df.iloc[i, 1]
+        if str(plasmid_type) == "nan":
+            plasmid_type = None
+        parts = []
+        for j, ip in enumerate(ips, start=2):
+            if str(df.iloc[i, j]) == "nan":
+                if not ip.is_optional:
+                    observer.notify_missing_input_part(
+                        plasmid_id=plasmid_id,
+                        row_id=i,
+                        content=ip.name,
+                    )
+                    if observer.is_fail_on_error:
+                        raise additional_exception.MissingInputPart()
+            input_part = df.iloc[i, j]
+            if str(input_part) == "nan":
+                continue
+            # Le getter lève une exception si la pièce est incompatible
+            ip.get_possible_interpretation(input_part)
+            parts.append((input_part, ip))
+        plasmids.append(
+            plasmid_factory.create_plasmid(
+                plasmid_id=plasmid_id,
+                output_type=plasmid_type,
+                parts=parts,
+            )
+        )
+
+    return assembly, plasmids
+
+
+def parse_template(
+    input_template_filled,
+    input_part_factory,
+    assembly_factory,
+    plasmid_factory,
+    observer,
+    load_only_assembly=False,
+):
+    """
+    Équivalent de `insillyclo.parser.parse_assembly_and_plasmid_from_template`
+    (mêmes paramètres) acceptant aussi les templates CSV : la feuille est
+    chargée par `load_template_frame`, jamais par `pd.read_excel` pour un CSV.
+    """
+    return parse_template_frame(
+        load_template_frame(input_template_filled),
+        input_part_factory=input_part_factory,
+        assembly_factory=assembly_factory,
+        plasmid_factory=plasmid_factory,
+        observer=observer,
+        load_only_assembly=load_only_assembly,
+    )
@@ -63,13 +63,20 @@ urlpatterns = [
     name="collection_delete"
     ),
 
+    # recherche par séquence
+    path("plasmids/search/", views.plasmid_search, name="plasmid_search"),
+    path("api/plasmids/search/", views.plasmid_search_api, name="plasmid_search_api"),
+
 
     # Tables de correspondances
     path("correspondences/", views.correspondences_view, name="correspondences"),
     
     # simulations
     path('simulation/new/', views.create_simulation, name='create_simulation'),
+    path('simulation/batch/', views.create_simulation_batch, name='create_simulation_batch'),
     path('simulation/<int:pk>/', views.simulation_result, name='simulation_result'),
+    path('simulation/<int:pk>/status/', views.simulation_status, name='simulation_status'),
+    path('simulation/<int:pk>/progress/', views.simulation_progress, name='simulation_progress'),
     path('simulations/', views.simulation_list, name='simulation_list'),
     path('simulation/demo/', views.simulation_result, name='simulation_demo'),
     path('simulation/<int:pk>/csv/', views.download_simulation_csv, name='download_simulation_csv'),